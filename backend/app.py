@@ -1,7 +1,8 @@
-import json
+import asyncio
 import logging
 import shutil
 import traceback
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -10,7 +11,7 @@ logging.basicConfig(level=logging.INFO)
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request as StarletteRequest
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -18,6 +19,16 @@ from pydantic import BaseModel
 
 from config import EPISODES_DIR, CHARACTERS_DIR, SETTINGS_DIR, TEMPLATES_DIR, SHORTS_DIR, SHORTS_CODE_DIR
 from models import EpisodeState, EpisodeSummary
+from services.asset_registry import AssetRegistry, character_registry, setting_registry
+from services.llm import LLMOutputError, LLMTimeoutError, json_stats
+from services.http_clients import providers as http_providers
+from services.llm_cache import llm_cache
+from services.llm_metrics import OwnerMiddleware, llm_metrics
+from services.registry_index import episode_index
+from services.scheduler import scheduler
+from services.serialization import FastJSONResponse, json_response
+from services.state_store import StateNotFoundError, episode_store
+from services.tts_cache import tts_cache
 from stages.registry import discover_stages, mount_stage_routers
 from shorts.routes import router as shorts_router
 
@@ -36,7 +47,16 @@ class CatchAllExceptionMiddleware(BaseHTTPMiddleware):
             )
 
 
-app = FastAPI(title="LLS Terminal")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the pooled provider clients on the loop that owns them
+    for provider in http_providers:
+        await provider.aclose()
+        provider.close()
+
+
+app = FastAPI(title="LLS Terminal", default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Order matters: CORS wraps the exception middleware, so CORS headers
 # are added even when the inner middleware catches a 500.
@@ -46,8 +66,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 app.add_middleware(CatchAllExceptionMiddleware)
+app.add_middleware(OwnerMiddleware)
+
+
+@app.exception_handler(StateNotFoundError)
+async def state_not_found_handler(request: Request, exc: StateNotFoundError):
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+
+@app.exception_handler(LLMTimeoutError)
+async def llm_timeout_handler(request: Request, exc: LLMTimeoutError):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.exception_handler(LLMOutputError)
+async def llm_output_handler(request: Request, exc: LLMOutputError):
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
 
 stages = discover_stages()
 mount_stage_routers(app, stages)
@@ -72,17 +110,71 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/metrics/llm")
+async def get_llm_metrics():
+    return {**await asyncio.to_thread(llm_metrics.summary), "json": json_stats}
+
+
+@app.get("/api/metrics/llm-cache")
+async def llm_cache_stats():
+    return llm_cache.summary()
+
+
+@app.get("/api/metrics/tts-cache")
+async def tts_cache_stats():
+    return tts_cache.summary()
+
+
+@app.get("/api/metrics/http")
+async def http_stats():
+    return {p.name: p.summary() for p in http_providers}
+
+
+@app.get("/api/metrics/scheduler")
+async def scheduler_stats():
+    return scheduler.summary()
+
+
 @app.get("/api/stages")
 async def list_stages():
     return [s.metadata().model_dump() for s in stages]
 
 
+def _registry_response(registry: AssetRegistry, request: Request) -> Response:
+    etag = registry.etag
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response = json_response(registry.payload())
+    response.headers["ETag"] = etag
+    return response
+
+
+@app.get("/api/registries/characters")
+async def get_character_registry(request: Request):
+    return _registry_response(character_registry, request)
+
+
+@app.get("/api/registries/settings")
+async def get_setting_registry(request: Request):
+    return _registry_response(setting_registry, request)
+
+
 @app.get("/api/episodes", response_model=list[EpisodeSummary])
-async def list_episodes():
-    registry_path = EPISODES_DIR / "registry.json"
-    if not registry_path.exists():
-        return []
-    return json.loads(registry_path.read_text(encoding="utf-8"))
+async def list_episodes(
+    response: Response,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    day: str | None = None,
+    completed: bool | None = None,
+    current_stage: str | None = None,
+):
+    """Episodes in creation order. Pass `limit` to page; the next page's cursor is in X-Next-Cursor."""
+    page, next_cursor = episode_index.page(
+        cursor, limit, day=day, completed=completed, current_stage=current_stage,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
 
 
 class CreateEpisodeRequest(BaseModel):
@@ -91,48 +183,44 @@ class CreateEpisodeRequest(BaseModel):
 
 @app.post("/api/episodes", response_model=EpisodeSummary)
 async def create_episode(req: CreateEpisodeRequest):
-    registry_path = EPISODES_DIR / "registry.json"
-    registry: list[dict] = json.loads(registry_path.read_text(encoding="utf-8")) if registry_path.exists() else []
-
-    ep_num = len(registry) + 1
-    ep_id = f"ep_{ep_num:03d}"
-    ep_dir = EPISODES_DIR / ep_id
-    ep_dir.mkdir(parents=True, exist_ok=True)
-
+    ep_num, ep_id = await asyncio.to_thread(episode_index.allocate)
     state = EpisodeState(id=ep_id, current_stage="stage_0_context")
-    (ep_dir / "state.json").write_text(state.model_dump_json(indent=2), encoding="utf-8")
+    episode_store.create(ep_id, state)
 
     summary = EpisodeSummary(
         id=ep_id,
         title=req.title or f"Episode {ep_num}",
         summary="",
         date=datetime.now().isoformat(),
+        current_stage=state.current_stage,
     )
-    registry.append(summary.model_dump())
-    registry_path.write_text(json.dumps(registry, indent=2), encoding="utf-8")
+    await asyncio.to_thread(episode_index.add, summary)
 
     return summary
 
 
 @app.get("/api/episodes/{ep_id}")
 async def get_episode(ep_id: str):
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-    return json.loads(state_path.read_text(encoding="utf-8"))
+    return json_response(episode_store.load(ep_id))
+
+
+@app.get("/api/episodes/{ep_id}/history")
+async def get_episode_history(ep_id: str):
+    return episode_store.history(ep_id)
+
+
+@app.get("/api/episodes/{ep_id}/metrics/llm")
+async def get_episode_llm_metrics(ep_id: str):
+    """LLM calls made for this episode, rolled up per task, plus the most recent ones."""
+    return await asyncio.to_thread(llm_metrics.owner_summary, ep_id)
 
 
 @app.delete("/api/episodes/{ep_id}")
 async def delete_episode(ep_id: str):
-    registry_path = EPISODES_DIR / "registry.json"
-    registry: list[dict] = json.loads(registry_path.read_text(encoding="utf-8")) if registry_path.exists() else []
-
-    if not any(ep["id"] == ep_id for ep in registry):
+    if not await asyncio.to_thread(episode_index.remove, ep_id):
         raise HTTPException(404, f"Episode {ep_id} not found")
 
-    registry = [ep for ep in registry if ep["id"] != ep_id]
-    registry_path.write_text(json.dumps(registry, indent=2), encoding="utf-8")
-
+    episode_store.delete(ep_id)
     ep_dir = EPISODES_DIR / ep_id
     if ep_dir.exists():
         shutil.rmtree(ep_dir)
@@ -159,13 +247,8 @@ async def unapprove_stage(ep_id: str, req: UnapproveRequest):
     if not field:
         raise HTTPException(400, f"Unknown stage: {req.stage}")
 
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-
-    data = json.loads(state_path.read_text(encoding="utf-8"))
-    data[field]["approved"] = False
-    data["current_stage"] = req.stage
-    state_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    async with episode_store.transaction(ep_id) as state:
+        getattr(state, field).approved = False
+        state.current_stage = req.stage
 
     return {"stage": req.stage, "approved": False}
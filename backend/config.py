@@ -6,10 +6,48 @@ load_dotenv(Path(__file__).resolve().parent.parent / ".env")
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-5-20250929")
+ANTHROPIC_FAST_MODEL = os.getenv("ANTHROPIC_FAST_MODEL", "claude-haiku-4-5-20251001")
+# Model per LLM task (the `task=` argument of services/llm.py); tasks not
+# listed use ANTHROPIC_MODEL. Values may be a model id or "sonnet"/"haiku".
+# Override or extend with LLM_TASK_MODELS="emotions=sonnet,word_list=haiku".
+LLM_TASK_MODELS = {
+    "emotions": "haiku",
+    "title": "haiku",
+    "fix_title": "haiku",
+    "thumbnail_prompt": "haiku",
+    "synopsis": "haiku",
+}
+LLM_TASK_MODELS.update(
+    item.strip().split("=", 1) for item in os.getenv("LLM_TASK_MODELS", "").split(",") if "=" in item
+)
+# Max Claude requests in flight at once, and per-request timeout in seconds
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "300"))
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
+# Max ElevenLabs requests in flight at once; match your plan's concurrency limit
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4"))
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 BFL_API_KEY = os.getenv("BFL_API_KEY", "")
 BFL_MODEL = os.getenv("BFL_MODEL", "flux-2-pro")
+# Pooled ElevenLabs/BFL clients (services/http_clients.py): connections kept
+# per provider, and retries of 429/5xx with jittered exponential backoff
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_RETRY_BASE_S = float(os.getenv("HTTP_RETRY_BASE_S", "0.5"))
+HTTP_RETRY_MAX_S = float(os.getenv("HTTP_RETRY_MAX_S", "30"))
+# Per-provider limits for services/scheduler.py: (max calls in flight,
+# requests per minute; 0 = no rate limit). Override or extend with
+# PROVIDER_LIMITS="elevenlabs=8/300,bfl=2/30".
+PROVIDER_LIMITS: dict[str, tuple[int, float]] = {
+    "anthropic": (LLM_MAX_CONCURRENCY, 50),
+    "elevenlabs": (TTS_MAX_CONCURRENCY, 0),  # limits concurrency, not request rate
+    "openai": (2, 20),
+    "bfl": (4, 60),
+}
+PROVIDER_LIMITS.update(
+    (name.strip(), (int(limit.split("/")[0]), float(limit.split("/")[1]) if "/" in limit else 0.0))
+    for name, limit in (item.split("=", 1) for item in os.getenv("PROVIDER_LIMITS", "").split(",") if "=" in item)
+)
 
 BACKEND_DIR = Path(__file__).resolve().parent
 CHARACTERS_DIR = BACKEND_DIR / "characters"
@@ -18,3 +56,32 @@ EPISODES_DIR = BACKEND_DIR / "episodes"
 TEMPLATES_DIR = BACKEND_DIR / "templates"
 SHORTS_DIR = BACKEND_DIR / "shorts_data"
 SHORTS_CODE_DIR = BACKEND_DIR / "shorts"
+
+# On-disk cache for Claude responses that are safe to replay (seed checks,
+# titles, emotion suggestions). Size-bounded (LRU) and expired after the TTL.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "no")
+LLM_CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", str(BACKEND_DIR / ".llm_cache")))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "100"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+# Content-addressed cache of ElevenLabs audio, keyed by voice, text, model,
+# voice settings and speed. Hits are hard-linked into the episode/short.
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") not in ("0", "false", "no")
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", str(BACKEND_DIR / ".tts_cache")))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))
+
+# Decoded clip audio kept in memory by the export mixer (services/audio_mixer.py),
+# so re-exporting only decodes clips that changed
+AUDIO_MIX_CACHE_MB = int(os.getenv("AUDIO_MIX_CACHE_MB", "256"))
+
+# Log of every LLM call (latency, tokens, outcome) behind /api/metrics/llm;
+# roughly the newest LLM_METRICS_KEEP calls are kept
+LLM_METRICS_PATH = Path(os.getenv("LLM_METRICS_PATH", str(BACKEND_DIR / "llm_calls.jsonl")))
+LLM_METRICS_KEEP = int(os.getenv("LLM_METRICS_KEEP", "20000"))
+
+# State storage backend: "json" (one state.json per episode/short),
+# "sqlite" (row-per-item tables in STATE_DB_PATH, see services/sqlite_state.py)
+# or "journal" (snapshot + append-only mutation log, see services/journal_state.py)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "json")
+STATE_DB_PATH = Path(os.getenv("STATE_DB_PATH", str(BACKEND_DIR / "state.db")))
+STATE_JOURNAL_COMPACT_EVERY = int(os.getenv("STATE_JOURNAL_COMPACT_EVERY", "200"))
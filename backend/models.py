@@ -9,6 +9,9 @@ class EpisodeSummary(BaseModel):
     title: str
     summary: str = ""
     date: str = ""
+    idea: str = ""  # live script.idea, used when summary is blank
+    current_stage: str = "stage_0_context"
+    completed: bool = False
 
 
 class ScriptLine(BaseModel):
@@ -33,13 +36,18 @@ class ScriptData(BaseModel):
     idea: str = ""
     lines: list[ScriptLine] = []
     approved: bool = False
+    # Lines of a streamed script, saved as they arrive; they replace `lines` once it completes
+    draft_lines: list[ScriptLine] = []
 
 
 class TTSLineStatus(BaseModel):
     line_id: str
     audio_file: str = ""
-    duration_ms: int = 0
+    duration_ms: int = 0  # as played, i.e. raw_duration_ms / tempo
     generated: bool = False
+    raw_duration_ms: int = 0  # length of the file; 0 for older audio with the tempo baked in
+    api_speed: float = 1.0  # speed ElevenLabs generated the file at
+    tempo: float = 1.0  # speed-up applied when rendering (tts.speed / api_speed)
 
 
 class TTSData(BaseModel):
@@ -77,6 +85,9 @@ class TimelineClip(BaseModel):
     order: int = 0
     zoom_start: float = 1.0
     zoom_end: float = 1.1
+    tempo: float = 1.0  # audio clips: speed-up applied in the final mix
+    source_in_ms: int = 0  # audio clips: part of the file played, in file time (before tempo)
+    source_out_ms: int = 0  # 0 = to the end of the file
 
 
 class IntroData(BaseModel):
@@ -87,7 +98,10 @@ class IntroData(BaseModel):
     tts_text: str = ""
     image_file: str = ""
     audio_file: str = ""
-    audio_duration_ms: int = 0
+    audio_duration_ms: int = 0  # as played, i.e. audio_raw_duration_ms / audio_tempo
+    audio_raw_duration_ms: int = 0
+    audio_api_speed: float = 1.0
+    audio_tempo: float = 1.0
     tts_generated: bool = False
     image_uploaded: bool = False
     speed: float = 1.0
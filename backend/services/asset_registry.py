@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from config import BACKEND_DIR, CHARACTERS_DIR, SETTINGS_DIR
+from services.serialization import loads
+
+log = logging.getLogger(__name__)
+
+# How often registries and their reference images are re-checked on disk
+POLL_INTERVAL_S = 2.0
+
+
+class ReferenceInfo(BaseModel):
+    """A registry entry's `reference` image, resolved against the backend dir."""
+
+    path: str
+    abs_path: str
+    exists: bool = False
+    size: int = 0
+    width: int = 0
+    height: int = 0
+    sha256: str = ""
+
+
+def _stat_key(path: Path) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _describe(rel_path: str, abs_path: Path) -> ReferenceInfo:
+    info = ReferenceInfo(path=rel_path, abs_path=str(abs_path))
+    if not abs_path.is_file():
+        return info
+    data = abs_path.read_bytes()
+    info.exists = True
+    info.size = len(data)
+    info.sha256 = hashlib.sha256(data).hexdigest()
+    try:
+        from PIL import Image
+        with Image.open(abs_path) as img:
+            info.width, info.height = img.size
+    except Exception as e:
+        log.warning(f"Could not read image size of {abs_path}: {e}")
+    return info
+
+
+class AssetRegistry:
+    """A character or setting `registry.json`, kept in memory and hot-reloaded.
+
+    The file is polled at most every POLL_INTERVAL_S (on access, no watcher
+    thread) and re-parsed only when its (mtime, size) changes. Each entry's
+    `reference` image is resolved once to a ReferenceInfo — absolute path,
+    existence, size, pixel dimensions and sha256 — and re-described only
+    when that image changes. `etag` changes whenever the registry or any
+    reference image does.
+
+    `entries()` returns a shared dict; callers must not mutate it.
+    """
+
+    def __init__(self, path: Path, base_dir: Path = BACKEND_DIR):
+        self.path = path
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._key: tuple | None = None
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._refs: dict[str, tuple[tuple[int, int] | None, ReferenceInfo]] = {}
+        self._etag = ""
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < POLL_INTERVAL_S and self._key is not None:
+            return
+        self._checked_at = now
+
+        key = _stat_key(self.path)
+        if key != (self._key[0] if self._key else None):
+            self._entries = loads(self.path.read_bytes()) if key else {}
+            log.info(f"Loaded {len(self._entries)} entries from {self.path}")
+
+        ref_keys = []
+        for entry in self._entries.values():
+            rel = entry.get("reference")
+            if rel:
+                ref_keys.append(self._resolve(rel))
+        new_key = (key, tuple(ref_keys))
+        if new_key != self._key:
+            self._key = new_key
+            digest = hashlib.sha256(repr(key).encode())
+            for rel in sorted({e["reference"] for e in self._entries.values() if e.get("reference")}):
+                digest.update(f"{rel}:{self._refs[rel][1].sha256}".encode())
+            self._etag = f'"{digest.hexdigest()[:32]}"'
+
+    def _resolve(self, rel_path: str) -> tuple[int, int] | None:
+        abs_path = self.base_dir / rel_path
+        key = _stat_key(abs_path)
+        cached = self._refs.get(rel_path)
+        if not cached or cached[0] != key:
+            self._refs[rel_path] = (key, _describe(rel_path, abs_path))
+        return key
+
+    # --- Reads ---
+
+    def entries(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._entries
+
+    def get(self, entry_id: str) -> dict[str, Any] | None:
+        return self.entries().get(entry_id)
+
+    @property
+    def etag(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._etag
+
+    def reference(self, rel_path: str) -> ReferenceInfo:
+        """Resolve a `reference` value (e.g. "characters/steven/1.png")."""
+        with self._lock:
+            self._refresh()
+            cached = self._refs.get(rel_path)
+            if cached is None:
+                self._resolve(rel_path)
+                cached = self._refs[rel_path]
+            return cached[1]
+
+    def reference_file(self, entry: dict[str, Any] | None) -> str | None:
+        """Absolute path of an entry's reference image, or None if it has none on disk."""
+        if not entry or not entry.get("reference"):
+            return None
+        info = self.reference(entry["reference"])
+        return info.abs_path if info.exists else None
+
+    def payload(self) -> dict[str, dict[str, Any]]:
+        """Entries with their resolved `reference_info`, for the API."""
+        with self._lock:
+            self._refresh()
+            return {
+                entry_id: {
+                    **entry,
+                    **({"reference_info": self._refs[entry["reference"]][1].model_dump()} if entry.get("reference") else {}),
+                }
+                for entry_id, entry in self._entries.items()
+            }
+
+
+character_registry = AssetRegistry(CHARACTERS_DIR / "registry.json")
+setting_registry = AssetRegistry(SETTINGS_DIR / "registry.json")
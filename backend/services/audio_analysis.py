@@ -0,0 +1,219 @@
+"""Waveform peaks, loudness and silence bounds of audio clips, computed once per file.
+
+A clip is decoded to mono float32 (16-bit WAV natively, anything else via
+ffmpeg) and analysed with NumPy:
+
+  peaks     min/max per bin at 100, 25 and 6.25 bins per second, as int8
+  loudness  integrated loudness in LUFS, EBU R128 style (K-weighting,
+            400 ms blocks with 75% overlap, -70 LUFS absolute and -10 LU
+            relative gates)
+  speech    first and last 10 ms frame above SILENCE_DBFS
+
+Results are stored next to the clip as `<name>.analysis.npz` and reused
+until the clip's size or mtime changes.
+"""
+
+import io
+import logging
+import subprocess
+import wave
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel
+
+from services.fs import atomic_write
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000  # ffmpeg-decoded clips are resampled to this
+PEAK_BINS_MS = (10, 40, 160)
+SILENCE_DBFS = -45.0
+_FRAME_MS = 10
+
+
+class AudioAnalysis(BaseModel):
+    duration_ms: int
+    loudness_lufs: float | None  # None for silence
+    peak_dbfs: float | None  # None for silence
+    speech_start_ms: int  # leading silence ends here
+    speech_end_ms: int  # trailing silence starts here
+
+
+def analysis_path(path: Path) -> Path:
+    return path.with_suffix(".analysis.npz")
+
+
+def get_analysis(path: Path) -> AudioAnalysis:
+    data = _load(path)
+    return AudioAnalysis(**{k: data[k] for k in AudioAnalysis.model_fields})
+
+
+def get_peaks(path: Path, per_second: float = 100) -> tuple[float, np.ndarray]:
+    """(bins per second, int8 array of shape (n, 2) holding each bin's min and max).
+
+    Picks the coarsest stored resolution that still has `per_second` bins.
+    """
+    data = _load(path)
+    bin_ms = next((ms for ms in reversed(PEAK_BINS_MS) if 1000 / ms >= per_second), PEAK_BINS_MS[0])
+    return 1000 / bin_ms, data[f"peaks_{bin_ms}"]
+
+
+def _load(path: Path) -> dict:
+    st = path.stat()
+    return _cached(str(path), st.st_size, st.st_mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _cached(path: str, size: int, mtime_ns: int) -> dict:
+    cache = analysis_path(Path(path))
+    try:
+        with np.load(cache, allow_pickle=False) as npz:
+            if int(npz["source_size"]) == size and int(npz["source_mtime_ns"]) == mtime_ns:
+                return _unpack(npz)
+    except (FileNotFoundError, OSError, KeyError, ValueError):
+        pass
+
+    samples, rate = decode(Path(path))
+    arrays = analyze(samples, rate)
+    buf = io.BytesIO()
+    np.savez(buf, source_size=size, source_mtime_ns=mtime_ns, **arrays)
+    try:
+        atomic_write(cache, buf.getvalue())
+    except OSError as e:
+        log.warning(f"Could not store audio analysis for {path}: {e}")
+    return _unpack(arrays)
+
+
+def _unpack(arrays) -> dict:
+    data = {k: arrays[k] for k in arrays if k.startswith("peaks_")}
+    data.update(
+        duration_ms=int(arrays["duration_ms"]),
+        loudness_lufs=None if np.isnan(arrays["loudness_lufs"]) else round(float(arrays["loudness_lufs"]), 2),
+        peak_dbfs=None if np.isinf(arrays["peak_dbfs"]) else round(float(arrays["peak_dbfs"]), 2),
+        speech_start_ms=int(arrays["speech_start_ms"]),
+        speech_end_ms=int(arrays["speech_end_ms"]),
+    )
+    return data
+
+
+def decode(path: Path) -> tuple[np.ndarray, int]:
+    """Mono float32 samples in [-1, 1] and their sample rate."""
+    try:
+        with wave.open(str(path), "rb") as w:
+            if w.getsampwidth() == 2:
+                raw = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+                samples = raw.reshape(-1, w.getnchannels()).mean(axis=1) / 32768.0
+                return samples.astype(np.float32), w.getframerate()
+    except (wave.Error, EOFError):
+        pass  # not a WAV file
+
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-v", "error", "-i", str(path), "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+            capture_output=True,
+        )
+    except FileNotFoundError:
+        raise RuntimeError(f"ffmpeg is needed to decode {path.name}")
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {path}: {result.stderr.decode(errors='replace')}")
+    return np.frombuffer(result.stdout, dtype="<f4"), SAMPLE_RATE
+
+
+def analyze(samples: np.ndarray, rate: int) -> dict[str, np.ndarray]:
+    """All analysis results for `samples` as arrays, ready for `np.savez`."""
+    arrays = {f"peaks_{ms}": _peaks(samples, rate * ms // 1000) for ms in PEAK_BINS_MS}
+    peak = float(np.abs(samples).max()) if samples.size else 0.0
+    start_ms, end_ms = _speech_bounds(samples, rate)
+    arrays.update(
+        duration_ms=np.int64(round(samples.size * 1000 / rate)),
+        loudness_lufs=np.float64(integrated_loudness(samples, rate)),
+        peak_dbfs=np.float64(20 * np.log10(peak) if peak > 0 else -np.inf),
+        speech_start_ms=np.int64(start_ms),
+        speech_end_ms=np.int64(end_ms),
+    )
+    return arrays
+
+
+def _frames(samples: np.ndarray, size: int) -> np.ndarray:
+    """`samples` cut into rows of `size`, the last one zero-padded."""
+    n = -(-samples.size // size)
+    padded = np.zeros(n * size, dtype=np.float32)
+    padded[:samples.size] = samples
+    return padded.reshape(n, size)
+
+
+def _peaks(samples: np.ndarray, bin_size: int) -> np.ndarray:
+    if not samples.size:
+        return np.zeros((0, 2), dtype=np.int8)
+    frames = _frames(samples, bin_size)
+    minmax = np.stack([frames.min(axis=1), frames.max(axis=1)], axis=1)
+    return np.round(np.clip(minmax, -1, 1) * 127).astype(np.int8)
+
+
+def _speech_bounds(samples: np.ndarray, rate: int) -> tuple[int, int]:
+    if not samples.size:
+        return 0, 0
+    frames = _frames(samples, rate * _FRAME_MS // 1000)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    loud = np.flatnonzero(rms > 10 ** (SILENCE_DBFS / 20))
+    if not loud.size:
+        return 0, 0
+    duration_ms = round(samples.size * 1000 / rate)
+    return int(loud[0]) * _FRAME_MS, min(duration_ms, (int(loud[-1]) + 1) * _FRAME_MS)
+
+
+def _biquad_response(b: tuple[float, ...], a: tuple[float, ...], z: np.ndarray, z2: np.ndarray) -> np.ndarray:
+    """H at z^-1 = `z` (and z^-2 = `z2`)."""
+    return (b[0] + b[1] * z + b[2] * z2) / (a[0] + a[1] * z + a[2] * z2)
+
+
+def _k_weighting(rate: int, freqs: np.ndarray) -> np.ndarray:
+    """|H|^2 of the BS.1770 K-weighting filter (high shelf + high pass) at `freqs` Hz."""
+    z = np.exp(-2j * np.pi * freqs / rate)
+    z2 = z * z
+
+    # Stage 1: +4 dB high shelf around 1.5 kHz (head diffraction)
+    A, w0 = 10 ** (4.0 / 40), 2 * np.pi * 1500 / rate
+    alpha = np.sin(w0) / (2 / np.sqrt(2))
+    cos, root = np.cos(w0), 2 * np.sqrt(A) * alpha
+    shelf = _biquad_response(
+        (A * ((A + 1) + (A - 1) * cos + root), -2 * A * ((A - 1) + (A + 1) * cos), A * ((A + 1) + (A - 1) * cos - root)),
+        ((A + 1) - (A - 1) * cos + root, 2 * ((A - 1) - (A + 1) * cos), (A + 1) - (A - 1) * cos - root),
+        z, z2,
+    )
+    # Stage 2: high pass at 38 Hz (RLB weighting)
+    w0 = 2 * np.pi * 38 / rate
+    alpha, cos = np.sin(w0) / (2 * 0.5), np.cos(w0)
+    high_pass = _biquad_response(((1 + cos) / 2, -(1 + cos), (1 + cos) / 2), (1 + alpha, -2 * cos, 1 - alpha), z, z2)
+    return np.abs(shelf * high_pass) ** 2
+
+
+def integrated_loudness(samples: np.ndarray, rate: int) -> float:
+    """Gated loudness in LUFS (NaN if every block is below the absolute gate).
+
+    The K-weighting is applied in the frequency domain over the whole clip
+    (padded so the filters' tails do not wrap around); block energies then
+    come from a cumulative sum of the squared, filtered signal.
+    """
+    block, hop = int(0.4 * rate), int(0.1 * rate)
+    if samples.size < block:
+        return float("nan")
+    # At least one second of padding, rounded up to a fast FFT size
+    n = 1 << (samples.size + rate - 1).bit_length()
+    spectrum = np.fft.rfft(samples.astype(np.float64), n)
+    filtered = np.fft.irfft(spectrum * np.sqrt(_k_weighting(rate, np.fft.rfftfreq(n, 1 / rate))), n)[:samples.size]
+
+    energy = np.concatenate([[0.0], np.cumsum(filtered ** 2)])
+    starts = np.arange(0, samples.size - block + 1, hop)
+    power = (energy[starts + block] - energy[starts]) / block
+    with np.errstate(divide="ignore"):
+        block_lufs = -0.691 + 10 * np.log10(power)
+
+    gated = power[block_lufs > -70]
+    if not gated.size:
+        return float("nan")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10
+    gated = power[(block_lufs > -70) & (block_lufs > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
@@ -0,0 +1,197 @@
+"""Mix audio clips into one stem with NumPy instead of an ffmpeg adelay/amix graph.
+
+Each clip is decoded by ffmpeg once, with its trim and tempo applied, to
+stereo float32 PCM at MIX_RATE (mono clips are copied to both channels, as
+amix did, and stereo music and SFX stay intact). Decoded clips stay in a
+byte-bounded LRU cache keyed by (path, size, mtime, trim, tempo), so
+re-exporting a timeline only decodes clips that changed. The clips are then
+summed at their start offsets one MIX_CHUNK_FRAMES chunk at a time (one
+slice add per clip and chunk it overlaps) and each chunk is written straight
+to a 16-bit stereo WAV, so memory stays bounded by the decoded clips rather
+than the length of the export. The video mux takes that WAV as its only
+audio input.
+"""
+
+import os
+import subprocess
+import threading
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+from pydantic import BaseModel
+
+from config import AUDIO_MIX_CACHE_MB
+
+MIX_RATE = 44100  # ElevenLabs' mp3_44100 output, so TTS clips are not resampled
+MIX_CHANNELS = 2
+MIX_CHUNK_FRAMES = MIX_RATE * 10  # 10 s, 3.5 MB of float32 stereo
+
+
+def atempo_prefix(tempo: float) -> str:
+    """Filter chain (with a trailing comma) that speeds audio up by `tempo`, or "" for 1.0.
+
+    atempo preserves pitch but only accepts values in [0.5, 100.0], so for
+    factors below 0.5 we chain multiple atempo filters.
+    """
+    if abs(tempo - 1.0) < 0.001:
+        return ""
+    filters = []
+    remaining = tempo
+    while remaining < 0.5:
+        filters.append("atempo=0.5")
+        remaining /= 0.5
+    filters.append(f"atempo={remaining:.4f}")
+    return ",".join(filters) + ","
+
+
+def atrim_prefix(source_in_ms: int = 0, source_out_ms: int = 0) -> str:
+    """Filter chain (with a trailing comma) that keeps only [in, out) of the input, or "" for all of it.
+
+    `source_out_ms` 0 means the end of the file.
+    """
+    if not source_in_ms and not source_out_ms:
+        return ""
+    trim = f"atrim=start={source_in_ms / 1000:.3f}"
+    if source_out_ms:
+        trim += f":end={source_out_ms / 1000:.3f}"
+    return trim + ",asetpts=PTS-STARTPTS,"
+
+
+class MixClip(BaseModel):
+    """One clip placed on the mix."""
+
+    path: Path
+    start_ms: int
+    tempo: float = 1.0
+    source_in_ms: int = 0  # part of the file to play, before tempo
+    source_out_ms: int = 0  # 0 = to the end of the file
+
+
+class PCMCache:
+    """Decoded clips by (path, size, mtime, trim, tempo), least recently used evicted first."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def key(self, clip: MixClip) -> tuple:
+        st = os.stat(clip.path)
+        return (str(clip.path), st.st_size, st.st_mtime_ns, clip.source_in_ms, clip.source_out_ms, round(clip.tempo, 4))
+
+    def get(self, key: tuple) -> np.ndarray | None:
+        with self._lock:
+            pcm = self._items.get(key)
+            if pcm is None:
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return pcm
+
+    def put(self, key: tuple, pcm: np.ndarray) -> None:
+        if pcm.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = pcm
+            self._bytes += pcm.nbytes
+            while self._bytes > self.max_bytes:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= old.nbytes
+                self.stats["evictions"] += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {**self.stats, "clips": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+def decode(clip: MixClip) -> np.ndarray:
+    """The clip as it plays: trimmed, at its tempo, float32 frames of MIX_CHANNELS at MIX_RATE."""
+    filters = atrim_prefix(clip.source_in_ms, clip.source_out_ms) + atempo_prefix(clip.tempo)
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "error",
+            "-i", str(clip.path),
+            *(["-af", filters.rstrip(",")] if filters else []),
+            "-f", "f32le", "-ac", str(MIX_CHANNELS), "-ar", str(MIX_RATE),
+            "-",
+        ],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {clip.path}: {result.stderr.decode(errors='replace')}")
+    return np.frombuffer(result.stdout, dtype="<f4").reshape(-1, MIX_CHANNELS)
+
+
+def _load(clip: MixClip) -> np.ndarray:
+    key = pcm_cache.key(clip)
+    pcm = pcm_cache.get(key)
+    if pcm is None:
+        pcm = decode(clip)
+        pcm_cache.put(key, pcm)
+    return pcm
+
+
+def mix_chunks(clips: list[MixClip], duration_ms: int | None = None) -> Iterator[np.ndarray]:
+    """Sum the clips at their start offsets, yielding the mix in (frames, MIX_CHANNELS) float32 chunks.
+
+    The mix ends with the last clip, or is cut/padded to `duration_ms`.
+    Clips are decoded in parallel (ffmpeg does the work, outside the GIL).
+    Every chunk is the same reused buffer, so consume it before the next.
+    """
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        pcms = list(pool.map(_load, clips))
+
+    placed = sorted(zip((clip.start_ms * MIX_RATE // 1000 for clip in clips), pcms), key=lambda p: p[0])
+    if duration_ms is not None:
+        length = duration_ms * MIX_RATE // 1000
+    else:
+        length = max((start + len(pcm) for start, pcm in placed), default=0)
+
+    buffer = np.empty((MIX_CHUNK_FRAMES, MIX_CHANNELS), dtype=np.float32)
+    active: list[tuple[int, np.ndarray]] = []
+    upcoming = 0
+    for a in range(0, length, MIX_CHUNK_FRAMES):
+        b = min(a + MIX_CHUNK_FRAMES, length)
+        while upcoming < len(placed) and placed[upcoming][0] < b:
+            active.append(placed[upcoming])
+            upcoming += 1
+        active = [(start, pcm) for start, pcm in active if start + len(pcm) > a]
+        out = buffer[:b - a]
+        out.fill(0.0)
+        for start, pcm in active:
+            lo, hi = max(a, start), min(b, start + len(pcm))
+            out[lo - a:hi - a] += pcm[lo - start:hi - start]
+        yield out
+
+
+def write_wav(chunks: Iterable[np.ndarray], path: Path) -> None:
+    """16-bit WAV at MIX_RATE, one chunk at a time; samples summing past full scale are clipped.
+
+    The chunks are scaled in place.
+    """
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(MIX_CHANNELS)
+        w.setsampwidth(2)
+        w.setframerate(MIX_RATE)
+        for chunk in chunks:
+            np.clip(chunk, -1.0, 1.0, out=chunk)
+            chunk *= 32767
+            w.writeframes(chunk.astype("<i2").tobytes())
+
+
+def mix_to_wav(clips: list[MixClip], path: Path, duration_ms: int | None = None) -> Path:
+    """Mix the clips (see `mix_chunks`) and write the result to `path`."""
+    write_wav(mix_chunks(clips, duration_ms), path)
+    return path
+
+
+pcm_cache = PCMCache(AUDIO_MIX_CACHE_MB * 1024 * 1024)
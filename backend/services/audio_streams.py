@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import AsyncIterator
+
+
+class AudioStream:
+    """Audio of one clip while it is being generated, readable by any number of listeners.
+
+    The generator `append`s chunks as they arrive and `close`s the stream at
+    the end; `tail` replays everything received so far and then follows
+    new chunks until the stream is closed.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.closed = False
+        self.opened_at = time.perf_counter()
+        self.first_chunk_at: float | None = None
+        self._changed = asyncio.Condition()
+
+    async def append(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        async with self._changed:
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.perf_counter()
+            self.buffer += chunk
+            self._changed.notify_all()
+
+    async def close(self) -> None:
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+    async def wait_for_audio(self) -> None:
+        """Return once the first chunk has arrived or the stream is closed."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.buffer or self.closed)
+
+    @property
+    def ttfa_ms(self) -> int | None:
+        """Time to first audio: from `open` to the first chunk."""
+        if self.first_chunk_at is None:
+            return None
+        return round((self.first_chunk_at - self.opened_at) * 1000)
+
+    async def tail(self) -> AsyncIterator[bytes]:
+        pos = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.buffer) > pos or self.closed)
+                chunk = bytes(self.buffer[pos:])
+                done = self.closed
+            if chunk:
+                pos += len(chunk)
+                yield chunk
+            elif done:
+                return
+
+
+class AudioStreams:
+    """Clips currently being generated, by key (e.g. `ep_012/line_ab12`)."""
+
+    def __init__(self):
+        self._streams: dict[str, AudioStream] = {}
+
+    def open(self, key: str) -> AudioStream:
+        stream = self._streams[key] = AudioStream()
+        return stream
+
+    def get(self, key: str) -> AudioStream | None:
+        return self._streams.get(key)
+
+    async def release(self, key: str, stream: AudioStream) -> None:
+        """Close `stream` and forget it; listeners still attached read to the end."""
+        await stream.close()
+        if self._streams.get(key) is stream:
+            del self._streams[key]
+
+
+audio_streams = AudioStreams()
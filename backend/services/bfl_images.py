@@ -3,9 +3,9 @@ import logging
 import time
 from pathlib import Path
 
-import httpx
-
 from config import BFL_API_KEY, BFL_MODEL
+from services.http_clients import bfl_http
+from services.scheduler import scheduler
 
 log = logging.getLogger(__name__)
 
@@ -113,13 +113,10 @@ def generate_scene_image(
 
     log.info(f"Prompt: {payload['prompt'][:200]}...")
 
-    # Submit generation request
-    with httpx.Client(timeout=httpx.Timeout(30.0)) as client:
-        submit_resp = client.post(
-            f"{BFL_API_BASE}/{BFL_MODEL}",
-            headers=headers,
-            json=payload,
-        )
+    # Hold a BFL slot from submit until the image is downloaded
+    with scheduler.sync_slot("bfl"):
+        # Submit generation request
+        submit_resp = bfl_http.request("POST", f"{BFL_API_BASE}/{BFL_MODEL}", headers=headers, json=payload)
         submit_resp.raise_for_status()
         task = submit_resp.json()
         polling_url = task["polling_url"]
@@ -132,14 +129,14 @@ def generate_scene_image(
                 raise TimeoutError("BFL image generation timed out after 180s")
 
             time.sleep(1.0)
-            poll_resp = client.get(polling_url, headers=headers)
+            poll_resp = bfl_http.request("GET", polling_url, headers=headers)
             poll_resp.raise_for_status()
             result = poll_resp.json()
 
             if result["status"] == "Ready":
                 image_url = result["result"]["sample"]
                 # Download the image
-                img_resp = client.get(image_url)
+                img_resp = bfl_http.request("GET", image_url)
                 img_resp.raise_for_status()
                 output_path.write_bytes(img_resp.content)
                 return
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator
+
+log = logging.getLogger(__name__)
+
+
+def cache_key(*parts: object) -> str:
+    """Content address for a request: sha256 over its JSON-encoded parts."""
+    blob = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def file_size(path: Path) -> int:
+    """Size of `path`, or 0 if it does not exist."""
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+class DiskCache(ABC):
+    """Size-bounded on-disk cache, sharded as `<root>/<key[:2]>/<key>.*`.
+
+    Subclasses list their entries (`_entries`) and report writes through
+    `_stored`. The running size is computed lazily from disk; when it grows
+    past `max_bytes`, the least recently used entries (by the mtime a hit
+    refreshes) are evicted until the cache is back under 90%.
+    """
+
+    label = "Cache"
+
+    def __init__(self, root: Path, max_bytes: int, enabled: bool = True, extra_stats: tuple[str, ...] = ()):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._total: int | None = None
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, **{name: 0 for name in extra_stats}}
+
+    @abstractmethod
+    def _entries(self) -> Iterator[tuple[float, int, list[Path]]]:
+        """(last used, size counted against max_bytes, files) for every entry on disk."""
+
+    def _count(self, **counts: int) -> None:
+        with self._lock:
+            for stat, n in counts.items():
+                self.stats[stat] += n
+
+    def _size(self) -> int:
+        """Running size; the caller holds `_lock`."""
+        if self._total is None:
+            self._total = sum(size for _, size, _ in self._entries())
+        return self._total
+
+    def _stored(self, new_size: int, old_size: int = 0) -> None:
+        """Account for a write that replaced `old_size` bytes (0 for a new entry) with `new_size`."""
+        with self._lock:
+            self.stats["writes"] += 1
+            if self._total is not None:
+                self._total += new_size - old_size
+            over = self._size() > self.max_bytes
+        if over:
+            self._evict()
+
+    def _discard(self, files: list[Path], size: int) -> None:
+        """Remove one entry's files and take its `size` off the running total."""
+        for path in files:
+            path.unlink(missing_ok=True)
+        with self._lock:
+            if self._total is not None:
+                self._total -= size
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, files in entries:
+            if total <= target:
+                break
+            for path in files:
+                path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._total = total
+            self.stats["evictions"] += evicted
+        log.info(f"{self.label}: evicted {evicted} entries, {total // 1024}KB left")
+
+    def summary(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "enabled": self.enabled,
+                "bytes": self._size() if self.root.exists() else 0,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,10 +1,17 @@
-import json
-import subprocess
+import asyncio
+import os
 from pathlib import Path
+from typing import Awaitable, Callable
 
-import httpx
+from pydantic import BaseModel
 
 from config import ELEVENLABS_API_KEY
+from services.disk_cache import cache_key
+from services.fs import atomic_write
+from services.http_clients import elevenlabs_http
+from services.media_probe import get_audio_duration_ms
+from services.scheduler import scheduler
+from services.tts_cache import tts_cache
 
 ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
 
@@ -13,31 +20,47 @@ ELEVENLABS_SPEED_MIN = 0.7
 ELEVENLABS_SPEED_MAX = 1.2
 
 
-def generate_tts(voice_id: str, text: str, output_path: Path, speed: float = 1.0) -> int:
-    """Generate TTS audio via ElevenLabs API. Returns duration in ms.
+def split_speed(speed: float) -> tuple[float, float]:
+    """(speed sent to the API, tempo left over for render time).
 
-    Speed is split into two stages:
-    - The native ElevenLabs range (0.7-1.2) is sent to the API directly.
-    - Any remaining factor outside that range is applied post-generation
-      via ffmpeg atempo filter, preserving pitch.
+    ElevenLabs only generates 0.7-1.2x natively. Any factor beyond that is
+    returned as a tempo: the saved file stays the raw API output and the
+    tempo is applied (pitch-preserving atempo) when the video is mixed.
     """
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
     speed = max(0.25, min(4.0, speed))
-
     # Clamp the API portion to ElevenLabs' native range
     api_speed = max(ELEVENLABS_SPEED_MIN, min(ELEVENLABS_SPEED_MAX, speed))
-    # Remaining factor to apply via ffmpeg (e.g. speed=0.5, api=0.7 → post=0.5/0.7)
-    post_factor = speed / api_speed
+    # Remaining factor (e.g. speed=0.5, api=0.7 → tempo=0.5/0.7)
+    return api_speed, speed / api_speed
+
+
+class TTSAudio(BaseModel):
+    """A generated clip: the raw file's length and how fast it should play."""
+
+    raw_duration_ms: int
+    api_speed: float  # speed ElevenLabs generated the file at
+    tempo: float = 1.0  # speed-up still to apply when rendering
+
+    @property
+    def duration_ms(self) -> int:
+        """Length as played, i.e. after the tempo is applied."""
+        return round(self.raw_duration_ms / self.tempo)
+
+    def at_speed(self, speed: float) -> "TTSAudio":
+        """The same file played at a new overall `speed` (no regeneration)."""
+        speed = max(0.25, min(4.0, speed))
+        return self.model_copy(update={"tempo": speed / self.api_speed})
 
-    response = httpx.post(
-        f"{ELEVENLABS_API_URL}/text-to-speech/{voice_id}",
-        headers={
+
+def _tts_request(voice_id: str, text: str, api_speed: float) -> dict:
+    return {
+        "url": f"{ELEVENLABS_API_URL}/text-to-speech/{voice_id}",
+        "headers": {
             "xi-api-key": ELEVENLABS_API_KEY,
             "Content-Type": "application/json",
             "Accept": "audio/mpeg",
         },
-        json={
+        "json": {
             "text": text,
             "model_id": "eleven_v3",
             "voice_settings": {
@@ -46,65 +69,103 @@ def generate_tts(voice_id: str, text: str, output_path: Path, speed: float = 1.0
                 "speed": api_speed,
             },
         },
-        timeout=60.0,
-    )
-    response.raise_for_status()
+    }
+
 
-    output_path.write_bytes(response.content)
+def _request_key(request: dict) -> str:
+    """Cache key for a request: voice, text (with emotion tag), model and settings incl. API speed."""
+    return cache_key("tts", request["url"], request["json"])
 
-    # Apply post-generation speed adjustment if needed
-    if abs(post_factor - 1.0) > 0.01:
-        _apply_atempo(output_path, post_factor)
 
+def _save_audio(output_path: Path, content: bytes) -> int:
+    # Replace rather than overwrite: the old file may be a hard link into the TTS cache
+    atomic_write(output_path, content)
     return get_audio_duration_ms(output_path)
 
 
-def _apply_atempo(audio_path: Path, factor: float) -> None:
-    """Adjust audio speed using ffmpeg atempo filter.
+def generate_tts(
+    voice_id: str, text: str, output_path: Path, speed: float = 1.0, refresh: bool = False,
+) -> TTSAudio:
+    """Generate TTS audio via ElevenLabs API.
 
-    atempo only accepts values in [0.5, 100.0], so for factors below 0.5
-    we chain multiple atempo filters.
+    The file is the raw API output at the native part of `speed` (see
+    `split_speed`); the returned TTSAudio carries the tempo still to apply
+    and the duration as played. Identical requests are served from the TTS
+    cache (linked into place) unless `refresh` is set, which asks for a new
+    take and caches that.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    api_speed, tempo = split_speed(speed)
+    request = _tts_request(voice_id, text, api_speed)
+    key = _request_key(request)
+    if refresh or (raw_ms := tts_cache.get(key, output_path)) is None:
+        with scheduler.sync_slot("elevenlabs"):
+            response = elevenlabs_http.request("POST", **request)
+        response.raise_for_status()
+
+        raw_ms = _save_audio(output_path, response.content)
+        tts_cache.put(key, output_path, raw_ms, voice_id=voice_id, text=text)
+    return TTSAudio(raw_duration_ms=raw_ms, api_speed=api_speed, tempo=tempo)
+
+
+async def agenerate_tts(
+    voice_id: str, text: str, output_path: Path, speed: float = 1.0, refresh: bool = False,
+) -> TTSAudio:
+    """Async `generate_tts`.
+
+    Requests go through the scheduler's "elevenlabs" queue (ElevenLabs
+    limits concurrent requests per account). The file write and duration
+    probe run in a worker thread.
     """
-    # Build atempo filter chain — each filter clamped to [0.5, 100.0]
-    filters = []
-    remaining = factor
-    while remaining < 0.5:
-        filters.append("atempo=0.5")
-        remaining /= 0.5
-    filters.append(f"atempo={remaining:.4f}")
-
-    tmp_path = audio_path.with_suffix(".tmp.mp3")
-    subprocess.run(
-        [
-            "ffmpeg", "-y",
-            "-i", str(audio_path),
-            "-af", ",".join(filters),
-            "-c:a", "libmp3lame",
-            "-q:a", "2",
-            str(tmp_path),
-        ],
-        check=True,
-        capture_output=True,
-    )
-    tmp_path.replace(audio_path)
-
-
-def get_audio_duration_ms(path: Path) -> int:
-    """Get audio duration in milliseconds using ffprobe."""
-    result = subprocess.run(
-        [
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_format",
-            str(path),
-        ],
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
-    )
-    if result.returncode != 0:
-        raise RuntimeError(f"ffprobe failed: {result.stderr}")
-    info = json.loads(result.stdout)
-    duration_s = float(info["format"]["duration"])
-    return int(duration_s * 1000)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    api_speed, tempo = split_speed(speed)
+    request = _tts_request(voice_id, text, api_speed)
+    key = _request_key(request)
+    if refresh or (raw_ms := tts_cache.get(key, output_path)) is None:
+        async with scheduler.slot("elevenlabs"):
+            response = await elevenlabs_http.arequest("POST", **request)
+        response.raise_for_status()
+
+        raw_ms = await asyncio.to_thread(_save_audio, output_path, response.content)
+        await asyncio.to_thread(tts_cache.put, key, output_path, raw_ms, voice_id=voice_id, text=text)
+    return TTSAudio(raw_duration_ms=raw_ms, api_speed=api_speed, tempo=tempo)
+
+
+async def agenerate_tts_stream(
+    voice_id: str, text: str, output_path: Path,
+    on_chunk: Callable[[bytes], Awaitable[None]], speed: float = 1.0, refresh: bool = False,
+) -> TTSAudio:
+    """`agenerate_tts` through ElevenLabs' `/stream` endpoint.
+
+    Audio chunks are written to `<output>.part` and handed to `on_chunk` as
+    they arrive, so playback can start before generation ends. When the
+    stream closes the file is renamed into place and its duration measured.
+    A cache hit is handed over as a single chunk.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    api_speed, tempo = split_speed(speed)
+    request = _tts_request(voice_id, text, api_speed)
+    key = _request_key(request)
+    if not refresh and (raw_ms := tts_cache.get(key, output_path)) is not None:
+        await on_chunk(await asyncio.to_thread(output_path.read_bytes))
+        return TTSAudio(raw_duration_ms=raw_ms, api_speed=api_speed, tempo=tempo)
+
+    part_path = output_path.with_name(f"{output_path.name}.part")
+    try:
+        async with scheduler.slot("elevenlabs"):
+            async with elevenlabs_http.astream("POST", **{**request, "url": request["url"] + "/stream"}) as response:
+                response.raise_for_status()
+                with open(part_path, "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
+                        await on_chunk(chunk)
+        # Replace rather than overwrite: the old file may be a hard link into the TTS cache
+        os.replace(part_path, output_path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    raw_ms = await asyncio.to_thread(get_audio_duration_ms, output_path)
+    await asyncio.to_thread(tts_cache.put, key, output_path, raw_ms, voice_id=voice_id, text=text)
+    return TTSAudio(raw_duration_ms=raw_ms, api_speed=api_speed, tempo=tempo)
+
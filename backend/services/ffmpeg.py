@@ -1,30 +1,10 @@
-import json
 import os
 import subprocess
 from pathlib import Path
 
-IS_WINDOWS = os.name == "nt"
-
+from services.audio_mixer import MixClip, mix_to_wav
 
-def get_audio_duration_ms(path: Path) -> int:
-    """Get audio duration in milliseconds using ffprobe."""
-    result = subprocess.run(
-        [
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_format",
-            str(path),
-        ],
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
-    )
-    if result.returncode != 0:
-        raise RuntimeError(f"ffprobe failed: {result.stderr}")
-    info = json.loads(result.stdout)
-    duration_s = float(info["format"]["duration"])
-    return int(duration_s * 1000)
+IS_WINDOWS = os.name == "nt"
 
 
 def build_video(clips: list[dict], episode_dir: Path) -> Path:
@@ -37,6 +17,8 @@ def build_video(clips: list[dict], episode_dir: Path) -> Path:
         start_ms: start time in ms
         duration_ms: duration in ms
         track: "scenes" | "audio"
+        tempo: (audio, optional) speed-up applied to the clip in the mix
+        source_in_ms, source_out_ms: (audio, optional) part of the file to play, before tempo
 
     Returns path to output MP4.
     """
@@ -140,46 +122,35 @@ def build_video(clips: list[dict], episode_dir: Path) -> Path:
         capture_output=True,
     )
 
-    # Step 3: Mix in audio clips
-    if audio_clips:
-        audio_inputs = []
-        filter_parts = []
-        input_idx = 1  # 0 is video
-
-        for ac in audio_clips:
-            audio_path = episode_dir / ac["source_file"]
-            if not audio_path.exists():
-                continue
-            audio_inputs.extend(["-i", str(audio_path)])
-            delay_ms = ac["start_ms"]
-            filter_parts.append(
-                f"[{input_idx}:a]adelay={delay_ms}|{delay_ms}[a{input_idx}]"
-            )
-            input_idx += 1
-
-        if filter_parts:
-            # Mix all audio tracks
-            mix_inputs = "".join(f"[a{i}]" for i in range(1, input_idx))
-            filter_complex = ";".join(filter_parts) + f";{mix_inputs}amix=inputs={input_idx - 1}:dropout_transition=0:normalize=0[aout]"
-
-            subprocess.run(
-                [
-                    "ffmpeg", "-y",
-                    "-i", str(concat_video),
-                    *audio_inputs,
-                    "-filter_complex", filter_complex,
-                    "-map", "0:v",
-                    "-map", "[aout]",
-                    "-c:v", "copy",
-                    "-c:a", "aac",
-                    str(output_path),
-                ],
-                check=True,
-                capture_output=True,
-            )
-        else:
-            # No valid audio, just copy
-            concat_video.rename(output_path)
+    # Step 3: Mix the audio clips into one stem and mux it with the video
+    mix_clips = [
+        MixClip(
+            path=episode_dir / ac["source_file"],
+            start_ms=ac["start_ms"],
+            tempo=ac.get("tempo", 1.0),
+            source_in_ms=ac.get("source_in_ms", 0),
+            source_out_ms=ac.get("source_out_ms", 0),
+        )
+        for ac in audio_clips
+        if (episode_dir / ac["source_file"]).exists()
+    ]
+    if mix_clips:
+        audio_stem = mix_to_wav(mix_clips, episode_dir / "_audio.wav")
+        subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-i", str(concat_video),
+                "-i", str(audio_stem),
+                "-map", "0:v",
+                "-map", "1:a",
+                "-c:v", "copy",
+                "-c:a", "aac",
+                str(output_path),
+            ],
+            check=True,
+            capture_output=True,
+        )
+        audio_stem.unlink(missing_ok=True)
     else:
         concat_video.rename(output_path)
 
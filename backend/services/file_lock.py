@@ -0,0 +1,73 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+
+IS_WINDOWS = os.name == "nt"
+
+if IS_WINDOWS:
+    import msvcrt
+else:
+    import fcntl
+
+POLL_INTERVAL_S = 0.05
+
+
+class FileLock:
+    """Exclusive advisory lock on a file, shared across processes.
+
+    Uses flock on POSIX and msvcrt.locking on Windows. Acquisition polls a
+    non-blocking attempt so the async variant never ties up a thread.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+
+    def _try_acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if IS_WINDOWS:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def acquire(self) -> None:
+        while not self._try_acquire():
+            time.sleep(POLL_INTERVAL_S)
+
+    async def acquire_async(self) -> None:
+        while not self._try_acquire():
+            await asyncio.sleep(POLL_INTERVAL_S)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            if IS_WINDOWS:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    async def __aenter__(self) -> "FileLock":
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
@@ -0,0 +1,263 @@
+"""Shared HTTP clients for the media APIs (ElevenLabs, BFL), one per provider.
+
+Each provider keeps a pooled sync client (for worker threads) and an async
+client (for the event loop), speaking HTTP/2 when the `h2` package is
+installed, so bulk generation reuses warm connections instead of paying a
+TCP + TLS handshake per clip. Requests answered with 429/5xx, or that fail
+to connect, are retried with jittered exponential backoff; a `Retry-After`
+header takes precedence over the computed delay.
+"""
+
+import asyncio
+import email.utils
+import importlib.util
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import httpx
+
+from config import HTTP_MAX_CONNECTIONS, HTTP_MAX_RETRIES, HTTP_RETRY_BASE_S, HTTP_RETRY_MAX_S
+
+log = logging.getLogger(__name__)
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Safe to retry for any method: the request never reached the server
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def retry_after_s(response: httpx.Response) -> float | None:
+    """Seconds to wait according to the response's `Retry-After` header (delta or HTTP date)."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderClient:
+    """Pooled sync + async clients for one API, with retries and connection stats.
+
+    `request`/`arequest` return the final response (callers still
+    `raise_for_status()`); `astream` is the streaming variant and retries
+    only until it hands a response over. Transport errors other than
+    connect failures are only retried for idempotent methods, since a
+    timed-out POST may already have been billed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_retries: int = HTTP_MAX_RETRIES,
+        retry_base_s: float = HTTP_RETRY_BASE_S,
+        retry_max_s: float = HTTP_RETRY_MAX_S,
+    ):
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self._client_kwargs = {
+            "timeout": httpx.Timeout(timeout),
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60.0,
+            ),
+            "http2": HTTP2,
+        }
+        self._client: httpx.Client | None = None
+        # An AsyncClient's connections belong to the loop that opened them,
+        # so there is one per loop; an entry goes away with its loop
+        self._aclients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "retries": 0, "gave_up": 0, "retry_wait_s": 0.0,
+            "connections": 0, "tls_handshakes": 0, "transport_errors": 0,
+        }
+        self.status_counts: dict[str, int] = {}
+        self.http_versions: dict[str, int] = {}
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(**self._client_kwargs)
+            return self._client
+
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            aclient = self._aclients.get(loop)
+            if aclient is None:
+                # Loops that closed without `aclose()` can no longer run their
+                # client's cleanup; dropping it lets the sockets be collected
+                for stale in [l for l in self._aclients if l.is_closed()]:
+                    del self._aclients[stale]
+                aclient = self._aclients[loop] = httpx.AsyncClient(**self._client_kwargs)
+            return aclient
+
+    def close(self) -> None:
+        """Close the sync client's pool; the next request opens a new one."""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Close every async client, each on the loop that owns it.
+
+        Clients of other loops that are still running are closed there;
+        those of loops that already closed are just dropped.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            aclients = list(self._aclients.items())
+            self._aclients.clear()
+        for owner, aclient in aclients:
+            if owner is loop:
+                await aclient.aclose()
+            elif owner.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(aclient.aclose(), owner))
+
+    # --- Stats ---
+
+    def _count(self, stat: str, n: float = 1) -> None:
+        with self._lock:
+            self.stats[stat] += n
+
+    def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            self._count("connections")
+        elif event == "connection.start_tls.complete":
+            self._count("tls_handshakes")
+
+    async def _atrace(self, event: str, info: dict) -> None:
+        self._trace(event, info)
+
+    def _record(self, response: httpx.Response) -> None:
+        code = response.status_code
+        status = str(code) if code in RETRY_STATUSES else f"{code // 100}xx"
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+
+    # --- Retry policy ---
+
+    def _backoff_s(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+        return random.uniform(0, min(self.retry_max_s, self.retry_base_s * 2 ** attempt))
+
+    def _delay(
+        self, method: str, url: str, attempt: int,
+        response: httpx.Response | None = None, error: Exception | None = None,
+    ) -> float | None:
+        """Seconds to wait before retrying, or None if the outcome is final."""
+        if error is not None:
+            self._count("transport_errors")
+            if not isinstance(error, _CONNECT_ERRORS) and method not in _IDEMPOTENT:
+                return None
+        elif response.status_code not in RETRY_STATUSES:
+            return None
+        if attempt >= self.max_retries:
+            self._count("gave_up")
+            return None
+
+        delay = self._backoff_s(attempt)
+        if response is not None and (after := retry_after_s(response)) is not None:
+            delay = min(after, self.retry_max_s)
+        reason = type(error).__name__ if error is not None else response.status_code
+        log.warning(f"{self.name}: {method} {url} -> {reason}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        with self._lock:
+            self.stats["retries"] += 1
+            self.stats["retry_wait_s"] += delay
+        return delay
+
+    # --- Requests ---
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            self._count("requests")
+            try:
+                response = self.client.request(method, url, extensions={"trace": self._trace}, **kwargs)
+            except httpx.TransportError as e:
+                if (delay := self._delay(method, url, attempt, error=e)) is None:
+                    raise
+            else:
+                self._record(response)
+                if (delay := self._delay(method, url, attempt, response=response)) is None:
+                    return response
+                response.close()
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            self._count("requests")
+            try:
+                response = await self.aclient.request(method, url, extensions={"trace": self._atrace}, **kwargs)
+            except httpx.TransportError as e:
+                if (delay := self._delay(method, url, attempt, error=e)) is None:
+                    raise
+            else:
+                self._record(response)
+                if (delay := self._delay(method, url, attempt, response=response)) is None:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    @asynccontextmanager
+    async def astream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """`AsyncClient.stream` with retries up to the point the body starts being read."""
+        for attempt in range(self.max_retries + 1):
+            self._count("requests")
+            handed_over = False
+            try:
+                async with self.aclient.stream(method, url, extensions={"trace": self._atrace}, **kwargs) as response:
+                    self._record(response)
+                    if (delay := self._delay(method, url, attempt, response=response)) is None:
+                        handed_over = True
+                        yield response
+                        return
+            except httpx.TransportError as e:
+                if handed_over or (delay := self._delay(method, url, attempt, error=e)) is None:
+                    raise
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def summary(self) -> dict:
+        with self._lock:
+            requests = self.stats["requests"]
+            return {
+                **self.stats,
+                "retry_wait_s": round(self.stats["retry_wait_s"], 2),
+                # Requests per new connection; > 1 means keep-alive is paying off
+                "reuse_ratio": requests / self.stats["connections"] if self.stats["connections"] else 0.0,
+                "status": dict(self.status_counts),
+                "http_versions": dict(self.http_versions),
+                "http2_available": HTTP2,
+            }
+
+
+elevenlabs_http = ProviderClient("elevenlabs", timeout=60.0)
+bfl_http = ProviderClient("bfl", timeout=30.0)
+
+providers = [elevenlabs_http, bfl_http]
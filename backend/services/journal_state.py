@@ -0,0 +1,269 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from services.fs import atomic_write
+from services.state_store import StateNotFoundError, StateStore, M
+
+JOURNAL_NAME = "state.journal.jsonl"
+HISTORY_NAME = "state.history.jsonl"
+# Written into the snapshot so replay can skip records it already contains
+SEQ_KEY = "_journal_seq"
+
+
+class _Tail:
+    """What we last read or wrote for one state: its document and journal position."""
+
+    def __init__(self, key: tuple, seq: int, doc: dict, entries: int):
+        self.key = key
+        self.seq = seq
+        self.doc = doc
+        self.entries = entries
+
+
+def _diff(old: Any, new: Any, path: list, ops: list) -> None:
+    """Append the mutations that turn `old` into `new` to `ops`."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            if key not in old:
+                ops.append(["set", path + [key], value])
+            elif old[key] != value:
+                _diff(old[key], value, path + [key], ops)
+        for key in old:
+            if key not in new:
+                ops.append(["del", path + [key]])
+    elif isinstance(old, list) and isinstance(new, list):
+        sub: list = []
+        for i in range(min(len(old), len(new))):
+            if old[i] != new[i]:
+                _diff(old[i], new[i], path + [i], sub)
+        for i in range(len(old), len(new)):
+            sub.append(["set", path + [i], new[i]])
+        if len(new) < len(old):
+            sub.append(["trunc", path, len(new)])
+        # Reorders and inserts touch most elements; one replace is smaller
+        if len(sub) > max(1, len(new) // 2):
+            ops.append(["set", path, new])
+        else:
+            ops.extend(sub)
+    else:
+        ops.append(["set", path, new])
+
+
+def _apply(doc: dict, op: list) -> None:
+    kind, path = op[0], op[1]
+    if kind == "trunc":
+        target = doc
+        for key in path:
+            target = target[key]
+        del target[op[2]:]
+        return
+
+    parent = doc
+    for key in path[:-1]:
+        parent = parent[key]
+    key = path[-1]
+    if kind == "set":
+        if isinstance(parent, list) and key == len(parent):
+            parent.append(op[2])
+        else:
+            parent[key] = op[2]
+    elif kind == "del":
+        parent.pop(key, None)
+
+
+def _read_records(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    records = []
+    for raw in path.read_bytes().splitlines():
+        try:
+            records.append(json.loads(raw))
+        except ValueError:
+            # A torn final line from a crash mid-append; everything before it is intact
+            break
+    return records
+
+
+class JournalStateStore(StateStore[M]):
+    """State store that appends small mutation records instead of rewriting state.
+
+    Each item keeps a snapshot in `state.json` plus `state.journal.jsonl`, one
+    line per save listing the paths that changed ("tts.line_statuses.41 =
+    {...}"). Loading reads the snapshot and replays the journal; after
+    `compact_every` records the current state is written back as the new
+    snapshot and the journal starts over. A save therefore costs roughly the
+    size of the edit, not the size of the episode.
+
+    Compacted records are kept, without their values, in `state.history.jsonl`
+    so `history` can still show which change (and which generation, via the
+    `source` passed to `save`/`transaction`) touched which paths.
+    """
+
+    def __init__(self, root: Path, model: type[M], label: str, compact_every: int):
+        super().__init__(root, model, label)
+        self.compact_every = compact_every
+        self._tails: dict[str, _Tail] = {}
+
+    def journal_path(self, item_id: str) -> Path:
+        return self.root / item_id / JOURNAL_NAME
+
+    def history_path(self, item_id: str) -> Path:
+        return self.root / item_id / HISTORY_NAME
+
+    def _key(self, item_id: str) -> tuple:
+        try:
+            st = os.stat(self.path(item_id))
+        except FileNotFoundError:
+            raise StateNotFoundError(f"{self.label} {item_id} not found")
+        try:
+            jt = os.stat(self.journal_path(item_id))
+            journal_key = (jt.st_mtime_ns, jt.st_size)
+        except FileNotFoundError:
+            journal_key = (0, 0)
+        return (st.st_mtime_ns, st.st_size) + journal_key
+
+    # --- StateStore interface ---
+
+    def _load_shared(self, item_id: str) -> M:
+        try:
+            key = self._key(item_id)
+        except StateNotFoundError:
+            self.invalidate(item_id)
+            raise
+
+        with self._lock:
+            cached = self._cache.get(item_id)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        doc = json.loads(self.path(item_id).read_bytes())
+        seq = doc.pop(SEQ_KEY, 0)
+        entries = 0
+        for record in _read_records(self.journal_path(item_id)):
+            if record["seq"] <= seq:
+                continue
+            for op in record["ops"]:
+                _apply(doc, op)
+            seq = record["seq"]
+            entries += 1
+
+        state = self.model.model_validate(doc)
+        with self._lock:
+            self._cache[item_id] = (key, state)
+            self._tails[item_id] = _Tail(key, seq, state.model_dump(mode="json"), entries)
+        return state
+
+    def save(self, item_id: str, state: M, source: str | None = None) -> None:
+        doc = state.model_dump(mode="json")
+        with self._lock:
+            tail = self._tails.get(item_id)
+        try:
+            current_key = self._key(item_id)
+        except StateNotFoundError:
+            current_key = None
+        if tail is None or tail.key != current_key:
+            # Not read through this store, or written elsewhere since: catch up first
+            tail = None
+            if current_key is not None:
+                self._load_shared(item_id)
+                with self._lock:
+                    tail = self._tails.get(item_id)
+
+        if tail is None:
+            self._compact(item_id, state, doc, 0)
+            return
+
+        ops: list = []
+        _diff(tail.doc, doc, [], ops)
+        written = 0
+        seq = tail.seq
+        if ops:
+            seq += 1
+            record = {"seq": seq, "ts": datetime.now().isoformat(), "source": source, "ops": ops}
+            line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            with open(self.journal_path(item_id), "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            written = len(line)
+
+        entries = tail.entries + (1 if ops else 0)
+        if entries >= self.compact_every:
+            with self._lock:
+                self.stats["bytes_written"] += written
+            self._compact(item_id, state, doc, seq)
+            return
+        key = self._key(item_id)
+        with self._lock:
+            self._cache[item_id] = (key, state)
+            self._tails[item_id] = _Tail(key, seq, doc, entries)
+            self.stats["saves"] += 1
+            self.stats["bytes_written"] += written
+
+    def create(self, item_id: str, state: M) -> None:
+        self.path(item_id).parent.mkdir(parents=True, exist_ok=True)
+        self.journal_path(item_id).unlink(missing_ok=True)
+        self._compact(item_id, state, state.model_dump(mode="json"), 0)
+
+    def invalidate(self, item_id: str) -> None:
+        with self._lock:
+            self._cache.pop(item_id, None)
+            self._tails.pop(item_id, None)
+
+    def history(self, item_id: str) -> list[dict]:
+        if not self.path(item_id).exists():
+            raise StateNotFoundError(f"{self.label} {item_id} not found")
+        entries: dict[int, dict] = {}
+        for record in _read_records(self.history_path(item_id)):
+            entries[record["seq"]] = record
+        for record in _read_records(self.journal_path(item_id)):
+            entries[record["seq"]] = _summarize(record)
+        return [entries[seq] for seq in sorted(entries)]
+
+    # --- Compaction ---
+
+    def compact(self, item_id: str) -> None:
+        """Fold the journal into a fresh snapshot."""
+        state = self._load_shared(item_id)
+        with self._lock:
+            tail = self._tails[item_id]
+        self._compact(item_id, state, tail.doc, tail.seq)
+
+    def _compact(self, item_id: str, state: M, doc: dict, seq: int) -> None:
+        journal = self.journal_path(item_id)
+
+        # Keep the audit trail before the records are dropped
+        records = _read_records(journal)
+        if records:
+            lines = "".join(
+                json.dumps(_summarize(r), ensure_ascii=False, separators=(",", ":")) + "\n"
+                for r in records
+            )
+            with open(self.history_path(item_id), "a", encoding="utf-8") as f:
+                f.write(lines)
+
+        data = json.dumps({**doc, SEQ_KEY: seq}, ensure_ascii=False, indent=2).encode("utf-8")
+        atomic_write(self.path(item_id), data)
+        # A crash here leaves records the snapshot already covers; load skips them by seq
+        if journal.exists():
+            atomic_write(journal, b"")
+
+        key = self._key(item_id)
+        with self._lock:
+            self._cache[item_id] = (key, state)
+            self._tails[item_id] = _Tail(key, seq, doc, 0)
+            self.stats["saves"] += 1
+            self.stats["bytes_written"] += len(data)
+
+
+def _summarize(record: dict) -> dict:
+    """A journal record without its values, for the history file."""
+    return {
+        "seq": record["seq"],
+        "ts": record.get("ts", ""),
+        "source": record.get("source"),
+        "paths": [".".join(str(p) for p in op[1]) for op in record["ops"]],
+    }
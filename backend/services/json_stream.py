@@ -0,0 +1,143 @@
+import json
+from typing import Any
+
+_CLOSERS = {"{": "}", "[": "]"}
+# How many cut points `repair_json` tries, newest first
+_MAX_REPAIR_ATTEMPTS = 20
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        first_newline = text.find("\n")
+        last_fence = text.rfind("```")
+        text = text[first_newline + 1:last_fence if last_fence > first_newline else len(text)].strip()
+    return text
+
+
+def repair_json(raw: str) -> Any:
+    """Best-effort parse of a model answer that is not valid JSON as a whole.
+
+    Ignores markdown fences, prose before the first `{`/`[` and anything
+    after the JSON value. If the value is truncated (e.g. the answer hit
+    max_tokens), it is cut back to the last complete element or member and
+    its open containers are closed, so `{"lines": [{..}, {..}, {"te` becomes
+    the first two lines. Raises ValueError if nothing can be recovered.
+    """
+    text = _strip_fences(raw)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("No JSON object or array in the answer")
+    text = text[min(starts):]
+    try:
+        return json.JSONDecoder().raw_decode(text)[0]
+    except ValueError:
+        pass
+
+    # (cut position, open containers) after each complete value. A cut may
+    # leave arrays and member values open, but never an element of an array:
+    # a half-written element is dropped rather than closed early.
+    cuts: list[tuple[int, str]] = []
+    stack: list[str] = []
+    in_string = escape = False
+
+    def mark(pos: int) -> None:
+        if "[" not in stack[:-1]:
+            cuts.append((pos, "".join(stack)))
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+            mark(i + 1)
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if stack:
+                mark(i + 1)
+        elif ch == "," and stack:
+            mark(i)
+
+    for cut, open_containers in reversed(cuts[-_MAX_REPAIR_ATTEMPTS:]):
+        candidate = text[:cut] + "".join(_CLOSERS[c] for c in reversed(open_containers))
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    raise ValueError("Could not recover any complete JSON value from the answer")
+
+
+class ArrayItemParser:
+    """Pull complete objects out of a JSON array while it is still being written.
+
+    Feed text chunks as they arrive; `feed` returns every object, found in an
+    array of `key` (e.g. `{"lines": [{...}, {...}`), that became complete in
+    that chunk. Text around the JSON (such as a markdown fence) is ignored.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._stack: list[str] = []  # open "{" / "[" containers
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = ""  # last complete string, i.e. the key before ":"
+        self._target_depth: int | None = None  # stack depth inside the `key` array
+        self._item_start: int | None = None
+        self._buffer = ""
+        self._pos = 0
+
+    def feed(self, chunk: str) -> list[dict[str, Any]]:
+        self._buffer += chunk
+        items = []
+        text = self._buffer
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch in "{[":
+                if ch == "[" and self._target_depth is None and self._last_string == self.key:
+                    self._target_depth = len(self._stack) + 1
+                elif ch == "{" and len(self._stack) == self._target_depth:
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._item_start is not None and len(self._stack) == self._target_depth:
+                    items.append(json.loads(text[self._item_start:i + 1]))
+                    self._item_start = None
+                elif ch == "]" and self._target_depth is not None and len(self._stack) < self._target_depth:
+                    self._target_depth = -1  # array closed; ignore anything after it
+            i += 1
+
+        # Keep only what an unfinished item still needs
+        keep = i
+        if self._item_start is not None:
+            keep = min(keep, self._item_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if self._item_start is not None:
+            self._item_start -= keep
+        self._string_start -= keep
+        self._buffer = text[keep:]
+        self._pos = i - keep
+        return items
@@ -1,10 +1,72 @@
+import asyncio
 import json
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator
 
 import anthropic
 
-from config import ANTHROPIC_API_KEY, ANTHROPIC_MODEL
+from config import (
+    ANTHROPIC_API_KEY, ANTHROPIC_FAST_MODEL, ANTHROPIC_MODEL, LLM_TASK_MODELS, LLM_TIMEOUT_S,
+)
+from services.disk_cache import cache_key
+from services.json_stream import repair_json
+from services.llm_cache import llm_cache
+from services.llm_metrics import record_call
+from services.scheduler import scheduler
+
+log = logging.getLogger(__name__)
+
+# A plain system prompt, or a list of text blocks (see `system_blocks`)
+System = str | list[dict[str, Any]]
 
 _client: anthropic.Anthropic | None = None
+_async_client: anthropic.AsyncAnthropic | None = None
+
+
+# How many follow-up requests may complete a JSON answer cut off at max_tokens
+MAX_CONTINUATIONS = 2
+# A cut-off tool call can't be continued; it is asked again with twice the
+# budget, up to this many tokens
+MAX_TOOL_TOKENS = 16384
+
+# Outcomes of JSON answers, served at /api/metrics/llm
+json_stats = {
+    "answers": 0,          # agenerate_json/generate_json calls answered by Claude
+    "tool_calls": 0,       # of those, schema-constrained tool answers
+    "truncated": 0,        # answers that stopped at max_tokens
+    "continuations": 0,    # follow-up requests for a missing tail
+    "continued": 0,        # answers that parsed after continuing
+    "tool_retries": 0,     # tool answers asked again with a larger budget
+    "parse_failures": 0,   # answers that still were not valid JSON
+    "repaired": 0,         # of those, recovered by repair_json
+    "failed": 0,           # answers nothing could be recovered from
+}
+# generate_json runs in worker threads, agenerate_json on the event loop
+_json_stats_lock = threading.Lock()
+
+
+def _count_json(stat: str) -> None:
+    with _json_stats_lock:
+        json_stats[stat] += 1
+
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when a Claude request takes longer than its timeout."""
+
+
+class LLMOutputError(ValueError):
+    """Raised when Claude's answer cannot be turned into the requested JSON."""
+
+
+MODEL_ALIASES = {"sonnet": ANTHROPIC_MODEL, "haiku": ANTHROPIC_FAST_MODEL}
+
+
+def model_for(task: str | None) -> str:
+    """Model that serves `task`, per LLM_TASK_MODELS (ANTHROPIC_MODEL if unlisted)."""
+    model = LLM_TASK_MODELS.get(task, ANTHROPIC_MODEL) if task else ANTHROPIC_MODEL
+    return MODEL_ALIASES.get(model, model)
 
 
 def get_client() -> anthropic.Anthropic:
@@ -14,19 +76,43 @@ def get_client() -> anthropic.Anthropic:
     return _client
 
 
-def generate(system: str, user: str, max_tokens: int = 4096) -> str:
-    client = get_client()
-    response = client.messages.create(
-        model=ANTHROPIC_MODEL,
-        max_tokens=max_tokens,
-        system=system,
-        messages=[{"role": "user", "content": user}],
+def get_async_client() -> anthropic.AsyncAnthropic:
+    global _async_client
+    if _async_client is None:
+        _async_client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+    return _async_client
+
+
+def system_blocks(*context: str, instructions: str) -> list[dict[str, Any]]:
+    """Structured system prompt: stable `context` blocks first, `instructions` last.
+
+    Each context block ends with a prompt-cache breakpoint, so a later call
+    that starts with the same blocks (same characters, settings, history)
+    reads them from Anthropic's cache instead of processing them again.
+    Empty blocks are skipped. Blocks shorter than the model's minimum
+    cacheable length are simply not cached.
+    """
+    blocks: list[dict[str, Any]] = [
+        {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+        for text in context if text
+    ]
+    blocks.append({"type": "text", "text": instructions})
+    return blocks
+
+
+def _record(
+    task: str | None, model: str, started: float, usage: anthropic.types.Usage, ttft: float | None = None,
+) -> None:
+    call = record_call(task, model, started, usage, ttft=ttft)
+    log.info(
+        f"Claude {call.task} ({model}) took {call.latency_ms / 1000:.1f}s: input={usage.input_tokens} "
+        f"cache_read={usage.cache_read_input_tokens or 0} "
+        f"cache_write={usage.cache_creation_input_tokens or 0} "
+        f"output={usage.output_tokens}"
     )
-    return response.content[0].text
 
 
-def generate_json(system: str, user: str, max_tokens: int = 4096) -> dict | list:
-    raw = generate(system, user, max_tokens)
+def parse_json(raw: str) -> dict | list:
     # Strip markdown fences if present
     text = raw.strip()
     if text.startswith("```"):
@@ -34,3 +120,277 @@ def generate_json(system: str, user: str, max_tokens: int = 4096) -> dict | list
         last_fence = text.rfind("```")
         text = text[first_newline + 1:last_fence].strip()
     return json.loads(text)
+
+
+def _repair(text: str) -> dict | list:
+    """Parse an answer that `parse_json` rejected, keeping what is complete."""
+    _count_json("parse_failures")
+    try:
+        result = repair_json(text)
+    except ValueError as e:
+        _count_json("failed")
+        raise LLMOutputError(f"Claude returned unusable JSON: {e}") from e
+    _count_json("repaired")
+    log.warning(f"Repaired malformed JSON answer ({len(text)} chars)")
+    return result
+
+
+def _cached(
+    task: str | None, model: str, key_parts: tuple, cache: bool, refresh: bool,
+) -> tuple[str | None, str | None]:
+    """(cache key, cached text) for a request; both None when caching is off for it."""
+    if not cache:
+        return None, None
+    key = cache_key(model, *key_parts)
+    text = None if refresh else llm_cache.get(key)
+    if text is not None:
+        record_call(task, model, outcome="cached")
+    return key, text
+
+
+def generate(
+    system: System, user: str, max_tokens: int = 4096, cache: bool = False, refresh: bool = False,
+    task: str | None = None,
+) -> str:
+    """Blocking variant for scripts and tools. Routes should use `agenerate`."""
+    model = model_for(task)
+    key, text = _cached(task, model, (system, user, max_tokens), cache, refresh)
+    if text is not None:
+        return text
+    client = get_client()
+    with scheduler.sync_slot("anthropic"):
+        started = time.perf_counter()
+        try:
+            response = client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                system=system,
+                messages=[{"role": "user", "content": user}],
+            )
+        except Exception as e:
+            record_call(task, model, started, outcome="error", error=repr(e))
+            raise
+    _record(task, model, started, response.usage)
+    text = response.content[0].text
+    if key:
+        llm_cache.put(key, text, model=model)
+    return text
+
+
+def generate_json(
+    system: System, user: str, max_tokens: int = 4096, cache: bool = False, refresh: bool = False,
+    task: str | None = None,
+) -> dict | list:
+    model = model_for(task)
+    key, cached = _cached(task, model, ("json", system, user, max_tokens, None), cache, refresh)
+    if cached is not None:
+        return json.loads(cached)
+    raw = generate(system, user, max_tokens, task=task)
+    _count_json("answers")
+    try:
+        result = parse_json(raw)
+    except ValueError:
+        result = _repair(raw)
+    if key:
+        llm_cache.put(key, json.dumps(result, ensure_ascii=False), model=model)
+    return result
+
+
+async def _create(task: str | None, timeout: float | None, **params: Any) -> anthropic.types.Message:
+    """One messages.create call to the task's model, through the scheduler and under the timeout."""
+    model = model_for(task)
+
+    async def call() -> anthropic.types.Message:
+        async with scheduler.slot("anthropic"):
+            started = time.perf_counter()
+            try:
+                response = await get_async_client().messages.create(model=model, **params)
+            except Exception as e:
+                record_call(task, model, started, outcome="error", error=repr(e))
+                raise
+            _record(task, model, started, response.usage)
+            return response
+
+    timeout = timeout or LLM_TIMEOUT_S
+    try:
+        return await asyncio.wait_for(call(), timeout)
+    except asyncio.TimeoutError:
+        record_call(task, model, outcome="timeout")
+        raise LLMTimeoutError(f"Claude request timed out after {timeout:.0f}s")
+
+
+async def agenerate(
+    system: System, user: str, max_tokens: int = 4096, timeout: float | None = None,
+    cache: bool = False, refresh: bool = False, task: str | None = None,
+) -> str:
+    """Call Claude without blocking the event loop.
+
+    Calls wait their turn in the scheduler's "anthropic" queue (at most
+    LLM_MAX_CONCURRENCY in flight, see PROVIDER_LIMITS).
+    Raises LLMTimeoutError after `timeout` seconds (default LLM_TIMEOUT_S),
+    counting time spent waiting for a slot. Cancelling the awaiting task
+    aborts the HTTP request and frees the slot.
+
+    With `cache=True` an identical earlier request (same model, prompts and
+    max_tokens) is answered from the on-disk response cache; `refresh=True`
+    skips the lookup but stores the new answer. Only use it for calls where
+    replaying the previous answer is what the user wants.
+
+    `task` names the kind of call (e.g. "script", "emotions"). It picks the
+    model from LLM_TASK_MODELS and groups the call in the task metrics.
+    """
+    model = model_for(task)
+    key, text = _cached(task, model, (system, user, max_tokens), cache, refresh)
+    if text is not None:
+        return text
+    response = await _create(
+        task, timeout, max_tokens=max_tokens, system=system, messages=[{"role": "user", "content": user}],
+    )
+    text = response.content[0].text
+    if key:
+        llm_cache.put(key, text, model=model)
+    return text
+
+
+async def _text_json(
+    system: System, user: str, max_tokens: int, timeout: float | None, task: str | None,
+) -> dict | list:
+    question = {"role": "user", "content": user}
+    response = await _create(task, timeout, max_tokens=max_tokens, system=system, messages=[question])
+    text = response.content[0].text
+    if response.stop_reason == "max_tokens":
+        _count_json("truncated")
+
+    for attempt in range(MAX_CONTINUATIONS + 1):
+        try:
+            result = parse_json(text)
+        except ValueError:
+            pass
+        else:
+            if attempt:
+                _count_json("continued")
+            return result
+        if response.stop_reason != "max_tokens" or attempt == MAX_CONTINUATIONS:
+            break
+        # Hand the cut-off answer back as the start of Claude's turn so it
+        # only writes the missing tail (a prefill may not end in whitespace)
+        partial = text.rstrip()
+        _count_json("continuations")
+        try:
+            response = await _create(
+                task, timeout, max_tokens=max_tokens, system=system,
+                messages=[question, {"role": "assistant", "content": partial}],
+            )
+        except anthropic.BadRequestError as e:
+            log.warning(f"Could not continue truncated JSON answer: {e}")
+            break
+        text = partial + response.content[0].text
+    return _repair(text)
+
+
+async def _tool_json(
+    system: System, user: str, max_tokens: int, timeout: float | None, task: str | None, schema: dict[str, Any],
+) -> dict:
+    _count_json("tool_calls")
+    while True:
+        response = await _create(
+            task, timeout, max_tokens=max_tokens, system=system,
+            messages=[{"role": "user", "content": user}],
+            tools=[{"name": "respond", "description": "Give the answer as structured data.", "input_schema": schema}],
+            tool_choice={"type": "tool", "name": "respond"},
+        )
+        if response.stop_reason != "max_tokens":
+            break
+        # The tool input is a partial object that may lack required fields
+        _count_json("truncated")
+        if max_tokens >= MAX_TOOL_TOKENS:
+            _count_json("failed")
+            raise LLMOutputError(f"Claude's structured answer did not fit in {max_tokens} tokens")
+        max_tokens = min(max_tokens * 2, MAX_TOOL_TOKENS)
+        _count_json("tool_retries")
+        log.warning(f"Structured answer cut off at max_tokens, asking again with {max_tokens}")
+    for block in response.content:
+        if block.type == "tool_use":
+            return block.input
+    _count_json("failed")
+    raise LLMOutputError("Claude did not answer with the respond tool")
+
+
+async def agenerate_json(
+    system: System, user: str, max_tokens: int = 4096, timeout: float | None = None,
+    cache: bool = False, refresh: bool = False, schema: dict[str, Any] | None = None,
+    task: str | None = None,
+) -> dict | list:
+    """`agenerate`, returning the answer as parsed JSON.
+
+    With a JSON `schema` Claude must answer through a tool call whose input
+    follows it, so the result needs no parsing; a tool call cut off at
+    max_tokens is asked again with a doubled budget (up to MAX_TOOL_TOKENS)
+    rather than returned incomplete. Otherwise the text answer is
+    parsed. An answer cut off at max_tokens is continued by up to
+    MAX_CONTINUATIONS requests that only generate the missing tail. Anything
+    still malformed goes through `repair_json`, which keeps the complete
+    elements. Raises LLMOutputError if nothing usable comes back.
+
+    Only successfully parsed results are stored in the response cache.
+    """
+    model = model_for(task)
+    key, cached = _cached(task, model, ("json", system, user, max_tokens, schema), cache, refresh)
+    if cached is not None:
+        return json.loads(cached)
+    _count_json("answers")
+    if schema is not None:
+        result = await _tool_json(system, user, max_tokens, timeout, task, schema)
+    else:
+        result = await _text_json(system, user, max_tokens, timeout, task)
+    if key:
+        llm_cache.put(key, json.dumps(result, ensure_ascii=False), model=model)
+    return result
+
+
+async def astream(
+    system: System, user: str, max_tokens: int = 4096, timeout: float | None = None,
+    task: str | None = None,
+) -> AsyncIterator[str]:
+    """Yield Claude's answer as text chunks while it is being generated.
+
+    Shares the scheduler queue with `agenerate` and holds a slot until the
+    stream ends or the consumer stops iterating. `timeout` bounds the whole
+    call, including the wait for a slot.
+    """
+    model = model_for(task)
+    timeout = timeout or LLM_TIMEOUT_S
+    deadline = time.monotonic() + timeout
+
+    async def within_deadline(awaitable):
+        try:
+            return await asyncio.wait_for(awaitable, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"Claude request timed out after {timeout:.0f}s")
+
+    await within_deadline(scheduler.acquire("anthropic"))
+    started = time.perf_counter()
+    first_chunk: float | None = None
+    try:
+        async with get_async_client().messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            system=system,
+            messages=[{"role": "user", "content": user}],
+        ) as stream:
+            chunks = stream.text_stream.__aiter__()
+            while True:
+                try:
+                    chunk = await within_deadline(chunks.__anext__())
+                except StopAsyncIteration:
+                    break
+                if first_chunk is None:
+                    first_chunk = time.perf_counter()
+                yield chunk
+            _record(task, model, started, (await stream.get_final_message()).usage, ttft=first_chunk)
+    except Exception as e:
+        outcome = "timeout" if isinstance(e, LLMTimeoutError) else "error"
+        record_call(task, model, started, outcome=outcome, error=repr(e), ttft=first_chunk)
+        raise
+    finally:
+        scheduler.release("anthropic")
@@ -0,0 +1,72 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+from config import LLM_CACHE_DIR, LLM_CACHE_ENABLED, LLM_CACHE_MAX_MB, LLM_CACHE_TTL_S
+from services.disk_cache import DiskCache, file_size
+from services.fs import atomic_write
+
+
+class LLMCache(DiskCache):
+    """On-disk cache of LLM responses, one JSON file per request hash.
+
+    Entries older than `ttl_s` are treated as misses and removed. Size
+    bounds and LRU eviction come from `DiskCache`.
+    """
+
+    label = "LLM cache"
+
+    def __init__(self, root: Path, max_bytes: int, ttl_s: float, enabled: bool = True):
+        super().__init__(root, max_bytes, enabled, extra_stats=("expired",))
+        self.ttl_s = ttl_s
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _entries(self) -> Iterator[tuple[float, int, list[Path]]]:
+        for path in self.root.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            yield st.st_mtime, st.st_size, [path]
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            entry = json.loads(data)
+        except (FileNotFoundError, ValueError):
+            self._count(misses=1)
+            return None
+
+        if time.time() - entry["created"] > self.ttl_s:
+            self._discard([path], len(data))
+            self._count(expired=1, misses=1)
+            return None
+
+        os.utime(path)  # mark as recently used
+        self._count(hits=1)
+        return entry["text"]
+
+    def put(self, key: str, text: str, **meta: object) -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"created": time.time(), "text": text, **meta}, ensure_ascii=False).encode("utf-8")
+        old_size = file_size(path)
+        atomic_write(path, data)
+        self._stored(len(data), old_size)
+
+
+llm_cache = LLMCache(
+    LLM_CACHE_DIR,
+    max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+    ttl_s=LLM_CACHE_TTL_S,
+    enabled=LLM_CACHE_ENABLED,
+)
@@ -0,0 +1,226 @@
+import atexit
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterable
+
+from pydantic import BaseModel
+
+from config import LLM_METRICS_KEEP, LLM_METRICS_PATH
+from services.fs import atomic_write
+from services.serialization import loads
+
+log = logging.getLogger(__name__)
+
+# Episode or short the current request works on; LLM calls are attributed to it
+current_owner: ContextVar[str | None] = ContextVar("llm_owner", default=None)
+
+_OWNER_PATH_RE = re.compile(r"^/api/(?:episodes|shorts)/([^/]+)")
+
+
+def owner_from_path(path: str) -> str | None:
+    """`ep_012` for `/api/episodes/ep_012/script/...`, None for global routes."""
+    match = _OWNER_PATH_RE.match(path)
+    return match.group(1) if match else None
+
+
+class OwnerMiddleware:
+    """Sets `current_owner` from the request path for the duration of the request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = current_owner.set(owner_from_path(scope["path"]))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_owner.reset(token)
+
+
+class LLMCall(BaseModel):
+    """One Claude request (or response-cache hit) and how it went."""
+
+    ts: float
+    task: str
+    model: str
+    owner: str | None = None
+    outcome: str = "ok"  # ok | error | timeout | cached
+    latency_ms: int | None = None
+    ttft_ms: int | None = None  # time to first token, streaming calls only
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    error: str = ""
+
+
+def _percentile(values: list[int], q: float) -> int | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def rollup(calls: Iterable[LLMCall], key: str = "task") -> dict[str, dict[str, Any]]:
+    """Aggregate calls by `key` ("task", "model" or "owner")."""
+    groups: dict[str, list[LLMCall]] = {}
+    for call in calls:
+        groups.setdefault(getattr(call, key) or "-", []).append(call)
+
+    result = {}
+    for name, group in sorted(groups.items()):
+        latencies = [c.latency_ms for c in group if c.latency_ms is not None and c.outcome == "ok"]
+        ttfts = [c.ttft_ms for c in group if c.ttft_ms is not None]
+        result[name] = {
+            "models": sorted({c.model for c in group}),
+            "calls": len(group),
+            "errors": sum(c.outcome in ("error", "timeout") for c in group),
+            "cached": sum(c.outcome == "cached" for c in group),
+            "latency_ms_total": sum(latencies),
+            "latency_ms_p50": _percentile(latencies, 0.5),
+            "latency_ms_p95": _percentile(latencies, 0.95),
+            "latency_ms_max": max(latencies, default=None),
+            "ttft_ms_p50": _percentile(ttfts, 0.5),
+            "input_tokens": sum(c.input_tokens for c in group),
+            "output_tokens": sum(c.output_tokens for c in group),
+            "cache_read_tokens": sum(c.cache_read_tokens for c in group),
+            "cache_write_tokens": sum(c.cache_write_tokens for c in group),
+        }
+    return result
+
+
+class LLMMetricsStore:
+    """Append-only JSONL log of LLM calls, with the newest `keep` held in memory.
+
+    `record` only queues the call; a background thread appends queued calls
+    to the file, so the LLM path never waits on disk. The file is read
+    lazily (by that thread, or by the first reader). Once it holds twice
+    `keep` records it is rewritten with only the newest `keep`, so rollups
+    cover roughly the last `keep` calls. Queued calls are flushed at exit.
+    """
+
+    def __init__(self, path: Path, keep: int):
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()  # guards the in-memory state
+        self._io_lock = threading.Lock()  # serializes reading and writing the file
+        self._calls: deque[LLMCall] | None = None
+        self._pending: list[LLMCall] = []  # recorded but not yet written
+        self._lines = 0
+        self._wake = threading.Event()
+        self._writer: threading.Thread | None = None
+
+    def _load(self) -> deque[LLMCall]:
+        if self._calls is not None:
+            return self._calls
+        with self._io_lock:
+            if self._calls is None:
+                on_disk = []
+                if self.path.exists():
+                    for line in self.path.read_bytes().splitlines():
+                        try:
+                            on_disk.append(LLMCall(**loads(line)))
+                        except ValueError:
+                            continue  # torn final line after a crash
+                with self._lock:
+                    # Calls queued meanwhile are not in the file yet
+                    self._calls = deque(on_disk + self._pending, maxlen=self.keep)
+                    self._lines = len(on_disk)
+        return self._calls
+
+    def record(self, call: LLMCall) -> None:
+        with self._lock:
+            if self._calls is not None:
+                self._calls.append(call)
+            self._pending.append(call)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="llm-metrics", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+        self._wake.set()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                log.warning(f"Could not write LLM metrics: {e}")
+
+    def flush(self) -> None:
+        """Write queued calls to the file now."""
+        self._load()
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                compact = self._lines + len(batch) >= 2 * self.keep
+                calls = list(self._calls) if compact else []
+            if not batch:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if compact:
+                atomic_write(self.path, b"".join(c.model_dump_json().encode("utf-8") + b"\n" for c in calls))
+                self._lines = len(calls)
+            else:
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(c.model_dump_json().encode("utf-8") + b"\n" for c in batch))
+                self._lines += len(batch)
+
+    def calls(self, owner: str | None = None) -> list[LLMCall]:
+        calls = self._load()
+        with self._lock:
+            return [c for c in calls if owner is None or c.owner == owner]
+
+    def summary(self) -> dict[str, Any]:
+        calls = self.calls()
+        return {
+            "calls": len(calls),
+            "tasks": rollup(calls, "task"),
+            "models": rollup(calls, "model"),
+            "owners": rollup(calls, "owner"),
+        }
+
+    def owner_summary(self, owner: str, recent: int = 50) -> dict[str, Any]:
+        calls = self.calls(owner)
+        totals = rollup(calls, "owner").get(owner, {})
+        return {
+            "owner": owner,
+            "totals": totals,
+            "tasks": rollup(calls, "task"),
+            "recent": [c.model_dump() for c in calls[-recent:]],
+        }
+
+
+def record_call(
+    task: str | None, model: str, started: float | None = None, usage: Any = None,
+    outcome: str = "ok", ttft: float | None = None, error: str = "",
+) -> LLMCall:
+    """Record one call to `llm_metrics`. `started` and `ttft` are perf_counter() values."""
+    call = LLMCall(
+        ts=time.time(),
+        task=task or "other",
+        model=model,
+        owner=current_owner.get(),
+        outcome=outcome,
+        latency_ms=round((time.perf_counter() - started) * 1000) if started is not None else None,
+        ttft_ms=round((ttft - started) * 1000) if ttft is not None and started is not None else None,
+        error=error[:500],
+    )
+    if usage is not None:
+        call.input_tokens = usage.input_tokens
+        call.output_tokens = usage.output_tokens
+        call.cache_read_tokens = usage.cache_read_input_tokens or 0
+        call.cache_write_tokens = usage.cache_creation_input_tokens or 0
+    llm_metrics.record(call)
+    return call
+
+
+llm_metrics = LLMMetricsStore(LLM_METRICS_PATH, keep=LLM_METRICS_KEEP)
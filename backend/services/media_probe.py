@@ -0,0 +1,211 @@
+"""Media durations without spawning ffprobe.
+
+MP3 (Xing/Info or VBRI header, else frame counting), MP4/MOV (`mvhd`),
+WAV (`fmt `/`data` chunks) and Ogg Vorbis/Opus (last granule position) are
+read in pure Python. Anything else, or a file these parsers cannot make
+sense of, falls back to ffprobe. Results are cached by (path, size, mtime).
+"""
+
+import json
+import logging
+import os
+import struct
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# Bitrates in kbit/s by (MPEG-1?, layer), indexed by the header's bitrate index
+_MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# Sample rates by MPEG version bits (0 = 2.5, 2 = 2, 3 = 1)
+_MP3_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+
+class ProbeError(ValueError):
+    """The file is not in a format the pure-Python parsers understand."""
+
+
+def get_audio_duration_ms(path: Path) -> int:
+    """Duration of an audio or video file in milliseconds."""
+    st = os.stat(path)
+    return _duration_ms(str(path), st.st_size, st.st_mtime_ns)
+
+
+@lru_cache(maxsize=16384)
+def _duration_ms(path: str, size: int, mtime_ns: int) -> int:
+    try:
+        with open(path, "rb") as f:
+            return int(_probe(f, size) * 1000)
+    except ProbeError as e:
+        log.debug(f"Falling back to ffprobe for {path}: {e}")
+        return _ffprobe_duration_ms(path)
+
+
+def _probe(f, size: int) -> float:
+    head = f.read(12)
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return _wav_seconds(f)
+    if head[:4] == b"OggS":
+        return _ogg_seconds(f, size)
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide"):
+        return _mp4_seconds(f, size)
+    return _mp3_seconds(f, size)
+
+
+def _wav_seconds(f) -> float:
+    f.seek(12)
+    byte_rate = None
+    while chunk := f.read(8):
+        if len(chunk) < 8:
+            break
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            byte_rate = struct.unpack("<I", fmt[8:12])[0]
+            f.seek(chunk_size % 2, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                raise ProbeError("WAV data chunk before fmt chunk")
+            return chunk_size / byte_rate
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    raise ProbeError("WAV without a data chunk")
+
+
+def _ogg_seconds(f, size: int) -> float:
+    f.seek(0)
+    first_page = f.read(4096)
+    if (i := first_page.find(b"\x01vorbis")) >= 0:
+        sample_rate, pre_skip = struct.unpack("<I", first_page[i + 12:i + 16])[0], 0
+    elif (i := first_page.find(b"OpusHead")) >= 0:
+        sample_rate, pre_skip = 48000, struct.unpack("<H", first_page[i + 10:i + 12])[0]
+    else:
+        raise ProbeError("Ogg stream is neither Vorbis nor Opus")
+
+    f.seek(max(0, size - 65536))
+    tail = f.read()
+    last = tail.rfind(b"OggS")
+    if last < 0 or last + 14 > len(tail):
+        raise ProbeError("No Ogg page at the end of the file")
+    granule = struct.unpack("<q", tail[last + 6:last + 14])[0]
+    return max(0, granule - pre_skip) / sample_rate
+
+
+def _mp4_seconds(f, size: int) -> float:
+    """Walk the top-level boxes to `moov`, then read its `mvhd`."""
+    pos, end = 0, size
+    while pos + 8 <= end:
+        f.seek(pos)
+        box_size, box_type = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if box_size == 1:
+            box_size, header = struct.unpack(">Q", f.read(8))[0], 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header:
+            raise ProbeError("Corrupt MP4 box")
+        if box_type == b"moov":
+            # Descend into moov: its children start right after the header
+            pos, end = pos + header, pos + box_size
+            continue
+        if box_type == b"mvhd":
+            data = f.read(32)
+            if data[0] == 1:
+                timescale, duration = struct.unpack(">IQ", data[20:32])
+            else:
+                timescale, duration = struct.unpack(">II", data[12:20])
+            if not timescale:
+                raise ProbeError("mvhd with zero timescale")
+            return duration / timescale
+        pos += box_size
+    raise ProbeError("MP4 without moov/mvhd")
+
+
+def _mp3_frame(header: bytes) -> tuple[int, int, int, int, int] | None:
+    """(frame length, samples per frame, sample rate, version bits, channel mode) or None."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, version, header[3] >> 6
+    samples = 1152 if mpeg1 or layer == 2 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate, version, header[3] >> 6
+
+
+def _mp3_seconds(f, size: int) -> float:
+    f.seek(0)
+    data = f.read()
+    pos = 0
+    # Skip ID3v2 tags (there may be more than one)
+    while data[pos:pos + 3] == b"ID3" and pos + 10 <= len(data):
+        tag_size = 0
+        for b in data[pos + 6:pos + 10]:
+            tag_size = (tag_size << 7) | (b & 0x7F)
+        pos += 10 + tag_size + (10 if data[pos + 5] & 0x10 else 0)
+
+    # First frame: a sync word whose successor is also a valid frame
+    while True:
+        pos = data.find(b"\xff", pos)
+        if pos < 0:
+            raise ProbeError("No MPEG audio frames")
+        frame = _mp3_frame(data[pos:pos + 4])
+        if frame and (pos + frame[0] >= len(data) or _mp3_frame(data[pos + frame[0]:pos + frame[0] + 4])):
+            break
+        pos += 1
+
+    _, samples, sample_rate, version, channel_mode = frame
+    # Xing/Info header sits after the side information of the first frame
+    side_info = (32 if channel_mode != 3 else 17) if version == 3 else (17 if channel_mode != 3 else 9)
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            return struct.unpack(">I", data[xing + 8:xing + 12])[0] * samples / sample_rate
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        return struct.unpack(">I", data[vbri + 14:vbri + 18])[0] * samples / sample_rate
+
+    # No header: count frames
+    frames = 0
+    while frame:
+        frames += 1
+        pos += frame[0]
+        frame = _mp3_frame(data[pos:pos + 4])
+    return frames * samples / sample_rate
+
+
+def _ffprobe_duration_ms(path: str) -> int:
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v", "quiet",
+            "-print_format", "json",
+            "-show_format",
+            path,
+        ],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr}")
+    info = json.loads(result.stdout)
+    duration_s = float(info["format"]["duration"])
+    return int(duration_s * 1000)
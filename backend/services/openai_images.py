@@ -5,6 +5,7 @@ import httpx
 from openai import OpenAI
 
 from config import OPENAI_API_KEY
+from services.scheduler import scheduler
 
 _client: OpenAI | None = None
 
@@ -43,24 +44,26 @@ def generate_scene_image(
         # but only allows sizes up to 1536x1024 (no 1792x1024)
         image_files = [open(str(p), "rb") for p in ref_paths]
         try:
-            response = client.images.edit(
-                model="gpt-image-1",
-                image=image_files,
-                prompt=prompt,
-                n=1,
-                size="1536x1024",
-            )
+            with scheduler.sync_slot("openai"):
+                response = client.images.edit(
+                    model="gpt-image-1",
+                    image=image_files,
+                    prompt=prompt,
+                    n=1,
+                    size="1536x1024",
+                )
         finally:
             for f in image_files:
                 f.close()
     else:
         # No references — generate supports 1792x1024 for 16:9
-        response = client.images.generate(
-            model="gpt-image-1",
-            prompt=prompt,
-            n=1,
-            size="1792x1024",
-        )
+        with scheduler.sync_slot("openai"):
+            response = client.images.generate(
+                model="gpt-image-1",
+                prompt=prompt,
+                n=1,
+                size="1792x1024",
+            )
 
     # Decode and save
     image_b64 = response.data[0].b64_json
@@ -0,0 +1,279 @@
+import bisect
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from config import EPISODES_DIR, SHORTS_DIR
+from models import EpisodeState, EpisodeSummary
+from services.file_lock import FileLock
+from services.fs import atomic_write
+from services.serialization import loads
+from services.state_store import StateNotFoundError, StateStore, episode_store, short_store
+from shorts.models import ShortState, ShortSummary
+
+S = TypeVar("S", bound=BaseModel)
+
+_NUM_RE = re.compile(r"(\d+)$")
+
+
+def _id_number(item_id: str) -> int:
+    match = _NUM_RE.search(item_id)
+    return int(match.group(1)) if match else 0
+
+
+class RegistryIndex(Generic[S]):
+    """In-memory index over a `registry.json` list of summaries.
+
+    Lookups by id are O(1), and `page` walks through summaries in creation
+    order with a cursor, optionally narrowed by secondary indexes
+    (`day` of the date plus the fields in `index_fields`). The file stays a
+    plain JSON list; it is re-read only when its (mtime, size) changes.
+
+    IDs come from a counter in `registry.counter` rather than the registry
+    length, so deleting an item never causes the next one to reuse its id.
+    Allocation and every write happen under a file lock, so concurrent
+    creates (or several server processes) cannot collide. Waiting for that
+    lock blocks, so async code calls the writers through `asyncio.to_thread`.
+    The file lock is taken before the in-memory lock, so readers never wait
+    on a writer that is still queued for the file.
+
+    `derive` maps a state to the summary fields it owns (`derived_fields`,
+    e.g. current stage). The index subscribes to `store` saves to keep those
+    in sync, and fills them in for summaries written before the fields
+    existed. Readers only hold the in-memory lock, so that backfill stays in
+    memory until the next write, which persists it under the file lock.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        model: type[S],
+        prefix: str,
+        store: StateStore,
+        derive: Callable[[Any], dict],
+        derived_fields: tuple[str, ...],
+        index_fields: tuple[str, ...],
+    ):
+        self.root = root
+        self.path = root / "registry.json"
+        self.counter_path = root / "registry.counter"
+        self.model = model
+        self.prefix = prefix
+        self.store = store
+        self.derive = derive
+        self.derived_fields = derived_fields
+        self.index_fields = ("day",) + index_fields
+        self._lock = threading.RLock()
+        self._key: tuple[int, int] | None = None
+        self._items: dict[str, S] = {}
+        self._order: list[tuple[int, str]] = []  # (id number, id), sorted
+        self._indexes: dict[str, dict[Any, set[str]]] = {}
+        self._backfilled = False  # memory has derived fields the file lacks
+        store.add_save_listener(self._on_save)
+
+    # --- Loading ---
+
+    def _stat_key(self) -> tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self) -> None:
+        """Re-read the registry file if it changed since we last saw it."""
+        key = self._stat_key()
+        if key == self._key and self._key is not None:
+            return
+        raw: list[dict] = loads(self.path.read_bytes()) if key else []
+        missing = [entry["id"] for entry in raw if any(f not in entry for f in self.derived_fields)]
+        self._rebuild([self.model(**entry) for entry in raw])
+        self._key = key
+        self._backfilled = False
+        if missing:
+            self._backfill(missing)
+
+    def _backfill(self, item_ids: list[str]) -> None:
+        changed = False
+        for item_id in item_ids:
+            try:
+                state = self.store.load(item_id)
+            except StateNotFoundError:
+                continue
+            changed |= self._apply(item_id, self.derive(state))
+        self._backfilled = changed
+
+    def _rebuild(self, items: list[S]) -> None:
+        self._items = {item.id: item for item in items}
+        self._order = sorted((_id_number(item.id), item.id) for item in items)
+        self._indexes = {field: {} for field in self.index_fields}
+        for item in items:
+            self._index(item)
+
+    def _index_value(self, item: S, field: str) -> Any:
+        if field == "day":
+            return item.date[:10]
+        return getattr(item, field)
+
+    def _index(self, item: S) -> None:
+        for field in self.index_fields:
+            self._indexes[field].setdefault(self._index_value(item, field), set()).add(item.id)
+
+    def _unindex(self, item: S) -> None:
+        for field in self.index_fields:
+            ids = self._indexes[field].get(self._index_value(item, field))
+            if ids:
+                ids.discard(item.id)
+
+    def _write(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        data = [self._items[item_id].model_dump() for _, item_id in self._order]
+        atomic_write(self.path, json.dumps(data, indent=2).encode("utf-8"))
+        self._key = self._stat_key()
+        self._backfilled = False
+
+    def _locked(self) -> FileLock:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return FileLock(self.root / ".registry.lock")
+
+    # --- Reads ---
+
+    def get(self, item_id: str) -> S | None:
+        with self._lock:
+            self._refresh()
+            return self._items.get(item_id)
+
+    def items(self) -> list[S]:
+        with self._lock:
+            self._refresh()
+            return [self._items[item_id] for _, item_id in self._order]
+
+    def page(
+        self, cursor: str | None = None, limit: int | None = None, **filters: Any,
+    ) -> tuple[list[S], str | None]:
+        """One page of summaries in creation order, plus the cursor for the next page.
+
+        `filters` match secondary index values exactly (`day="2025-01-31"`,
+        `completed=True`, ...); None values are ignored.
+        """
+        with self._lock:
+            self._refresh()
+            candidates: set[str] | None = None
+            for field, value in filters.items():
+                if value is None:
+                    continue
+                if field not in self._indexes:
+                    raise ValueError(f"Cannot filter on {field}")
+                ids = self._indexes[field].get(value, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+
+            if candidates is None:
+                order = self._order
+            else:
+                order = sorted((_id_number(i), i) for i in candidates)
+
+            start = 0
+            if cursor:
+                start = bisect.bisect_right(order, (_id_number(cursor), cursor))
+            end = len(order) if limit is None else start + limit
+            page = [self._items[item_id] for _, item_id in order[start:end]]
+            next_cursor = page[-1].id if page and end < len(order) else None
+            return page, next_cursor
+
+    # --- Writes ---
+
+    def allocate(self) -> tuple[int, str]:
+        """Reserve the next id. Returns (number, id), e.g. (12, "ep_012")."""
+        with self._locked(), self._lock:
+            self._refresh()
+            next_num = 1
+            if self.counter_path.exists():
+                next_num = int(self.counter_path.read_text(encoding="utf-8").strip() or 1)
+            # Never hand out a number that is already in the registry or on disk
+            on_disk = [_id_number(p.name) for p in self.root.glob(f"{self.prefix}*") if p.is_dir()]
+            highest = max([n for n, _ in self._order] + on_disk, default=0)
+            num = max(next_num, highest + 1)
+            atomic_write(self.counter_path, str(num + 1).encode("utf-8"))
+            return num, f"{self.prefix}{num:03d}"
+
+    def add(self, item: S) -> None:
+        with self._locked(), self._lock:
+            self._refresh()
+            if item.id in self._items:
+                self._unindex(self._items[item.id])
+            else:
+                bisect.insort(self._order, (_id_number(item.id), item.id))
+            self._items[item.id] = item
+            self._index(item)
+            self._write()
+
+    def update(self, item_id: str, **fields: Any) -> S | None:
+        with self._locked(), self._lock:
+            self._refresh()
+            if self._apply(item_id, fields) or self._backfilled:
+                self._write()
+            return self._items.get(item_id)
+
+    def remove(self, item_id: str) -> bool:
+        with self._locked(), self._lock:
+            self._refresh()
+            item = self._items.pop(item_id, None)
+            if item is None:
+                return False
+            self._unindex(item)
+            self._order.remove((_id_number(item_id), item_id))
+            self._write()
+            return True
+
+    def _apply(self, item_id: str, fields: dict) -> bool:
+        """Set summary fields in memory. Returns True if anything changed."""
+        item = self._items.get(item_id)
+        if item is None or all(getattr(item, k) == v for k, v in fields.items()):
+            return False
+        self._unindex(item)
+        updated = item.model_copy(update=fields)
+        self._items[item_id] = updated
+        self._index(updated)
+        return True
+
+    def _on_save(self, item_id: str, state: Any) -> None:
+        fields = self.derive(state)
+        with self._lock:
+            self._refresh()
+            item = self._items.get(item_id)
+            if item is None or all(getattr(item, k) == v for k, v in fields.items()):
+                return
+        self.update(item_id, **fields)
+
+
+def _episode_fields(state: EpisodeState) -> dict:
+    return {
+        "current_stage": state.current_stage,
+        "completed": state.thumbnail.approved,
+        "idea": state.script.idea,
+    }
+
+
+def _short_fields(state: ShortState) -> dict:
+    return {
+        "current_step": state.current_step,
+        "completed": state.completed,
+        "theme": state.theme,
+    }
+
+
+episode_index: RegistryIndex[EpisodeSummary] = RegistryIndex(
+    EPISODES_DIR, EpisodeSummary, "ep_", episode_store, _episode_fields,
+    derived_fields=("current_stage", "completed", "idea"),
+    index_fields=("completed", "current_stage"),
+)
+short_index: RegistryIndex[ShortSummary] = RegistryIndex(
+    SHORTS_DIR, ShortSummary, "short_", short_store, _short_fields,
+    derived_fields=("current_step", "completed", "theme"),
+    index_fields=("completed", "current_step", "theme"),
+)
@@ -0,0 +1,246 @@
+"""One queue per external API (Anthropic, ElevenLabs, OpenAI, BFL) that every call waits in.
+
+Each provider has a cap on calls in flight and a token bucket for requests
+per minute (PROVIDER_LIMITS). Waiting calls are served by priority class
+first (interactive single-item regenerations, then normal calls, then
+background batches), and within a class round-robin across the episodes
+and shorts that queued them, so one long batch cannot starve another
+episode. Works for both coroutines (`slot`) and worker threads
+(`sync_slot`), which share the same limits.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import AsyncIterator, Iterator
+
+from config import PROVIDER_LIMITS
+from services.llm_metrics import current_owner
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # a user waiting on one item (regenerate a line or image)
+    NORMAL = 1
+    BACKGROUND = 2  # batch jobs (generate all lines, all images)
+
+
+# Priority of calls made by the current request; set with `priority(...)`
+current_priority: ContextVar[Priority] = ContextVar("priority", default=Priority.NORMAL)
+
+
+@contextmanager
+def priority(level: Priority) -> Iterator[None]:
+    """Run calls made inside the block (and tasks/threads started there) at `level`."""
+    token = current_priority.set(level)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0, or the seconds until one is available (nothing taken)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Waiter:
+    __slots__ = ("owner", "priority", "queued_at", "granted", "future", "loop", "event")
+
+    def __init__(self, owner: str | None, priority: Priority, loop: asyncio.AbstractEventLoop | None):
+        self.owner = owner
+        self.priority = priority
+        self.queued_at = time.perf_counter()
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ProviderQueue:
+    """Admission control for one provider: concurrency cap, rate limit, priority and fair queueing."""
+
+    def __init__(self, name: str, max_concurrency: int, rate_per_min: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rate_per_min = rate_per_min
+        # Bursts of up to ten seconds' worth of requests (at least one per slot)
+        burst = max(max_concurrency, rate_per_min / 6)
+        self.bucket = TokenBucket(rate_per_min / 60, burst) if rate_per_min else None
+        self.in_flight = 0
+        # priority -> owner -> waiters, owners in round-robin order
+        self._waiting: dict[Priority, OrderedDict[str | None, deque[_Waiter]]] = {p: OrderedDict() for p in Priority}
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self.stats = {"granted": 0, "throttled": 0, "abandoned": 0, "peak_in_flight": 0, "peak_queued": 0}
+        self._waits: dict[Priority, list[float]] = {p: [0, 0.0, 0.0] for p in Priority}  # count, total s, max s
+
+    def queued(self) -> int:
+        return sum(len(q) for queues in self._waiting.values() for q in queues.values())
+
+    def enqueue(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self._waiting[waiter.priority].setdefault(waiter.owner, deque()).append(waiter)
+            self.stats["peak_queued"] = max(self.stats["peak_queued"], self.queued())
+            self._dispatch()
+
+    def abandon(self, waiter: _Waiter) -> None:
+        """The waiter gave up (cancelled or timed out): drop it, or hand back its slot."""
+        with self._lock:
+            if not waiter.granted:
+                queues = self._waiting[waiter.priority]
+                queue = queues.get(waiter.owner)
+                if queue and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del queues[waiter.owner]
+                self.stats["abandoned"] += 1
+                return
+        self.release()
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch()
+
+    def _next(self) -> _Waiter | None:
+        for queues in self._waiting.values():  # by priority, INTERACTIVE first
+            if queues:
+                owner, queue = next(iter(queues.items()))
+                waiter = queue.popleft()
+                if queue:
+                    queues.move_to_end(owner)
+                else:
+                    del queues[owner]
+                return waiter
+        return None
+
+    def _dispatch(self) -> None:
+        """Grant slots while capacity and tokens allow. Caller holds the lock."""
+        while self.in_flight < self.max_concurrency and self.queued():
+            if self.bucket and (wait := self.bucket.take()):
+                self.stats["throttled"] += 1
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._on_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            waiter = self._next()
+            self.in_flight += 1
+            self.stats["granted"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+            waited = time.perf_counter() - waiter.queued_at
+            stats = self._waits[waiter.priority]
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+            waiter.grant()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def summary(self) -> dict:
+        with self._lock:
+            by_owner: dict[str, int] = {}
+            for queues in self._waiting.values():
+                for owner, queue in queues.items():
+                    by_owner[owner or "-"] = by_owner.get(owner or "-", 0) + len(queue)
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "rate_per_min": self.rate_per_min,
+                "queued": self.queued(),
+                "queued_by_priority": {p.name.lower(): sum(map(len, self._waiting[p].values())) for p in Priority},
+                "queued_by_owner": by_owner,
+                **self.stats,
+                "wait_ms": {
+                    p.name.lower(): {
+                        "count": count,
+                        "avg": round(total / count * 1000) if count else 0,
+                        "max": round(longest * 1000),
+                    }
+                    for p, (count, total, longest) in self._waits.items()
+                },
+            }
+
+
+class Scheduler:
+    """The provider queues; calls to external APIs run inside `slot`/`sync_slot`."""
+
+    def __init__(self, limits: dict[str, tuple[int, float]]):
+        self.queues = {name: ProviderQueue(name, *limit) for name, limit in limits.items()}
+
+    def _waiter(self, priority: Priority | None, loop: asyncio.AbstractEventLoop | None) -> _Waiter:
+        return _Waiter(current_owner.get(), current_priority.get() if priority is None else priority, loop)
+
+    async def acquire(self, provider: str, priority: Priority | None = None) -> None:
+        """Wait for a slot; pair with `release`. Cancelling the wait gives up the place in line."""
+        queue = self.queues[provider]
+        waiter = self._waiter(priority, asyncio.get_running_loop())
+        queue.enqueue(waiter)
+        try:
+            await waiter.future
+        except BaseException:
+            queue.abandon(waiter)
+            raise
+
+    def release(self, provider: str) -> None:
+        self.queues[provider].release()
+
+    @asynccontextmanager
+    async def slot(self, provider: str, priority: Priority | None = None) -> AsyncIterator[None]:
+        await self.acquire(provider, priority)
+        try:
+            yield
+        finally:
+            self.release(provider)
+
+    @contextmanager
+    def sync_slot(self, provider: str, priority: Priority | None = None) -> Iterator[None]:
+        """`slot` for blocking code in worker threads."""
+        queue = self.queues[provider]
+        waiter = self._waiter(priority, None)
+        queue.enqueue(waiter)
+        waiter.event.wait()
+        try:
+            yield
+        finally:
+            queue.release()
+
+    def summary(self) -> dict:
+        return {name: queue.summary() for name, queue in self.queues.items()}
+
+
+scheduler = Scheduler(PROVIDER_LIMITS)
@@ -0,0 +1,227 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from services.state_store import StateNotFoundError, StateStore, M
+
+# List fields stored one row per element, keyed by their dotted path in the
+# state model. Everything else lives in a single "head" document per state.
+SECTIONS: dict[str, list[tuple[str, ...]]] = {
+    "Episode": [
+        ("script", "lines"),
+        ("tts", "line_statuses"),
+        ("scenes", "scenes"),
+        ("timeline", "clips"),
+    ],
+    "Short": [
+        ("items",),
+    ],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE TABLE IF NOT EXISTS section_rows (
+    kind TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    section TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, owner, section, pos)
+) WITHOUT ROWID;
+"""
+
+
+def _exclude_spec(sections: list[tuple[str, ...]]) -> dict:
+    """Build a pydantic `exclude` mapping that drops the row-stored sections."""
+    spec: dict = {}
+    for path in sections:
+        node = spec
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = True
+    return spec
+
+
+class _Snapshot:
+    """What we last wrote for one state: its head document and row payloads."""
+
+    def __init__(self, version: int, head: str, rows: dict[str, list[str]]):
+        self.version = version
+        self.head = head
+        self.rows = rows
+
+
+class SQLiteStateStore(StateStore[M]):
+    """State store that keeps each state in SQLite (WAL mode).
+
+    Script lines, TTS statuses, scenes, timeline clips and flashcard items are
+    rows in `section_rows`; the rest of the model is one JSON document. A save
+    diffs against what was last written and only touches rows that changed,
+    so updating one TTS status writes one small row instead of the whole state.
+
+    Each save bumps the document's version, which `load` compares against its
+    cache so that edits made by another process are picked up.
+    """
+
+    def __init__(self, db_path: Path, root: Path, model: type[M], label: str):
+        super().__init__(root, model, label)
+        self.kind = label.lower()
+        self.sections = SECTIONS[label]
+        self._exclude = _exclude_spec(self.sections)
+        self._snapshots: dict[str, _Snapshot] = {}
+        self._db_lock = threading.Lock()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    # --- Mapping between models and rows ---
+
+    def _split(self, state: BaseModel) -> tuple[str, dict[str, list[str]]]:
+        rows: dict[str, list[str]] = {}
+        for path in self.sections:
+            items = state
+            for key in path:
+                items = getattr(items, key)
+            rows[".".join(path)] = [item.model_dump_json() for item in items]
+        return state.model_dump_json(exclude=self._exclude), rows
+
+    def _join(self, head: str, rows: dict[str, list[str]]) -> M:
+        data = json.loads(head)
+        for path in self.sections:
+            parent = data
+            for key in path[:-1]:
+                parent = parent.setdefault(key, {})
+            parent[path[-1]] = [json.loads(r) for r in rows.get(".".join(path), [])]
+        return self.model.model_validate(data)
+
+    # --- StateStore interface ---
+
+    def exists(self, item_id: str) -> bool:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM documents WHERE kind = ? AND id = ?", (self.kind, item_id)
+            ).fetchone()
+        return row is not None
+
+    def _load_shared(self, item_id: str) -> M:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT version FROM documents WHERE kind = ? AND id = ?", (self.kind, item_id)
+            ).fetchone()
+            if row is None:
+                self.invalidate(item_id)
+                raise StateNotFoundError(f"{self.label} {item_id} not found")
+
+            version = row[0]
+            with self._lock:
+                cached = self._cache.get(item_id)
+            if cached and cached[0] == (version, 0):
+                return cached[1]
+
+            head = self._conn.execute(
+                "SELECT data FROM documents WHERE kind = ? AND id = ?", (self.kind, item_id)
+            ).fetchone()[0]
+            rows: dict[str, list[str]] = {".".join(p): [] for p in self.sections}
+            for section, data in self._conn.execute(
+                "SELECT section, data FROM section_rows WHERE kind = ? AND owner = ? ORDER BY section, pos",
+                (self.kind, item_id),
+            ):
+                rows.setdefault(section, []).append(data)
+
+        state = self._join(head, rows)
+        with self._lock:
+            self._cache[item_id] = ((version, 0), state)
+            self._snapshots[item_id] = _Snapshot(version, head, rows)
+        return state
+
+    def save(self, item_id: str, state: M, source: str | None = None) -> None:
+        head, rows = self._split(state)
+        with self._lock:
+            previous = self._snapshots.get(item_id)
+        written = 0
+
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT version FROM documents WHERE kind = ? AND id = ?", (self.kind, item_id)
+                ).fetchone()
+                current_version = row[0] if row else 0
+                # Another process wrote since we read: fall back to a full rewrite
+                if previous is None or previous.version != current_version:
+                    previous = _Snapshot(current_version, "", {})
+                    self._conn.execute(
+                        "DELETE FROM section_rows WHERE kind = ? AND owner = ?", (self.kind, item_id)
+                    )
+
+                version = current_version + 1
+                if head != previous.head:
+                    self._conn.execute(
+                        "INSERT INTO documents (kind, id, version, data) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (kind, id) DO UPDATE SET version = excluded.version, data = excluded.data",
+                        (self.kind, item_id, version, head),
+                    )
+                    written += len(head)
+                else:
+                    self._conn.execute(
+                        "UPDATE documents SET version = ? WHERE kind = ? AND id = ?",
+                        (version, self.kind, item_id),
+                    )
+
+                for section, new_rows in rows.items():
+                    old_rows = previous.rows.get(section, [])
+                    changed = [
+                        (self.kind, item_id, section, pos, data)
+                        for pos, data in enumerate(new_rows)
+                        if pos >= len(old_rows) or old_rows[pos] != data
+                    ]
+                    if changed:
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO section_rows (kind, owner, section, pos, data) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            changed,
+                        )
+                        written += sum(len(c[4]) for c in changed)
+                    if len(old_rows) > len(new_rows):
+                        self._conn.execute(
+                            "DELETE FROM section_rows WHERE kind = ? AND owner = ? AND section = ? AND pos >= ?",
+                            (self.kind, item_id, section, len(new_rows)),
+                        )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        with self._lock:
+            self._cache[item_id] = ((version, 0), state)
+            self._snapshots[item_id] = _Snapshot(version, head, rows)
+            self.stats["saves"] += 1
+            self.stats["bytes_written"] += written
+
+    def create(self, item_id: str, state: M) -> None:
+        (self.root / item_id).mkdir(parents=True, exist_ok=True)
+        self.save(item_id, state)
+
+    def invalidate(self, item_id: str) -> None:
+        with self._lock:
+            self._cache.pop(item_id, None)
+            self._snapshots.pop(item_id, None)
+
+    def delete(self, item_id: str) -> None:
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM documents WHERE kind = ? AND id = ?", (self.kind, item_id))
+            self._conn.execute("DELETE FROM section_rows WHERE kind = ? AND owner = ?", (self.kind, item_id))
+            self._conn.execute("COMMIT")
+        self.invalidate(item_id)
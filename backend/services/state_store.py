@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Generic, TypeVar
+
+from pydantic import BaseModel
+
+from config import EPISODES_DIR, SHORTS_DIR, STATE_BACKEND, STATE_DB_PATH, STATE_JOURNAL_COMPACT_EVERY
+from models import EpisodeState
+from services.file_lock import FileLock
+from services.fs import atomic_write
+from services.serialization import dump_state, load_state
+from shorts.models import ShortState
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class StateNotFoundError(LookupError):
+    """Raised when a state file does not exist on disk."""
+
+
+class StateStore(Generic[M]):
+    """Keeps validated state models in memory, backed by `<root>/<id>/state.json`.
+
+    A cached model is reused for as long as the file's (mtime, size) matches
+    what we last read or wrote, so repeated requests skip the JSON parse and
+    pydantic validation. Writes go to a temp file that is renamed over the
+    original, so readers never see a half-written state.
+
+    `load` returns a private copy of the cached model, so callers may
+    change it freely without affecting anyone else; changes only persist
+    through `save`. Routes that modify state should use `transaction`,
+    which serializes writers and works on the cached model directly.
+    """
+
+    def __init__(self, root: Path, model: type[M], label: str):
+        self.root = root
+        self.model = model
+        self.label = label
+        self._cache: dict[str, tuple[tuple[int, int], M]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"saves": 0, "bytes_written": 0}
+        self._item_locks: dict[str, asyncio.Lock] = {}
+        self._save_listeners: list[Callable[[str, M], None]] = []
+
+    def path(self, item_id: str) -> Path:
+        return self.root / item_id / "state.json"
+
+    def exists(self, item_id: str) -> bool:
+        return self.path(item_id).exists()
+
+    def load(self, item_id: str) -> M:
+        """The current state, as a copy the caller owns."""
+        return self._load_shared(item_id).model_copy(deep=True)
+
+    def _load_shared(self, item_id: str) -> M:
+        """The cached model itself; only for code that saves what it changes."""
+        path = self.path(item_id)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(item_id)
+            raise StateNotFoundError(f"{self.label} {item_id} not found")
+
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._cache.get(item_id)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        state = load_state(self.model, path.read_bytes())
+        with self._lock:
+            self._cache[item_id] = (key, state)
+        return state
+
+    def save(self, item_id: str, state: M, source: str | None = None) -> None:
+        """Persist `state`. `source` labels the change in backends that keep history."""
+        path = self.path(item_id)
+        data = dump_state(state)
+        atomic_write(path, data)
+        st = os.stat(path)
+        with self._lock:
+            self._cache[item_id] = ((st.st_mtime_ns, st.st_size), state)
+            self.stats["saves"] += 1
+            self.stats["bytes_written"] += len(data)
+
+    def create(self, item_id: str, state: M) -> None:
+        self.path(item_id).parent.mkdir(parents=True, exist_ok=True)
+        self.save(item_id, state)
+
+    def add_save_listener(self, listener: Callable[[str, M], None]) -> None:
+        """Call `listener(item_id, state)` in a worker thread after every committed `transaction`."""
+        self._save_listeners.append(listener)
+
+    def invalidate(self, item_id: str) -> None:
+        with self._lock:
+            self._cache.pop(item_id, None)
+
+    def delete(self, item_id: str) -> None:
+        """Forget the state. The caller removes the item's directory."""
+        self.invalidate(item_id)
+
+    def history(self, item_id: str) -> list[dict]:
+        """Past changes to a state, oldest first. Only the journal backend keeps any."""
+        if not self.exists(item_id):
+            raise StateNotFoundError(f"{self.label} {item_id} not found")
+        return []
+
+    @asynccontextmanager
+    async def transaction(self, item_id: str, source: str | None = None) -> AsyncIterator[M]:
+        """Load, modify and save a state while holding its locks.
+
+            async with episode_store.transaction(ep_id) as state:
+                state.tts.speed = 1.2
+
+        Holds a per-item asyncio lock (writers in this process) and a file
+        lock next to the state (writers in other processes). The state is
+        re-read inside the lock, so changes merged here are never lost to a
+        concurrent writer. If the block raises, nothing is saved and the
+        cached model is dropped. Keep slow provider calls outside the block
+        and only merge their results inside it. `source` is passed to `save`.
+        """
+        item_dir = self.root / item_id
+        if not item_dir.is_dir():
+            raise StateNotFoundError(f"{self.label} {item_id} not found")
+
+        lock = self._item_locks.setdefault(item_id, asyncio.Lock())
+        async with lock:
+            async with FileLock(item_dir / ".state.lock"):
+                state = self._load_shared(item_id)
+                try:
+                    yield state
+                except BaseException:
+                    self.invalidate(item_id)
+                    raise
+                self.save(item_id, state, source)
+            for listener in self._save_listeners:
+                # Listeners may block (e.g. on the registry's file lock)
+                await asyncio.to_thread(listener, item_id, state)
+
+
+def _make_store(root: Path, model: type[M], label: str) -> StateStore[M]:
+    if STATE_BACKEND == "sqlite":
+        from services.sqlite_state import SQLiteStateStore
+        return SQLiteStateStore(STATE_DB_PATH, root, model, label)
+    if STATE_BACKEND == "journal":
+        from services.journal_state import JournalStateStore
+        return JournalStateStore(root, model, label, STATE_JOURNAL_COMPACT_EVERY)
+    return StateStore(root, model, label)
+
+
+episode_store: StateStore[EpisodeState] = _make_store(EPISODES_DIR, EpisodeState, "Episode")
+short_store: StateStore[ShortState] = _make_store(SHORTS_DIR, ShortState, "Short")
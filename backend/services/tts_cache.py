@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator
+
+from config import TTS_CACHE_DIR, TTS_CACHE_ENABLED, TTS_CACHE_MAX_MB
+from services.disk_cache import DiskCache, file_size
+from services.fs import atomic_write
+
+log = logging.getLogger(__name__)
+
+
+def _place(src: Path, dest: Path) -> bool:
+    """Put `src` at `dest` as a hard link, or a copy if linking fails.
+
+    Goes through a temp name and a rename, so an existing `dest` is replaced
+    rather than written through (which would change every link to it).
+    Returns True if a link was made.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp = Path(tmp_name)
+    try:
+        tmp.unlink()
+        try:
+            os.link(src, tmp)
+            linked = True
+        except OSError:  # other filesystem, or no hard links (e.g. FAT)
+            shutil.copyfile(src, tmp)
+            linked = False
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return linked
+
+
+class TTSCache(DiskCache):
+    """Content-addressed store of generated TTS audio, shared by episodes and shorts.
+
+    Each entry is `<key>.mp3` plus a `<key>.json` holding its duration. A hit
+    is hard-linked (or copied) to the requested path, so the same clip used
+    by many shorts is stored once. Size bounds and LRU eviction (by the
+    `.json` mtime) come from `DiskCache`. Files already placed in episodes
+    or shorts are not affected by eviction.
+    """
+
+    label = "TTS cache"
+
+    def __init__(self, root: Path, max_bytes: int, enabled: bool = True):
+        super().__init__(root, max_bytes, enabled, extra_stats=("copies",))
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        base = self.root / key[:2] / key
+        return base.with_suffix(".mp3"), base.with_suffix(".json")
+
+    def _entries(self) -> Iterator[tuple[float, int, list[Path]]]:
+        for meta in self.root.glob("*/*.json"):
+            audio = meta.with_suffix(".mp3")
+            try:
+                yield meta.stat().st_mtime, audio.stat().st_size, [meta, audio]
+            except FileNotFoundError:
+                continue
+
+    def get(self, key: str, dest: Path) -> int | None:
+        """Place the cached audio for `key` at `dest`; returns its duration in ms, or None on a miss."""
+        if not self.enabled:
+            return None
+        audio, meta = self._paths(key)
+        try:
+            duration_ms = json.loads(meta.read_bytes())["duration_ms"]
+            linked = _place(audio, dest)
+        except (FileNotFoundError, ValueError, KeyError):
+            self._count(misses=1)
+            return None
+
+        os.utime(meta)  # mark as recently used
+        self._count(hits=1, copies=int(not linked))
+        return duration_ms
+
+    def put(self, key: str, src: Path, duration_ms: int, **meta: object) -> None:
+        """Store the audio at `src` (already generated) under `key`."""
+        if not self.enabled:
+            return
+        audio, meta_path = self._paths(key)
+        old_size = file_size(audio)
+        try:
+            _place(src, audio)
+            atomic_write(meta_path, json.dumps(
+                {"created": time.time(), "duration_ms": duration_ms, **meta}, ensure_ascii=False,
+            ).encode("utf-8"))
+        except OSError as e:
+            log.warning(f"Could not cache TTS audio {src}: {e}")
+            return
+        self._stored(file_size(audio), old_size)
+
+
+tts_cache = TTSCache(
+    TTS_CACHE_DIR,
+    max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024,
+    enabled=TTS_CACHE_ENABLED,
+)
@@ -7,10 +7,14 @@ import subprocess
 import uuid
 from pathlib import Path
 
-from config import CHARACTERS_DIR, SHORTS_CODE_DIR, SHORTS_DIR
-from services.llm import generate_json
-from services.elevenlabs import generate_tts as el_generate_tts, get_audio_duration_ms
+from config import SHORTS_CODE_DIR, SHORTS_DIR
+from services.asset_registry import character_registry
+from services.llm import agenerate_json
+from services.elevenlabs import generate_tts as el_generate_tts
+from services.audio_mixer import MixClip, mix_to_wav
+from services.media_probe import get_audio_duration_ms
 from services.openai_images import get_client as get_openai_client
+from services.scheduler import scheduler
 from shorts.models import ShortState, ShortConfig, FlashcardItem
 from shorts.caption_models import CaptionConfig, TextStyle
 
@@ -29,14 +33,10 @@ REPEAT_COLORS = [
 
 def _load_all_voice_ids() -> list[str]:
     """Load all voice IDs from characters/registry.json."""
-    reg_path = CHARACTERS_DIR / "registry.json"
-    if not reg_path.exists():
-        return []
-    data = json.loads(reg_path.read_text(encoding="utf-8"))
-    return [char["voice_id"] for char in data.values() if char.get("voice_id")]
+    return [char["voice_id"] for char in character_registry.entries().values() if char.get("voice_id")]
 
 
-def generate_word_list(state: ShortState, count: int = 6) -> list[FlashcardItem]:
+async def generate_word_list(state: ShortState, count: int = 6) -> list[FlashcardItem]:
     """Use LLM to generate vocabulary items for a topic."""
     if state.theme == "which_one":
         prompt_file = "generate_which_one.txt"
@@ -46,10 +46,11 @@ def generate_word_list(state: ShortState, count: int = 6) -> list[FlashcardItem]
     prompt_template = (PROMPTS_DIR / prompt_file).read_text(encoding="utf-8")
     prompt = prompt_template.format(topic=state.topic, count=count)
 
-    result = generate_json(
+    result = await agenerate_json(
         system="You are a Chinese language teaching expert creating flashcard content. Return only valid JSON.",
         user=prompt,
         max_tokens=4096,
+        task="word_list",
     )
 
     items = []
@@ -85,12 +86,13 @@ def generate_item_image(item: FlashcardItem, config: ShortConfig, short_dir: Pat
     # Generate square image (1024x1024) for vertical video top half
     output_path.parent.mkdir(parents=True, exist_ok=True)
     client = get_openai_client()
-    response = client.images.generate(
-        model="gpt-image-1",
-        prompt=prompt,
-        n=1,
-        size="1024x1024",
-    )
+    with scheduler.sync_slot("openai"):
+        response = client.images.generate(
+            model="gpt-image-1",
+            prompt=prompt,
+            n=1,
+            size="1024x1024",
+        )
     image_b64 = response.data[0].b64_json
     output_path.write_bytes(base64.standard_b64decode(image_b64))
     return image_file
@@ -101,11 +103,12 @@ def generate_item_tts(item: FlashcardItem, config: ShortConfig, short_dir: Path)
     # Answer TTS (just the word)
     answer_file = f"audio/answer_{item.id}.mp3"
     answer_path = short_dir / answer_file
-    duration = el_generate_tts(
+    audio = el_generate_tts(
         config.voice_id, item.word_zh, answer_path, speed=config.tts_speed
     )
     item.tts_answer_file = answer_file
-    item.tts_answer_duration_ms = duration
+    item.tts_answer_duration_ms = audio.duration_ms
+    item.tts_tempo = audio.tempo
 
     if config.sentence_mode == "repeat":
         # Generate word repeats with cycling voices instead of sentence
@@ -114,11 +117,11 @@ def generate_item_tts(item: FlashcardItem, config: ShortConfig, short_dir: Path)
         # Sentence TTS (default)
         sentence_file = f"audio/sentence_{item.id}.mp3"
         sentence_path = short_dir / sentence_file
-        duration = el_generate_tts(
+        audio = el_generate_tts(
             config.voice_id, item.sentence_zh, sentence_path, speed=config.tts_speed
         )
         item.tts_sentence_file = sentence_file
-        item.tts_sentence_duration_ms = duration
+        item.tts_sentence_duration_ms = audio.duration_ms
 
     item.tts_generated = True
 
@@ -137,16 +140,18 @@ def generate_item_repeats(item: FlashcardItem, config: ShortConfig, short_dir: P
         voice = voice_ids[n % len(voice_ids)]
         repeat_file = f"audio/repeat_{item.id}_{n}.mp3"
         repeat_path = short_dir / repeat_file
-        dur = el_generate_tts(voice, item.word_zh, repeat_path, speed=config.tts_speed)
+        audio = el_generate_tts(voice, item.word_zh, repeat_path, speed=config.tts_speed)
         files.append(repeat_file)
-        durations.append(dur)
+        durations.append(audio.duration_ms)
 
     item.tts_repeat_files = files
     item.tts_repeat_durations_ms = durations
 
 
-def generate_question_tts(config: ShortConfig, short_dir: Path, theme: str = "whats_this") -> tuple[str, int]:
-    """Generate the shared question TTS clip. Returns (file, duration_ms)."""
+def generate_question_tts(
+    config: ShortConfig, short_dir: Path, theme: str = "whats_this",
+) -> tuple[str, int, float]:
+    """Generate the shared question TTS clip. Returns (file, duration_ms, tempo)."""
     if theme == "which_one":
         question_text = "哪个对？"
     else:
@@ -154,10 +159,10 @@ def generate_question_tts(config: ShortConfig, short_dir: Path, theme: str = "wh
 
     q_file = "audio/question.mp3"
     q_path = short_dir / q_file
-    duration = el_generate_tts(
+    audio = el_generate_tts(
         config.voice_id, question_text, q_path, speed=config.tts_speed
     )
-    return q_file, duration
+    return q_file, audio.duration_ms, audio.tempo
 
 
 def _ffmpeg_font_path(path: Path) -> str:
@@ -472,89 +477,47 @@ def _build_whats_this_video(state: ShortState, short_dir: Path) -> str:
 
         vf = ",".join(vf_parts)
 
-        # Audio inputs
-        q_audio_path = short_dir / state.tts_question_file
-        answer_audio_path = short_dir / item.tts_answer_file
-
+        # Audio: question, answer, then the repeats or the sentence, mixed into one stem
         q_delay = int(t_question * 1000)
         answer_delay = int(t_answer_reveal * 1000)
+        audio_clips = [
+            MixClip(path=short_dir / state.tts_question_file, start_ms=q_delay, tempo=state.tts_question_tempo),
+            MixClip(path=short_dir / item.tts_answer_file, start_ms=answer_delay, tempo=item.tts_tempo),
+        ]
 
         if is_repeat:
-            # Build audio: question + answer + each repeat clip
-            audio_inputs = [
-                "-i", str(q_audio_path),
-                "-i", str(answer_audio_path),
-            ]
-            filter_parts = [
-                f"[0:v]{vf}[vout]",
-                f"[1:a]adelay={q_delay}|{q_delay}[qa]",
-                f"[2:a]adelay={answer_delay}|{answer_delay}[aa]",
-            ]
-            mix_labels = ["[qa]", "[aa]"]
-            input_idx = 3
-
             for n, t_rep in enumerate(repeat_offsets):
-                rep_path = short_dir / item.tts_repeat_files[n]
-                audio_inputs.extend(["-i", str(rep_path)])
-                delay_ms = int(t_rep * 1000)
-                label = f"[r{n}]"
-                filter_parts.append(f"[{input_idx}:a]adelay={delay_ms}|{delay_ms}{label}")
-                mix_labels.append(label)
-                input_idx += 1
-
-            n_inputs = len(mix_labels)
-            filter_parts.append(
-                f"{''.join(mix_labels)}amix=inputs={n_inputs}:dropout_transition=0:normalize=0[aout]"
-            )
-            filter_complex = ";".join(filter_parts)
-
-            cmd = [
-                "ffmpeg", "-y",
-                "-loop", "1",
-                "-i", str(img_path),
-                *audio_inputs,
-                "-filter_complex", filter_complex,
-                "-map", "[vout]",
-                "-map", "[aout]",
-                "-c:v", "libx264",
-                "-t", f"{total_duration:.3f}",
-                "-pix_fmt", "yuv420p",
-                "-c:a", "aac",
-                "-shortest",
-                str(seg_path),
-            ]
+                audio_clips.append(MixClip(
+                    path=short_dir / item.tts_repeat_files[n],
+                    start_ms=int(t_rep * 1000),
+                    tempo=item.tts_tempo,
+                ))
         else:
-            # Sentence mode audio
-            sentence_audio_path = short_dir / item.tts_sentence_file
-            sentence_delay = int(t_sentence * 1000)
-
-            filter_complex = (
-                f"[0:v]{vf}[vout];"
-                f"[1:a]adelay={q_delay}|{q_delay}[qa];"
-                f"[2:a]adelay={answer_delay}|{answer_delay}[aa];"
-                f"[3:a]adelay={sentence_delay}|{sentence_delay}[sa];"
-                f"[qa][aa][sa]amix=inputs=3:dropout_transition=0:normalize=0[aout]"
-            )
+            audio_clips.append(MixClip(
+                path=short_dir / item.tts_sentence_file,
+                start_ms=int(t_sentence * 1000),
+                tempo=item.tts_tempo,
+            ))
+        stem_path = mix_to_wav(audio_clips, short_dir / f"_seg_{i}.wav")
 
-            cmd = [
-                "ffmpeg", "-y",
-                "-loop", "1",
-                "-i", str(img_path),
-                "-i", str(q_audio_path),
-                "-i", str(answer_audio_path),
-                "-i", str(sentence_audio_path),
-                "-filter_complex", filter_complex,
-                "-map", "[vout]",
-                "-map", "[aout]",
-                "-c:v", "libx264",
-                "-t", f"{total_duration:.3f}",
-                "-pix_fmt", "yuv420p",
-                "-c:a", "aac",
-                "-shortest",
-                str(seg_path),
-            ]
+        cmd = [
+            "ffmpeg", "-y",
+            "-loop", "1",
+            "-i", str(img_path),
+            "-i", str(stem_path),
+            "-filter_complex", f"[0:v]{vf}[vout]",
+            "-map", "[vout]",
+            "-map", "1:a",
+            "-c:v", "libx264",
+            "-t", f"{total_duration:.3f}",
+            "-pix_fmt", "yuv420p",
+            "-c:a", "aac",
+            "-shortest",
+            str(seg_path),
+        ]
 
         subprocess.run(cmd, check=True, capture_output=True)
+        stem_path.unlink(missing_ok=True)
         segment_paths.append(seg_path)
 
     # Concatenate + BGM + cleanup
@@ -853,25 +816,31 @@ def _build_which_one_video(state: ShortState, short_dir: Path) -> str:
 
         # Overlay timer video during countdown phase
         # Input [0] = timer video (.mov with alpha)
-        # Input [1] = question audio (.mp3)
+        # Input [1] = question audio, placed and padded to the segment length
         # color= source is generated inline in the filter graph
-        q_audio_path = short_dir / state.tts_question_file
-        q_delay = int(t_question * 1000)
+        stem_path = mix_to_wav(
+            [MixClip(
+                path=short_dir / state.tts_question_file,
+                start_ms=int(t_question * 1000),
+                tempo=state.tts_question_tempo,
+            )],
+            short_dir / f"_seg_{i}.wav",
+            duration_ms=int(total_duration * 1000),
+        )
 
         filter_complex = (
             f"{vf_chain}[base];"
             f"[0:v]setpts=PTS+{t_timer_start:.3f}/TB[timer];"
-            f"[base][timer]overlay=0:0:enable='between(t,{t_timer_start:.2f},{t_reveal:.2f})'[vout];"
-            f"[1:a]adelay={q_delay}|{q_delay},apad=whole_dur={total_duration:.3f}[aout]"
+            f"[base][timer]overlay=0:0:enable='between(t,{t_timer_start:.2f},{t_reveal:.2f})'[vout]"
         )
 
         cmd = [
             "ffmpeg", "-y",
             "-i", str(timer_video),
-            "-i", str(q_audio_path),
+            "-i", str(stem_path),
             "-filter_complex", filter_complex,
             "-map", "[vout]",
-            "-map", "[aout]",
+            "-map", "1:a",
             "-c:v", "libx264",
             "-t", f"{total_duration:.3f}",
             "-pix_fmt", "yuv420p",
@@ -880,6 +849,7 @@ def _build_which_one_video(state: ShortState, short_dir: Path) -> str:
         ]
 
         subprocess.run(cmd, check=True, capture_output=True)
+        stem_path.unlink(missing_ok=True)
         segment_paths.append(seg_path)
 
     # Concatenate + BGM + cleanup
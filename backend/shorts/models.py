@@ -10,6 +10,7 @@ class ShortSummary(BaseModel):
     title: str = ""
     date: str = ""
     completed: bool = False
+    current_step: str = "setup"
 
 
 class ShortConfig(BaseModel):
@@ -49,6 +50,7 @@ class FlashcardItem(BaseModel):
     tts_sentence_duration_ms: int = 0
     tts_repeat_files: list[str] = []
     tts_repeat_durations_ms: list[int] = []
+    tts_tempo: float = 1.0  # speed-up applied to this item's clips when rendering
     tts_generated: bool = False
     wrong_sentence_zh: str = ""
     wrong_sentence_pinyin: str = ""
@@ -67,5 +69,6 @@ class ShortState(BaseModel):
     assets_approved: bool = False
     tts_question_file: str = ""
     tts_question_duration_ms: int = 0
+    tts_question_tempo: float = 1.0
     output_file: str = ""
     completed: bool = False
@@ -1,9 +1,10 @@
+import asyncio
 import json
 import shutil
 from datetime import datetime
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
 from pydantic import BaseModel
 
 from fastapi import UploadFile, File as FastAPIFile
@@ -12,42 +13,37 @@ from config import SHORTS_DIR, SHORTS_CODE_DIR
 from shorts.models import ShortState, ShortSummary, ShortConfig, FlashcardItem
 from shorts.caption_models import CaptionConfig
 from shorts.caption_presets import PRESETS as CAPTION_PRESETS
+from services.llm_metrics import llm_metrics
+from services.registry_index import short_index
+from services.scheduler import Priority, priority
+from services.serialization import json_response
+from services.state_store import short_store
 
 router = APIRouter(prefix="/api/shorts", tags=["shorts"])
 
-REGISTRY_PATH = SHORTS_DIR / "registry.json"
 CAPTIONS_CONFIG_PATH = SHORTS_DIR / "captions_config.json"
 
 
-def _load_registry() -> list[dict]:
-    if not REGISTRY_PATH.exists():
-        return []
-    return json.loads(REGISTRY_PATH.read_text(encoding="utf-8"))
-
-
-def _save_registry(registry: list[dict]) -> None:
-    SHORTS_DIR.mkdir(parents=True, exist_ok=True)
-    REGISTRY_PATH.write_text(json.dumps(registry, indent=2), encoding="utf-8")
-
-
-def _load_state(short_id: str) -> ShortState:
-    state_path = SHORTS_DIR / short_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Short {short_id} not found")
-    return ShortState(**json.loads(state_path.read_text(encoding="utf-8")))
-
-
-def _save_state(short_id: str, state: ShortState) -> None:
-    state_path = SHORTS_DIR / short_id / "state.json"
-    state_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
-
-
 # --- CRUD ---
 
 
 @router.get("/")
-async def list_shorts() -> list[ShortSummary]:
-    return [ShortSummary(**s) for s in _load_registry()]
+async def list_shorts(
+    response: Response,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    day: str | None = None,
+    completed: bool | None = None,
+    current_step: str | None = None,
+    theme: str | None = None,
+) -> list[ShortSummary]:
+    """Shorts in creation order. Pass `limit` to page; the next page's cursor is in X-Next-Cursor."""
+    page, next_cursor = short_index.page(
+        cursor, limit, day=day, completed=completed, current_step=current_step, theme=theme,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
 
 
 class CreateShortRequest(BaseModel):
@@ -57,16 +53,14 @@ class CreateShortRequest(BaseModel):
 
 @router.post("/")
 async def create_short(req: CreateShortRequest) -> ShortSummary:
-    registry = _load_registry()
-    num = len(registry) + 1
-    short_id = f"short_{num:03d}"
+    num, short_id = await asyncio.to_thread(short_index.allocate)
     short_dir = SHORTS_DIR / short_id
     short_dir.mkdir(parents=True, exist_ok=True)
     (short_dir / "images").mkdir(exist_ok=True)
     (short_dir / "audio").mkdir(exist_ok=True)
 
     state = ShortState(id=short_id, theme=req.theme, topic=req.topic)
-    _save_state(short_id, state)
+    short_store.create(short_id, state)
 
     summary = ShortSummary(
         id=short_id,
@@ -75,8 +69,7 @@ async def create_short(req: CreateShortRequest) -> ShortSummary:
         title=req.topic or f"Short {num}",
         date=datetime.now().isoformat(),
     )
-    registry.append(summary.model_dump())
-    _save_registry(registry)
+    await asyncio.to_thread(short_index.add, summary)
     return summary
 
 
@@ -159,16 +152,25 @@ async def delete_sfx(filename: str):
 
 @router.get("/{short_id}")
 async def get_short(short_id: str) -> ShortState:
-    return _load_state(short_id)
+    return json_response(short_store.load(short_id))
+
+
+@router.get("/{short_id}/history")
+async def get_short_history(short_id: str):
+    return short_store.history(short_id)
+
+
+@router.get("/{short_id}/metrics/llm")
+async def get_short_llm_metrics(short_id: str):
+    """LLM calls made for this short, rolled up per task, plus the most recent ones."""
+    return await asyncio.to_thread(llm_metrics.owner_summary, short_id)
 
 
 @router.delete("/{short_id}")
 async def delete_short(short_id: str):
-    registry = _load_registry()
-    if not any(s["id"] == short_id for s in registry):
+    if not await asyncio.to_thread(short_index.remove, short_id):
         raise HTTPException(404, f"Short {short_id} not found")
-    registry = [s for s in registry if s["id"] != short_id]
-    _save_registry(registry)
+    short_store.delete(short_id)
     short_dir = SHORTS_DIR / short_id
     if short_dir.exists():
         shutil.rmtree(short_dir)
@@ -180,9 +182,8 @@ async def delete_short(short_id: str):
 
 @router.put("/{short_id}/config")
 async def update_config(short_id: str, config: ShortConfig) -> ShortConfig:
-    state = _load_state(short_id)
-    state.config = config
-    _save_state(short_id, state)
+    async with short_store.transaction(short_id) as state:
+        state.config = config
     return config
 
 
@@ -193,12 +194,11 @@ class UpdateTopicRequest(BaseModel):
 
 @router.put("/{short_id}/setup")
 async def update_setup(short_id: str, req: UpdateTopicRequest) -> ShortState:
-    state = _load_state(short_id)
-    if req.topic:
-        state.topic = req.topic
-    if req.theme:
-        state.theme = req.theme
-    _save_state(short_id, state)
+    async with short_store.transaction(short_id) as state:
+        if req.topic:
+            state.topic = req.topic
+        if req.theme:
+            state.theme = req.theme
     return state
 
 
@@ -213,83 +213,105 @@ class GenerateContentRequest(BaseModel):
 async def generate_content(short_id: str, req: GenerateContentRequest):
     from shorts.logic import generate_word_list
 
-    state = _load_state(short_id)
+    state = short_store.load(short_id)
     if not state.topic:
         raise HTTPException(400, "Topic is required before generating content")
-    items = generate_word_list(state, count=req.count)
-    state.items = items
-    state.current_step = "content"
-    state.content_approved = False
-    _save_state(short_id, state)
-    return {"items": [item.model_dump() for item in items]}
+    items = await generate_word_list(state, count=req.count)
+    async with short_store.transaction(short_id) as state:
+        state.items = items
+        state.current_step = "content"
+        state.content_approved = False
+    return json_response({"items": items})
 
 
 @router.put("/{short_id}/items")
 async def update_items(short_id: str, items: list[FlashcardItem]):
-    state = _load_state(short_id)
-    state.items = items
-    _save_state(short_id, state)
-    return {"items": [item.model_dump() for item in items]}
+    async with short_store.transaction(short_id) as state:
+        state.items = items
+    return json_response({"items": items})
 
 
 @router.post("/{short_id}/approve-content")
 async def approve_content(short_id: str):
-    state = _load_state(short_id)
-    if not state.items:
-        raise HTTPException(400, "No content to approve")
-    state.content_approved = True
-    state.current_step = "assets"
-    _save_state(short_id, state)
+    async with short_store.transaction(short_id) as state:
+        if not state.items:
+            raise HTTPException(400, "No content to approve")
+        state.content_approved = True
+        state.current_step = "assets"
     return {"content_approved": True, "current_step": "assets"}
 
 
 # --- Assets ---
 
+IMAGE_FIELDS = ("image_file", "image_generated")
+TTS_FIELDS = tuple(f for f in FlashcardItem.model_fields if f.startswith("tts_"))
+
+
+def _merge_item(
+    state: ShortState, generated: FlashcardItem, fields: tuple[str, ...], source_field: str,
+) -> FlashcardItem | None:
+    """Copy `fields` from a generated item copy into the live item.
+
+    Returns None (and merges nothing) if the item was removed or its
+    `source_field` edited while the asset was being generated.
+    """
+    current = next((i for i in state.items if i.id == generated.id), None)
+    if not current or getattr(current, source_field) != getattr(generated, source_field):
+        return None
+    for field in fields:
+        setattr(current, field, getattr(generated, field))
+    return current
+
 
 @router.post("/{short_id}/generate-image/{item_id}")
 async def generate_image(short_id: str, item_id: str):
     from shorts.logic import generate_item_image
 
-    state = _load_state(short_id)
+    state = short_store.load(short_id)
     item = next((i for i in state.items if i.id == item_id), None)
     if not item:
         raise HTTPException(404, f"Item {item_id} not found")
+    item = item.model_copy(deep=True)
     short_dir = SHORTS_DIR / short_id
-    image_file = generate_item_image(item, state.config, short_dir)
-    item.image_file = image_file
+    with priority(Priority.INTERACTIVE):
+        item.image_file = await asyncio.to_thread(generate_item_image, item, state.config, short_dir)
     item.image_generated = True
-    _save_state(short_id, state)
-    return item.model_dump()
+    async with short_store.transaction(short_id, source=f"image:{item_id}") as current:
+        merged = _merge_item(current, item, IMAGE_FIELDS, "image_prompt")
+        if not merged:
+            raise HTTPException(409, f"Item {item_id} was edited or removed during generation")
+        return merged.model_dump()
 
 
 @router.post("/{short_id}/generate-all-images")
 async def generate_all_images(short_id: str):
     from shorts.logic import generate_item_image
 
-    state = _load_state(short_id)
     short_dir = SHORTS_DIR / short_id
-    for item in state.items:
+    for item in short_store.load(short_id).items:
         if not item.image_generated:
-            image_file = generate_item_image(item, state.config, short_dir)
-            item.image_file = image_file
+            # A fresh copy per worker: the shared state keeps changing meanwhile
+            config = short_store.load(short_id).config
+            with priority(Priority.BACKGROUND):
+                item.image_file = await asyncio.to_thread(generate_item_image, item, config, short_dir)
             item.image_generated = True
-            _save_state(short_id, state)
-    return {"items": [item.model_dump() for item in state.items]}
+            async with short_store.transaction(short_id, source=f"image:{item.id}") as current:
+                _merge_item(current, item, IMAGE_FIELDS, "image_prompt")
+    return json_response({"items": short_store.load(short_id).items})
 
 
 @router.delete("/{short_id}/revert-image/{item_id}")
 async def revert_image(short_id: str, item_id: str):
-    state = _load_state(short_id)
-    item = next((i for i in state.items if i.id == item_id), None)
-    if not item:
-        raise HTTPException(404, f"Item {item_id} not found")
-    if item.image_file:
-        img_path = SHORTS_DIR / short_id / item.image_file
-        if img_path.exists():
-            img_path.unlink()
-    item.image_file = ""
-    item.image_generated = False
-    _save_state(short_id, state)
+    async with short_store.transaction(short_id) as state:
+        item = next((i for i in state.items if i.id == item_id), None)
+        if not item:
+            raise HTTPException(404, f"Item {item_id} not found")
+        if item.image_file:
+            img_path = SHORTS_DIR / short_id / item.image_file
+            if img_path.exists():
+                img_path.unlink()
+        item.image_file = ""
+        item.image_generated = False
     return item.model_dump()
 
 
@@ -297,41 +319,46 @@ async def revert_image(short_id: str, item_id: str):
 async def generate_tts(short_id: str):
     from shorts.logic import generate_item_tts, generate_question_tts
 
-    state = _load_state(short_id)
+    state = short_store.load(short_id)
     if not state.config.voice_id:
         raise HTTPException(400, "Voice ID must be set before generating TTS")
     short_dir = SHORTS_DIR / short_id
 
     # Generate shared question TTS (theme-aware)
     if not state.tts_question_file:
-        q_file, q_dur = generate_question_tts(state.config, short_dir, theme=state.theme)
-        state.tts_question_file = q_file
-        state.tts_question_duration_ms = q_dur
-        _save_state(short_id, state)
+        q_file, q_dur, q_tempo = await asyncio.to_thread(
+            generate_question_tts, state.config, short_dir, theme=state.theme
+        )
+        async with short_store.transaction(short_id, source="tts:question") as current:
+            current.tts_question_file = q_file
+            current.tts_question_duration_ms = q_dur
+            current.tts_question_tempo = q_tempo
 
     # Generate per-item TTS
     for item in state.items:
         if not item.tts_generated:
-            generate_item_tts(item, state.config, short_dir)
-            _save_state(short_id, state)
+            config = short_store.load(short_id).config
+            with priority(Priority.BACKGROUND):
+                await asyncio.to_thread(generate_item_tts, item, config, short_dir)
+            async with short_store.transaction(short_id, source=f"tts:{item.id}") as current:
+                _merge_item(current, item, TTS_FIELDS, "word_zh")
 
-    return state.model_dump()
+    return json_response(short_store.load(short_id))
 
 
 @router.post("/{short_id}/approve-assets")
 async def approve_assets(short_id: str):
-    state = _load_state(short_id)
-    all_tts = all(i.tts_generated for i in state.items)
-    if not all_tts:
-        raise HTTPException(400, "Not all TTS clips have been generated")
-    # Images only required for whats_this theme
-    if state.theme != "which_one":
-        all_images = all(i.image_generated for i in state.items)
-        if not all_images:
-            raise HTTPException(400, "Not all images have been generated")
-    state.assets_approved = True
-    state.current_step = "export"
-    _save_state(short_id, state)
+    async with short_store.transaction(short_id) as state:
+        all_tts = all(i.tts_generated for i in state.items)
+        if not all_tts:
+            raise HTTPException(400, "Not all TTS clips have been generated")
+        # Images only required for whats_this theme
+        if state.theme != "which_one":
+            all_images = all(i.image_generated for i in state.items)
+            if not all_images:
+                raise HTTPException(400, "Not all images have been generated")
+        state.assets_approved = True
+        state.current_step = "export"
     return {"assets_approved": True, "current_step": "export"}
 
 
@@ -342,11 +369,11 @@ async def approve_assets(short_id: str):
 async def export_video(short_id: str):
     from shorts.logic import build_short_video
 
-    state = _load_state(short_id)
+    state = short_store.load(short_id)
     short_dir = SHORTS_DIR / short_id
-    output_file = build_short_video(state, short_dir)
-    state.output_file = output_file
-    _save_state(short_id, state)
+    output_file = await asyncio.to_thread(build_short_video, state, short_dir)
+    async with short_store.transaction(short_id, source="export") as state:
+        state.output_file = output_file
     return {"output_file": output_file}
 
 
@@ -354,7 +381,7 @@ async def export_video(short_id: str):
 async def download_video(short_id: str):
     from fastapi.responses import FileResponse
 
-    state = _load_state(short_id)
+    state = short_store.load(short_id)
     if not state.output_file:
         raise HTTPException(404, "No video has been exported yet")
     video_path = SHORTS_DIR / short_id / state.output_file
@@ -369,16 +396,8 @@ async def download_video(short_id: str):
 
 @router.post("/{short_id}/approve")
 async def approve_short(short_id: str):
-    state = _load_state(short_id)
-    state.completed = True
-    _save_state(short_id, state)
-
-    # Update registry
-    registry = _load_registry()
-    for s in registry:
-        if s["id"] == short_id:
-            s["completed"] = True
-            s["title"] = state.title or state.topic
-            break
-    _save_registry(registry)
+    async with short_store.transaction(short_id) as state:
+        state.completed = True
+
+    await asyncio.to_thread(short_index.update, short_id, title=state.title or state.topic)
     return {"completed": True}
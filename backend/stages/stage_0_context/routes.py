@@ -1,41 +1,28 @@
-import json
+from fastapi import APIRouter
 
-from fastapi import APIRouter, HTTPException
-
-from config import CHARACTERS_DIR, SETTINGS_DIR, EPISODES_DIR
-from models import EpisodeState, EpisodeSummary, ContextData
+from models import ContextData
+from services.asset_registry import character_registry, setting_registry
+from services.registry_index import episode_index
+from services.state_store import episode_store
 
 router = APIRouter(prefix="/api/episodes/{ep_id}", tags=["context"])
 
 
 @router.get("/context")
 async def load_context(ep_id: str):
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-
-    characters = json.loads((CHARACTERS_DIR / "registry.json").read_text(encoding="utf-8"))
-    settings = json.loads((SETTINGS_DIR / "registry.json").read_text(encoding="utf-8"))
-
-    registry_path = EPISODES_DIR / "registry.json"
-    all_episodes: list[dict] = json.loads(registry_path.read_text(encoding="utf-8")) if registry_path.exists() else []
-    history = [ep for ep in all_episodes if ep["id"] != ep_id]
-
-    # Enrich history with script summaries from each episode's state
-    enriched_history = []
-    for ep in history:
-        ep_state_path = EPISODES_DIR / ep["id"] / "state.json"
-        summary_text = ep.get("summary", "")
-        if ep_state_path.exists() and not summary_text:
-            ep_state = json.loads(ep_state_path.read_text(encoding="utf-8"))
-            script = ep_state.get("script", {})
-            summary_text = script.get("idea", "")
-        enriched_history.append(EpisodeSummary(
-            id=ep["id"],
-            title=ep["title"],
-            summary=summary_text,
-            date=ep.get("date", ""),
-        ))
+    if not episode_store.exists(ep_id):
+        episode_store.load(ep_id)  # raises StateNotFoundError
+
+    characters = character_registry.entries()
+    settings = setting_registry.entries()
+
+    # The registry index tracks each episode's script idea, so no other
+    # episode's state has to be opened here
+    enriched_history = [
+        ep.model_copy(update={"summary": ep.summary or ep.idea})
+        for ep in episode_index.items()
+        if ep.id != ep_id
+    ]
 
     context = ContextData(
         characters=characters,
@@ -44,8 +31,7 @@ async def load_context(ep_id: str):
     )
 
     # Update episode state with context
-    state = EpisodeState(**json.loads(state_path.read_text(encoding="utf-8")))
-    state.context = context
-    state_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
+    async with episode_store.transaction(ep_id) as state:
+        state.context = context
 
     return context.model_dump()
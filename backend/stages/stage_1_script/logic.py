@@ -1,11 +1,25 @@
+import difflib
+import json
 import uuid
 from pathlib import Path
+from typing import AsyncIterator
 
 from models import EpisodeState, ScriptLine
-from services.llm import generate_json
+from services.json_stream import ArrayItemParser
+from services.llm import agenerate_json, astream, system_blocks
 
 PROMPTS_DIR = Path(__file__).parent / "prompts"
 
+# Unchanged lines shown before and after a range being regenerated
+CONTEXT_LINES = 8
+# Output token budget per regenerated line (one line of JSON is ~100 tokens)
+TOKENS_PER_LINE = 200
+
+
+def load_schema(name: str) -> dict:
+    """JSON schema for a structured (tool use) answer, from prompts/schemas."""
+    return json.loads((PROMPTS_DIR / "schemas" / f"{name}.json").read_text(encoding="utf-8"))
+
 
 def format_characters(characters: dict) -> str:
     lines = []
@@ -30,56 +44,146 @@ def format_episode_history(history: list[dict]) -> str:
     return "\n".join(lines)
 
 
-def check_seed(state: EpisodeState, seed: str) -> dict:
-    prompt_template = (PROMPTS_DIR / "seed_check.txt").read_text(encoding="utf-8")
+def _context_block(state: EpisodeState) -> str:
+    """Characters and settings, shared by every stage 1 prompt for this episode."""
+    return (PROMPTS_DIR / "context.txt").read_text(encoding="utf-8").format(
+        characters=format_characters(state.context.characters),
+        settings=format_settings(state.context.settings),
+    )
+
+
+def _history_block(state: EpisodeState) -> str:
     history = [ep.model_dump() for ep in state.context.episode_history]
-    prompt = prompt_template.format(
+    return (PROMPTS_DIR / "history.txt").read_text(encoding="utf-8").format(
         episode_history=format_episode_history(history),
-        seed=seed,
     )
-    return generate_json(
-        system="You check story ideas for conflicts with previous episodes. Return JSON only.",
-        user=prompt,
+
+
+async def check_seed(state: EpisodeState, seed: str, refresh: bool = False) -> dict:
+    prompt_template = (PROMPTS_DIR / "seed_check.txt").read_text(encoding="utf-8")
+    # Same leading blocks as generate_idea, so the idea call that usually
+    # follows reads characters, settings and history from the prompt cache
+    return await agenerate_json(
+        system=system_blocks(
+            _context_block(state), _history_block(state),
+            instructions="You check story ideas for conflicts with previous episodes. Return JSON only.",
+        ),
+        user=prompt_template.format(seed=seed),
+        cache=True,
+        refresh=refresh,
+        schema=load_schema("seed_check"),
+        task="seed_check",
     )
 
 
-def generate_idea(state: EpisodeState, seed: str) -> dict:
+async def generate_idea(state: EpisodeState, seed: str) -> dict:
     prompt_template = (PROMPTS_DIR / "generate_idea.txt").read_text(encoding="utf-8")
-    history = [ep.model_dump() for ep in state.context.episode_history]
-    prompt = prompt_template.format(
-        characters=format_characters(state.context.characters),
-        settings=format_settings(state.context.settings),
-        episode_history=format_episode_history(history),
-        seed=seed,
+    return await agenerate_json(
+        system=system_blocks(
+            _context_block(state), _history_block(state),
+            instructions="You are a creative writer for a Chinese learning show. Return JSON only.",
+        ),
+        user=prompt_template.format(seed=seed),
+        schema=load_schema("generate_idea"),
+        task="idea",
     )
-    return generate_json(
-        system="You are a creative writer for a Chinese learning show. Return JSON only.",
-        user=prompt,
+
+
+def _script_system(state: EpisodeState) -> list[dict]:
+    return system_blocks(
+        _context_block(state),
+        instructions="You are a scriptwriter for a Chinese learning show. Return JSON only.",
     )
 
 
-def generate_script(state: EpisodeState, idea: str) -> list[ScriptLine]:
+def _script_prompt(idea: str) -> str:
     prompt_template = (PROMPTS_DIR / "generate_script.txt").read_text(encoding="utf-8")
-    prompt = prompt_template.format(
-        characters=format_characters(state.context.characters),
-        settings=format_settings(state.context.settings),
-        idea=idea,
+    return prompt_template.format(idea=idea)
+
+
+def _script_line(order: int, line_data: dict) -> ScriptLine:
+    return ScriptLine(
+        id=str(uuid.uuid4())[:8],
+        order=order,
+        character_id=line_data["character_id"],
+        text_zh=line_data["text_zh"],
+        text_en=line_data["text_en"],
+        text_pinyin=line_data["text_pinyin"],
+        direction=line_data.get("direction") or None,
+        emotion=line_data.get("emotion", ""),
     )
-    result = generate_json(
-        system="You are a scriptwriter for a Chinese learning show. Return JSON only.",
-        user=prompt,
+
+
+async def generate_script(state: EpisodeState, idea: str) -> list[ScriptLine]:
+    result = await agenerate_json(
+        system=_script_system(state),
+        user=_script_prompt(idea),
         max_tokens=16384,
+        task="script",
     )
-    lines = []
-    for i, line_data in enumerate(result.get("lines", [])):
-        lines.append(ScriptLine(
-            id=str(uuid.uuid4())[:8],
-            order=i,
-            character_id=line_data["character_id"],
-            text_zh=line_data["text_zh"],
-            text_en=line_data["text_en"],
-            text_pinyin=line_data["text_pinyin"],
-            direction=line_data.get("direction") or None,
-            emotion=line_data.get("emotion", ""),
-        ))
-    return lines
+    return [_script_line(i, line_data) for i, line_data in enumerate(result.get("lines", []))]
+
+
+async def stream_script(state: EpisodeState, idea: str) -> AsyncIterator[ScriptLine]:
+    """Like `generate_script`, but yields each line as soon as Claude has finished writing it."""
+    parser = ArrayItemParser("lines")
+    order = 0
+    async for chunk in astream(_script_system(state), _script_prompt(idea), max_tokens=16384, task="script"):
+        for line_data in parser.feed(chunk):
+            yield _script_line(order, line_data)
+            order += 1
+
+
+def merge_regenerated(old: list[ScriptLine], new: list[ScriptLine]) -> tuple[list[ScriptLine], list[dict]]:
+    """Match regenerated lines against the ones they replace.
+
+    Lines that came back with the same speaker and Chinese text are kept as
+    they were, id included, so their TTS audio and scene links stay valid.
+    Returns the lines to splice in and a diff of `keep`/`remove`/`add` ops
+    in script order.
+    """
+    key = lambda line: (line.character_id, line.text_zh.strip())
+    matcher = difflib.SequenceMatcher(a=[key(l) for l in old], b=[key(l) for l in new], autojunk=False)
+    merged: list[ScriptLine] = []
+    diff: list[dict] = []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            merged.extend(old[i1:i2])
+            diff.extend({"op": "keep", "line": line} for line in old[i1:i2])
+            continue
+        diff.extend({"op": "remove", "line": line} for line in old[i1:i2])
+        merged.extend(new[j1:j2])
+        diff.extend({"op": "add", "line": line} for line in new[j1:j2])
+    return merged, diff
+
+
+async def regenerate_lines(
+    state: EpisodeState, start: int, end: int, instruction: str = "",
+) -> tuple[list[ScriptLine], list[dict]]:
+    """Rewrite `state.script.lines[start:end + 1]`, leaving the rest of the script alone.
+
+    Only the range plus CONTEXT_LINES on either side is sent, and only the
+    replacement lines are generated. Returns `merge_regenerated`'s result.
+    """
+    lines = state.script.lines
+    first, last = max(0, start - CONTEXT_LINES), min(len(lines), end + 1 + CONTEXT_LINES)
+    excerpt = "\n".join(
+        f"{'>>' if start <= i <= end else '  '} {i + 1}. [{line.character_id}] {line.text_zh} ({line.text_en})"
+        + (f" [direction: {line.direction}]" if line.direction else "")
+        for i, line in enumerate(lines[first:last], start=first)
+    )
+    count = end - start + 1
+    prompt_template = (PROMPTS_DIR / "regenerate_lines.txt").read_text(encoding="utf-8")
+    result = await agenerate_json(
+        system=_script_system(state),
+        user=prompt_template.format(
+            idea=state.script.idea,
+            script=excerpt,
+            instruction=instruction or "Improve these lines.",
+            count=count,
+        ),
+        max_tokens=min(16384, 1024 + TOKENS_PER_LINE * count),
+        task="script_edit",
+    )
+    new = [_script_line(start + i, line_data) for i, line_data in enumerate(result.get("lines", []))]
+    return merge_regenerated(lines[start:end + 1], new)
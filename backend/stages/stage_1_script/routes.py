@@ -1,25 +1,21 @@
-import json
+import asyncio
+import logging
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from config import EPISODES_DIR
-from models import EpisodeState, ScriptLine
-from stages.stage_1_script.logic import check_seed, generate_idea, generate_script
-
-router = APIRouter(prefix="/api/episodes/{ep_id}/script", tags=["script"])
-
-
-def _load_state(ep_id: str) -> EpisodeState:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-    return EpisodeState(**json.loads(state_path.read_text(encoding="utf-8")))
+from models import ScriptLine
+from services.registry_index import episode_index
+from services.serialization import json_response, sse_event
+from services.state_store import episode_store
+from stages.stage_1_script.logic import (
+    check_seed, generate_idea, generate_script, regenerate_lines, stream_script,
+)
 
+log = logging.getLogger(__name__)
 
-def _save_state(ep_id: str, state: EpisodeState) -> None:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    state_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
+router = APIRouter(prefix="/api/episodes/{ep_id}/script", tags=["script"])
 
 
 class SeedRequest(BaseModel):
@@ -34,85 +30,158 @@ class GenerateScriptRequest(BaseModel):
     idea: str
 
 
+class RegenerateLinesRequest(BaseModel):
+    start: int  # first line to rewrite, 0-based
+    end: int  # last line to rewrite, inclusive
+    instruction: str = ""
+
+
 class AddLineRequest(BaseModel):
     position: int
     line: ScriptLine
 
 
 @router.post("/check-seed")
-async def check_seed_endpoint(ep_id: str, req: SeedRequest):
-    state = _load_state(ep_id)
-    result = check_seed(state, req.seed)
-    state.script.seed = req.seed
-    _save_state(ep_id, state)
+async def check_seed_endpoint(ep_id: str, req: SeedRequest, refresh: bool = False):
+    result = await check_seed(episode_store.load(ep_id), req.seed, refresh=refresh)
+    async with episode_store.transaction(ep_id) as state:
+        state.script.seed = req.seed
     return result
 
 
 @router.post("/generate-idea")
 async def generate_idea_endpoint(ep_id: str, req: IdeaRequest):
-    state = _load_state(ep_id)
-    result = generate_idea(state, req.seed)
-    state.script.seed = req.seed
-    state.script.idea = result.get("idea", "")
-    _save_state(ep_id, state)
+    result = await generate_idea(episode_store.load(ep_id), req.seed)
+    async with episode_store.transaction(ep_id) as state:
+        state.script.seed = req.seed
+        state.script.idea = result.get("idea", "")
     return result
 
 
 @router.post("/generate-script")
 async def generate_script_endpoint(ep_id: str, req: GenerateScriptRequest):
-    state = _load_state(ep_id)
-    lines = generate_script(state, req.idea)
-    state.script.idea = req.idea
-    state.script.lines = lines
-    state.current_stage = "stage_1_script"
-    _save_state(ep_id, state)
-    return [line.model_dump() for line in lines]
+    lines = await generate_script(episode_store.load(ep_id), req.idea)
+    async with episode_store.transaction(ep_id) as state:
+        state.script.idea = req.idea
+        state.script.lines = lines
+        state.current_stage = "stage_1_script"
+    return json_response(lines)
+
+
+@router.post("/generate-script/stream")
+async def stream_script_endpoint(ep_id: str, req: GenerateScriptRequest):
+    """Generate the script as Server-Sent Events.
+
+    Sends a `line` event with each ScriptLine as soon as it is complete,
+    then `done` with the line count. Each line is saved to
+    `script.draft_lines` as it arrives, and the draft replaces the script
+    once the last one has. On failure (or a disconnect) an `error` event is
+    sent; the previous script is kept, and so is the draft, which
+    `generate-script/keep-draft` can still promote.
+    """
+    state = episode_store.load(ep_id)
+    async with episode_store.transaction(ep_id, source="script:stream") as current:
+        current.script.draft_lines = []
+
+    async def events():
+        count = 0
+        try:
+            async for line in stream_script(state, req.idea):
+                async with episode_store.transaction(ep_id, source="script:stream") as current:
+                    current.script.draft_lines.append(line)
+                count += 1
+                yield sse_event("line", line)
+            if not count:
+                raise ValueError("Claude returned no script lines")
+            async with episode_store.transaction(ep_id, source="script:stream") as current:
+                current.script.idea = req.idea
+                current.script.lines, current.script.draft_lines = current.script.draft_lines, []
+                current.current_stage = "stage_1_script"
+        except Exception as e:
+            log.exception(f"Script streaming failed for {ep_id}")
+            yield sse_event("error", {"detail": str(e), "count": count})
+            return
+        yield sse_event("done", {"count": count})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/generate-script/keep-draft")
+async def keep_draft(ep_id: str, req: GenerateScriptRequest):
+    """Use the lines of an interrupted streamed script as the script."""
+    async with episode_store.transaction(ep_id, source="script:draft") as state:
+        if not state.script.draft_lines:
+            raise HTTPException(400, "No streamed lines to keep")
+        state.script.idea = req.idea
+        state.script.lines, state.script.draft_lines = state.script.draft_lines, []
+        state.current_stage = "stage_1_script"
+        return json_response(state.script.lines)
+
+
+@router.post("/regenerate-lines")
+async def regenerate_lines_endpoint(ep_id: str, req: RegenerateLinesRequest):
+    """Rewrite lines start..end and splice them into the script.
+
+    Returns the whole script and a diff of the range (`keep`/`remove`/`add`
+    ops). Lines outside the range, and lines Claude returns unchanged, keep
+    their ids.
+    """
+    state = episode_store.load(ep_id)
+    if not 0 <= req.start <= req.end < len(state.script.lines):
+        raise HTTPException(400, f"Line range {req.start}..{req.end} is outside the script")
+    old_ids = [line.id for line in state.script.lines[req.start:req.end + 1]]
+    new_lines, diff = await regenerate_lines(state, req.start, req.end, req.instruction)
+    if not new_lines:
+        raise HTTPException(502, "Claude returned no replacement lines")
+
+    async with episode_store.transaction(ep_id, source=f"script:lines {req.start}-{req.end}") as state:
+        lines = state.script.lines
+        if [line.id for line in lines[req.start:req.end + 1]] != old_ids:
+            raise HTTPException(409, "The script changed while regenerating; try again")
+        state.script.lines = lines[:req.start] + new_lines + lines[req.end + 1:]
+        for i, line in enumerate(state.script.lines):
+            line.order = i
+        return json_response({"lines": state.script.lines, "diff": diff})
 
 
 @router.put("/lines")
 async def update_lines(ep_id: str, lines: list[ScriptLine]):
-    state = _load_state(ep_id)
-    state.script.lines = lines
-    _save_state(ep_id, state)
-    return [line.model_dump() for line in lines]
+    async with episode_store.transaction(ep_id) as state:
+        state.script.lines = lines
+    return json_response(lines)
 
 
 @router.post("/lines")
 async def add_line(ep_id: str, req: AddLineRequest):
-    state = _load_state(ep_id)
-    state.script.lines.insert(req.position, req.line)
-    for i, line in enumerate(state.script.lines):
-        line.order = i
-    _save_state(ep_id, state)
-    return [line.model_dump() for line in state.script.lines]
+    async with episode_store.transaction(ep_id) as state:
+        state.script.lines.insert(req.position, req.line)
+        for i, line in enumerate(state.script.lines):
+            line.order = i
+    return json_response(state.script.lines)
 
 
 @router.delete("/lines/{line_id}")
 async def delete_line(ep_id: str, line_id: str):
-    state = _load_state(ep_id)
-    state.script.lines = [l for l in state.script.lines if l.id != line_id]
-    for i, line in enumerate(state.script.lines):
-        line.order = i
-    _save_state(ep_id, state)
-    return [line.model_dump() for line in state.script.lines]
+    async with episode_store.transaction(ep_id) as state:
+        state.script.lines = [l for l in state.script.lines if l.id != line_id]
+        for i, line in enumerate(state.script.lines):
+            line.order = i
+    return json_response(state.script.lines)
 
 
 @router.post("/approve")
 async def approve_script(ep_id: str):
-    state = _load_state(ep_id)
-    if not state.script.lines:
-        raise HTTPException(400, "Cannot approve empty script")
-    state.script.approved = True
-    state.current_stage = "stage_2_tts"
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        if not state.script.lines:
+            raise HTTPException(400, "Cannot approve empty script")
+        state.script.approved = True
+        state.current_stage = "stage_2_tts"
 
     # Update episode registry with summary
-    registry_path = EPISODES_DIR / "registry.json"
-    registry = json.loads(registry_path.read_text(encoding="utf-8")) if registry_path.exists() else []
-    for ep in registry:
-        if ep["id"] == ep_id:
-            ep["summary"] = state.script.idea
-            break
-    registry_path.write_text(json.dumps(registry, indent=2), encoding="utf-8")
+    await asyncio.to_thread(episode_index.update, ep_id, summary=state.script.idea)
 
     return {"approved": True, "current_stage": state.current_stage}
@@ -1,8 +1,9 @@
-from pathlib import Path
+from typing import Awaitable, Callable
 
 from config import EPISODES_DIR
 from models import EpisodeState, TTSLineStatus
-from services.elevenlabs import generate_tts
+from services.audio_analysis import analysis_path
+from services.elevenlabs import TTSAudio, agenerate_tts, agenerate_tts_stream, generate_tts
 
 
 def initialize_tts(state: EpisodeState) -> list[TTSLineStatus]:
@@ -19,8 +20,8 @@ def initialize_tts(state: EpisodeState) -> list[TTSLineStatus]:
     return statuses
 
 
-def generate_line_tts(state: EpisodeState, line_id: str) -> TTSLineStatus:
-    """Generate TTS for a single script line."""
+def _line_job(state: EpisodeState, line_id: str) -> tuple[str, str, str]:
+    """(voice_id, text to speak, audio file relative to the episode dir) for a line."""
     line = next((l for l in state.script.lines if l.id == line_id), None)
     if not line:
         raise ValueError(f"Line {line_id} not found in script")
@@ -33,22 +34,81 @@ def generate_line_tts(state: EpisodeState, line_id: str) -> TTSLineStatus:
     if not voice_id:
         raise ValueError(f"No voice_id for character {line.character_id}")
 
-    ep_dir = EPISODES_DIR / state.id
-    audio_dir = ep_dir / "audio"
-    audio_file = f"audio/line_{line_id}.mp3"
-    output_path = ep_dir / audio_file
-
     tts_text = f"[{line.emotion}] {line.text_zh}" if line.emotion else line.text_zh
-    duration_ms = generate_tts(voice_id, tts_text, output_path, speed=state.tts.speed)
+    return voice_id, tts_text, f"audio/line_{line_id}.mp3"
+
 
+def _line_status(line_id: str, audio_file: str, audio: TTSAudio) -> TTSLineStatus:
     return TTSLineStatus(
         line_id=line_id,
         audio_file=audio_file,
-        duration_ms=duration_ms,
+        duration_ms=audio.duration_ms,
         generated=True,
+        raw_duration_ms=audio.raw_duration_ms,
+        api_speed=audio.api_speed,
+        tempo=audio.tempo,
     )
 
 
+def generate_line_tts(state: EpisodeState, line_id: str, refresh: bool = False) -> TTSLineStatus:
+    """Generate TTS for a single script line (`refresh` bypasses the TTS cache)."""
+    voice_id, tts_text, audio_file = _line_job(state, line_id)
+    output_path = EPISODES_DIR / state.id / audio_file
+    audio = generate_tts(voice_id, tts_text, output_path, speed=state.tts.speed, refresh=refresh)
+
+    return _line_status(line_id, audio_file, audio)
+
+
+async def agenerate_line_tts(state: EpisodeState, line_id: str) -> TTSLineStatus:
+    """Async `generate_line_tts`, for batches."""
+    voice_id, tts_text, audio_file = _line_job(state, line_id)
+    output_path = EPISODES_DIR / state.id / audio_file
+    audio = await agenerate_tts(voice_id, tts_text, output_path, speed=state.tts.speed)
+
+    return _line_status(line_id, audio_file, audio)
+
+
+async def astream_line_tts(
+    state: EpisodeState, line_id: str,
+    on_chunk: Callable[[bytes], Awaitable[None]], refresh: bool = False,
+) -> TTSLineStatus:
+    """`generate_line_tts` through the streaming API, handing audio chunks to `on_chunk`."""
+    voice_id, tts_text, audio_file = _line_job(state, line_id)
+    output_path = EPISODES_DIR / state.id / audio_file
+    audio = await agenerate_tts_stream(
+        voice_id, tts_text, output_path, on_chunk, speed=state.tts.speed, refresh=refresh,
+    )
+
+    return _line_status(line_id, audio_file, audio)
+
+
+def retime_line_tts(status: TTSLineStatus, speed: float) -> None:
+    """Play an already generated line at `speed`: new tempo and duration, same file.
+
+    Older audio with the tempo baked into the file (no raw duration) is left as is.
+    """
+    if not status.generated or not status.raw_duration_ms:
+        return
+    audio = TTSAudio(
+        raw_duration_ms=status.raw_duration_ms, api_speed=status.api_speed, tempo=status.tempo,
+    ).at_speed(speed)
+    status.tempo = audio.tempo
+    status.duration_ms = audio.duration_ms
+
+
+def retime_intro_tts(state: EpisodeState) -> None:
+    """Retime the intro clip after `intro.speed` or `tts.speed` changed."""
+    intro = state.timeline.intro
+    if not intro.tts_generated or not intro.audio_raw_duration_ms:
+        return
+    speed = intro.speed if intro.speed != 1.0 else state.tts.speed
+    audio = TTSAudio(
+        raw_duration_ms=intro.audio_raw_duration_ms, api_speed=intro.audio_api_speed, tempo=intro.audio_tempo,
+    ).at_speed(speed)
+    intro.audio_tempo = audio.tempo
+    intro.audio_duration_ms = audio.duration_ms
+
+
 def revert_line_tts(state: EpisodeState, line_id: str) -> None:
     """Delete audio file for a line."""
     status = next(
@@ -58,3 +118,4 @@ def revert_line_tts(state: EpisodeState, line_id: str) -> None:
         audio_path = EPISODES_DIR / state.id / status.audio_file
         if audio_path.exists():
             audio_path.unlink()
+        analysis_path(audio_path).unlink(missing_ok=True)
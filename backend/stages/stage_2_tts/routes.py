@@ -1,41 +1,60 @@
-import json
-import uuid
+import asyncio
+import logging
+from typing import AsyncIterator
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 
-from config import EPISODES_DIR, ELEVENLABS_API_KEY
+from config import ELEVENLABS_API_KEY, EPISODES_DIR
 from models import EpisodeState, ScriptLine, TTSLineStatus
-from services.llm import generate_json
-from stages.stage_2_tts.logic import initialize_tts, generate_line_tts, revert_line_tts
+from services.audio_analysis import get_analysis, get_peaks
+from services.audio_streams import audio_streams
+from services.elevenlabs import split_speed
+from services.scheduler import Priority, priority
+from services.llm import agenerate_json
+from services.serialization import json_response, sse_event
+from services.state_store import episode_store
+from stages.stage_2_tts.logic import (
+    agenerate_line_tts, astream_line_tts, generate_line_tts, initialize_tts,
+    retime_intro_tts, retime_line_tts, revert_line_tts,
+)
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/episodes/{ep_id}/tts", tags=["tts"])
 
 
-def _load_state(ep_id: str) -> EpisodeState:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-    return EpisodeState(**json.loads(state_path.read_text(encoding="utf-8")))
+def _store_status(state: EpisodeState, result: TTSLineStatus) -> None:
+    """Merge a freshly generated line, retimed to the current speed.
 
+    The audio was generated at the speed read before the provider call; a
+    speed change that landed meanwhile only retimed the statuses it saw.
+    """
+    retime_line_tts(result, state.tts.speed)
+    for i, ls in enumerate(state.tts.line_statuses):
+        if ls.line_id == result.line_id:
+            state.tts.line_statuses[i] = result
+            return
+    state.tts.line_statuses.append(result)
 
-def _save_state(ep_id: str, state: EpisodeState) -> None:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    state_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
+
+def _line_unchanged(state: EpisodeState, line: ScriptLine) -> bool:
+    """True if `line` still exists with the same spoken text and emotion."""
+    current = next((l for l in state.script.lines if l.id == line.id), None)
+    return bool(current) and current.text_zh == line.text_zh and current.emotion == line.emotion
 
 
 @router.post("/initialize")
 async def initialize(ep_id: str):
-    state = _load_state(ep_id)
-    state.tts.line_statuses = initialize_tts(state)
-    state.current_stage = "stage_2_tts"
-    _save_state(ep_id, state)
-    return state.tts.model_dump()
+    async with episode_store.transaction(ep_id) as state:
+        state.tts.line_statuses = initialize_tts(state)
+        state.current_stage = "stage_2_tts"
+    return json_response(state.tts)
 
 
-@router.post("/generate/{line_id}")
-async def generate_single(ep_id: str, line_id: str):
-    state = _load_state(ep_id)
+def _check_can_generate(state: EpisodeState, line_id: str) -> int:
+    """Index of `line_id`; raises unless every earlier line has audio."""
     # Ensure line exists
     line_ids = [l.id for l in state.script.lines]
     if line_id not in line_ids:
@@ -53,88 +72,246 @@ async def generate_single(ep_id: str, line_id: str):
 
     if not ELEVENLABS_API_KEY:
         raise HTTPException(500, "ELEVENLABS_API_KEY not configured in .env")
+    return line_index
 
+
+@router.post("/generate/{line_id}")
+async def generate_single(ep_id: str, line_id: str, refresh: bool = False):
+    state = episode_store.load(ep_id)
+    line_index = _check_can_generate(state, line_id)
+    line = state.script.lines[line_index].model_copy()
     try:
-        result = generate_line_tts(state, line_id)
+        with priority(Priority.INTERACTIVE):
+            result = await asyncio.to_thread(generate_line_tts, state, line_id, refresh)
     except Exception as e:
         raise HTTPException(500, f"TTS generation failed for line {line_id}: {e}")
 
-    # Update status
-    found = False
-    for i, ls in enumerate(state.tts.line_statuses):
-        if ls.line_id == line_id:
-            state.tts.line_statuses[i] = result
-            found = True
-            break
-    if not found:
-        state.tts.line_statuses.append(result)
-
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id, source=f"tts:{line_id}") as state:
+        if not _line_unchanged(state, line):
+            raise HTTPException(409, f"Line {line_id} was edited or removed during generation")
+        _store_status(state, result)
     return result.model_dump()
 
 
+@router.post("/generate/{line_id}/stream")
+async def generate_single_stream(ep_id: str, line_id: str, refresh: bool = False):
+    """`generate/{line_id}` with early playback, as Server-Sent Events.
+
+    Sends `started` with a `partial_url` that plays the line while it is
+    still being generated, `first_audio` once audio arrives (with the time
+    it took), then `done` with the TTSLineStatus, or `error`.
+    """
+    state = episode_store.load(ep_id)
+    line_index = _check_can_generate(state, line_id)
+    line = state.script.lines[line_index].model_copy()
+    key = f"{ep_id}/{line_id}"
+
+    async def events():
+        stream = audio_streams.open(key)
+        with priority(Priority.INTERACTIVE):
+            task = asyncio.create_task(astream_line_tts(state, line_id, stream.append, refresh))
+        try:
+            yield sse_event("started", {
+                "partial_url": f"/api/episodes/{ep_id}/tts/partial/{line_id}",
+                "tempo": split_speed(state.tts.speed)[1],
+            })
+            waiter = asyncio.create_task(stream.wait_for_audio())
+            await asyncio.wait([task, waiter], return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if stream.ttfa_ms is not None:
+                yield sse_event("first_audio", {"ttfa_ms": stream.ttfa_ms})
+            result = await task
+        except Exception as e:
+            log.exception(f"Streaming TTS failed for {ep_id}/{line_id}")
+            yield sse_event("error", {"detail": f"TTS generation failed for line {line_id}: {e}"})
+            return
+        finally:
+            task.cancel()
+            await audio_streams.release(key, stream)
+
+        async with episode_store.transaction(ep_id, source=f"tts:{line_id}") as current:
+            unchanged = _line_unchanged(current, line)
+            if unchanged:
+                _store_status(current, result)
+        if not unchanged:
+            yield sse_event("error", {"detail": f"Line {line_id} was edited or removed during generation"})
+            return
+        log.info(f"TTS {ep_id}/{line_id}: first audio after {stream.ttfa_ms}ms, {result.duration_ms}ms clip")
+        yield sse_event("done", {**result.model_dump(), "ttfa_ms": stream.ttfa_ms})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/partial/{line_id}")
+async def partial_audio(ep_id: str, line_id: str):
+    """A line's audio, following it while it is still being generated."""
+    stream = audio_streams.get(f"{ep_id}/{line_id}")
+    if stream:
+        return StreamingResponse(stream.tail(), media_type="audio/mpeg", headers={"Cache-Control": "no-cache"})
+    path = EPISODES_DIR / ep_id / "audio" / f"line_{line_id}.mp3"
+    if not path.exists():
+        raise HTTPException(404, f"No audio for line {line_id}")
+    return FileResponse(path, media_type="audio/mpeg")
+
+
+@router.get("/peaks/{line_id}")
+async def line_peaks(ep_id: str, line_id: str, per_second: float = 100):
+    """Waveform peaks (min/max pairs, -127..127) and loudness of a line's audio."""
+    state = episode_store.load(ep_id)
+    status = next((ls for ls in state.tts.line_statuses if ls.line_id == line_id), None)
+    if not status or not status.generated:
+        raise HTTPException(404, f"No audio for line {line_id}")
+    path = EPISODES_DIR / ep_id / status.audio_file
+    try:
+        analysis = await asyncio.to_thread(get_analysis, path)
+        bins_per_second, peaks = await asyncio.to_thread(get_peaks, path, max(1.0, per_second))
+    except FileNotFoundError:
+        raise HTTPException(404, f"No audio for line {line_id}")
+    except RuntimeError as e:
+        raise HTTPException(500, str(e))
+    return json_response({
+        "line_id": line_id,
+        **analysis.model_dump(),
+        "tempo": status.tempo,
+        "peaks_per_second": bins_per_second,
+        "peaks": peaks.ravel().tolist(),
+    })
+
+
+async def _generate_missing(ep_id: str) -> AsyncIterator[tuple[str, dict]]:
+    """Generate every line without audio, up to TTS_MAX_CONCURRENCY at a time.
+
+    Yields `(event, data)` pairs: `progress` as each line's audio lands (in
+    any order), `line` with the TTSLineStatus as it is committed, then
+    `done` or `error`. Results are committed strictly in script order, so
+    generated lines always form a prefix and the sequential rule of
+    `generate_single`/`revert` holds even if the batch stops halfway: a
+    failure or an edited line stops the batch, later audio is discarded.
+    """
+    state = episode_store.load(ep_id)
+    generated = {ls.line_id for ls in state.tts.line_statuses if ls.generated}
+    pending = [line.model_copy() for line in state.script.lines if line.id not in generated]
+    queue: asyncio.Queue[tuple[int, TTSLineStatus | Exception]] = asyncio.Queue()
+
+    async def run(i: int) -> None:
+        try:
+            result = await agenerate_line_tts(state, pending[i].id)
+        except Exception as e:
+            queue.put_nowait((i, e))
+        else:
+            queue.put_nowait((i, result))
+
+    landed: dict[int, TTSLineStatus] = {}
+    committed = 0
+    stop_at = len(pending)  # index of the first line that failed
+    error: tuple[str, Exception] | None = None
+    with priority(Priority.BACKGROUND):
+        tasks = [asyncio.create_task(run(i)) for i in range(len(pending))]
+    try:
+        while committed < stop_at:
+            i, outcome = await queue.get()
+            if isinstance(outcome, Exception):
+                if i < stop_at:
+                    stop_at, error = i, (pending[i].id, outcome)
+                    for task in tasks[i + 1:]:
+                        task.cancel()
+                continue
+            landed[i] = outcome
+            yield "progress", {"line_id": outcome.line_id, "landed": len(landed), "total": len(pending)}
+
+            while committed in landed and committed < stop_at:
+                line, result = pending[committed], landed[committed]
+                # Merge into the latest state; stop if the script changed under us
+                async with episode_store.transaction(ep_id, source=f"tts:{line.id}") as current:
+                    unchanged = _line_unchanged(current, line)
+                    if unchanged:
+                        _store_status(current, result)
+                if not unchanged:
+                    stop_at = committed
+                    for task in tasks[committed + 1:]:
+                        task.cancel()
+                    break
+                committed += 1
+                yield "line", result.model_dump()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Audio that landed past the stop point is not referenced by any status
+        for i, result in landed.items():
+            if i >= committed:
+                (EPISODES_DIR / ep_id / result.audio_file).unlink(missing_ok=True)
+
+    if error:
+        line_id, e = error
+        yield "error", {"detail": f"TTS generation failed for line {line_id}: {e}", "count": committed}
+    else:
+        yield "done", {"count": committed, "stopped": committed < len(pending)}
+
+
 @router.post("/generate-all")
 async def generate_all(ep_id: str):
     if not ELEVENLABS_API_KEY:
         raise HTTPException(500, "ELEVENLABS_API_KEY not configured in .env")
 
-    state = _load_state(ep_id)
-    results = []
-    for line in state.script.lines:
-        status = next(
-            (ls for ls in state.tts.line_statuses if ls.line_id == line.id), None
-        )
-        if status and status.generated:
-            results.append(status.model_dump())
-            continue
+    async for event, data in _generate_missing(ep_id):
+        if event == "error":
+            raise HTTPException(500, data["detail"])
 
-        try:
-            result = generate_line_tts(state, line.id)
-        except Exception as e:
-            raise HTTPException(500, f"TTS generation failed for line {line.id}: {e}")
+    state = episode_store.load(ep_id)
+    statuses = {ls.line_id: ls for ls in state.tts.line_statuses}
+    return [
+        statuses[line.id].model_dump()
+        for line in state.script.lines
+        if line.id in statuses and statuses[line.id].generated
+    ]
 
-        # Update in state
-        found = False
-        for i, ls in enumerate(state.tts.line_statuses):
-            if ls.line_id == line.id:
-                state.tts.line_statuses[i] = result
-                found = True
-                break
-        if not found:
-            state.tts.line_statuses.append(result)
 
-        _save_state(ep_id, state)
-        results.append(result.model_dump())
+@router.post("/generate-all/stream")
+async def generate_all_stream(ep_id: str):
+    """`generate-all` as Server-Sent Events (`progress`, `line`, `done`/`error`)."""
+    if not ELEVENLABS_API_KEY:
+        raise HTTPException(500, "ELEVENLABS_API_KEY not configured in .env")
 
-    return results
+    async def events():
+        async for event, data in _generate_missing(ep_id):
+            yield sse_event(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.delete("/revert/{line_id}")
 async def revert(ep_id: str, line_id: str):
-    state = _load_state(ep_id)
-
-    # Must revert from end - check no later lines are generated
-    line_ids = [l.id for l in state.script.lines]
-    if line_id not in line_ids:
-        raise HTTPException(404, f"Line {line_id} not found")
+    async with episode_store.transaction(ep_id) as state:
+        # Must revert from end - check no later lines are generated
+        line_ids = [l.id for l in state.script.lines]
+        if line_id not in line_ids:
+            raise HTTPException(404, f"Line {line_id} not found")
+
+        line_index = line_ids.index(line_id)
+        for i in range(line_index + 1, len(line_ids)):
+            later_id = line_ids[i]
+            later_status = next(
+                (ls for ls in state.tts.line_statuses if ls.line_id == later_id), None
+            )
+            if later_status and later_status.generated:
+                raise HTTPException(400, f"Must revert line {later_id} first (revert from end)")
+
+        revert_line_tts(state, line_id)
 
-    line_index = line_ids.index(line_id)
-    for i in range(line_index + 1, len(line_ids)):
-        later_id = line_ids[i]
-        later_status = next(
-            (ls for ls in state.tts.line_statuses if ls.line_id == later_id), None
-        )
-        if later_status and later_status.generated:
-            raise HTTPException(400, f"Must revert line {later_id} first (revert from end)")
-
-    revert_line_tts(state, line_id)
-
-    for i, ls in enumerate(state.tts.line_statuses):
-        if ls.line_id == line_id:
-            state.tts.line_statuses[i] = TTSLineStatus(line_id=line_id)
-            break
+        for i, ls in enumerate(state.tts.line_statuses):
+            if ls.line_id == line_id:
+                state.tts.line_statuses[i] = TTSLineStatus(line_id=line_id)
+                break
 
-    _save_state(ep_id, state)
     return {"reverted": True, "line_id": line_id}
 
 
@@ -144,28 +321,27 @@ class RevertSelectedRequest(BaseModel):
 
 @router.post("/revert-selected")
 async def revert_selected(ep_id: str, req: RevertSelectedRequest):
-    state = _load_state(ep_id)
-    script_line_ids = [l.id for l in state.script.lines]
-
-    # Validate all requested line_ids exist
-    for lid in req.line_ids:
-        if lid not in script_line_ids:
-            raise HTTPException(404, f"Line {lid} not found")
-
-    # Revert from end of script backward to maintain consistency
-    ids_to_revert = set(req.line_ids)
-    reverted = []
-    for lid in reversed(script_line_ids):
-        if lid not in ids_to_revert:
-            continue
-        revert_line_tts(state, lid)
-        for i, ls in enumerate(state.tts.line_statuses):
-            if ls.line_id == lid:
-                state.tts.line_statuses[i] = TTSLineStatus(line_id=lid)
-                break
-        reverted.append(lid)
+    async with episode_store.transaction(ep_id) as state:
+        script_line_ids = [l.id for l in state.script.lines]
+
+        # Validate all requested line_ids exist
+        for lid in req.line_ids:
+            if lid not in script_line_ids:
+                raise HTTPException(404, f"Line {lid} not found")
+
+        # Revert from end of script backward to maintain consistency
+        ids_to_revert = set(req.line_ids)
+        reverted = []
+        for lid in reversed(script_line_ids):
+            if lid not in ids_to_revert:
+                continue
+            revert_line_tts(state, lid)
+            for i, ls in enumerate(state.tts.line_statuses):
+                if ls.line_id == lid:
+                    state.tts.line_statuses[i] = TTSLineStatus(line_id=lid)
+                    break
+            reverted.append(lid)
 
-    _save_state(ep_id, state)
     return {"reverted": reverted}
 
 
@@ -175,11 +351,10 @@ class ModeRequest(BaseModel):
 
 @router.put("/mode")
 async def set_mode(ep_id: str, req: ModeRequest):
-    state = _load_state(ep_id)
     if req.mode not in ("manual", "auto"):
         raise HTTPException(400, "Mode must be 'manual' or 'auto'")
-    state.tts.mode = req.mode
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.tts.mode = req.mode
     return {"mode": state.tts.mode}
 
 
@@ -189,30 +364,32 @@ class SpeedRequest(BaseModel):
 
 @router.put("/speed")
 async def set_speed(ep_id: str, req: SpeedRequest):
-    state = _load_state(ep_id)
-    state.tts.speed = max(0.25, min(4.0, req.speed))
-    _save_state(ep_id, state)
-    return {"speed": state.tts.speed}
+    """Change the speed; generated lines keep their audio and only get a new tempo."""
+    async with episode_store.transaction(ep_id) as state:
+        state.tts.speed = max(0.25, min(4.0, req.speed))
+        for status in state.tts.line_statuses:
+            retime_line_tts(status, state.tts.speed)
+        retime_intro_tts(state)
+    return json_response({"speed": state.tts.speed, "line_statuses": state.tts.line_statuses})
 
 
 @router.put("/lines")
 async def update_lines(ep_id: str, lines: list[ScriptLine]):
-    state = _load_state(ep_id)
-    # Can't edit lines that already have TTS generated
-    generated_ids = {ls.line_id for ls in state.tts.line_statuses if ls.generated}
-    for line in lines:
-        if line.id in generated_ids:
-            original = next((l for l in state.script.lines if l.id == line.id), None)
-            if original and (
-                line.text_zh != original.text_zh
-                or line.text_en != original.text_en
-                or line.text_pinyin != original.text_pinyin
-            ):
-                raise HTTPException(400, f"Cannot edit line {line.id}: TTS already generated. Revert first.")
-
-    state.script.lines = lines
-    _save_state(ep_id, state)
-    return [l.model_dump() for l in lines]
+    async with episode_store.transaction(ep_id) as state:
+        # Can't edit lines that already have TTS generated
+        generated_ids = {ls.line_id for ls in state.tts.line_statuses if ls.generated}
+        for line in lines:
+            if line.id in generated_ids:
+                original = next((l for l in state.script.lines if l.id == line.id), None)
+                if original and (
+                    line.text_zh != original.text_zh
+                    or line.text_en != original.text_en
+                    or line.text_pinyin != original.text_pinyin
+                ):
+                    raise HTTPException(400, f"Cannot edit line {line.id}: TTS already generated. Revert first.")
+
+        state.script.lines = lines
+    return json_response(lines)
 
 
 class AddLineRequest(BaseModel):
@@ -222,55 +399,52 @@ class AddLineRequest(BaseModel):
 
 @router.post("/lines")
 async def add_line(ep_id: str, req: AddLineRequest):
-    state = _load_state(ep_id)
-    # Can only add after the last generated line
-    generated_ids = [ls.line_id for ls in state.tts.line_statuses if ls.generated]
-    if generated_ids:
-        last_gen_id = generated_ids[-1]
-        last_gen_index = next(
-            (i for i, l in enumerate(state.script.lines) if l.id == last_gen_id), -1
-        )
-        if req.position <= last_gen_index:
-            raise HTTPException(400, "Can only add lines after the last generated line")
-
-    state.script.lines.insert(req.position, req.line)
-    for i, line in enumerate(state.script.lines):
-        line.order = i
-    # Add a TTS status for the new line
-    state.tts.line_statuses.append(TTSLineStatus(line_id=req.line.id))
-    _save_state(ep_id, state)
-    return [l.model_dump() for l in state.script.lines]
+    async with episode_store.transaction(ep_id) as state:
+        # Can only add after the last generated line
+        generated_ids = [ls.line_id for ls in state.tts.line_statuses if ls.generated]
+        if generated_ids:
+            last_gen_id = generated_ids[-1]
+            last_gen_index = next(
+                (i for i, l in enumerate(state.script.lines) if l.id == last_gen_id), -1
+            )
+            if req.position <= last_gen_index:
+                raise HTTPException(400, "Can only add lines after the last generated line")
+
+        state.script.lines.insert(req.position, req.line)
+        for i, line in enumerate(state.script.lines):
+            line.order = i
+        # Add a TTS status for the new line
+        state.tts.line_statuses.append(TTSLineStatus(line_id=req.line.id))
+    return json_response(state.script.lines)
 
 
 @router.delete("/lines/{line_id}")
 async def delete_line(ep_id: str, line_id: str):
-    state = _load_state(ep_id)
-    # Can't delete if TTS is generated
-    status = next(
-        (ls for ls in state.tts.line_statuses if ls.line_id == line_id), None
-    )
-    if status and status.generated:
-        raise HTTPException(400, f"Cannot delete line {line_id}: TTS already generated. Revert first.")
+    async with episode_store.transaction(ep_id) as state:
+        # Can't delete if TTS is generated
+        status = next(
+            (ls for ls in state.tts.line_statuses if ls.line_id == line_id), None
+        )
+        if status and status.generated:
+            raise HTTPException(400, f"Cannot delete line {line_id}: TTS already generated. Revert first.")
 
-    state.script.lines = [l for l in state.script.lines if l.id != line_id]
-    state.tts.line_statuses = [ls for ls in state.tts.line_statuses if ls.line_id != line_id]
-    for i, line in enumerate(state.script.lines):
-        line.order = i
-    _save_state(ep_id, state)
-    return [l.model_dump() for l in state.script.lines]
+        state.script.lines = [l for l in state.script.lines if l.id != line_id]
+        state.tts.line_statuses = [ls for ls in state.tts.line_statuses if ls.line_id != line_id]
+        for i, line in enumerate(state.script.lines):
+            line.order = i
+    return json_response(state.script.lines)
 
 
 @router.post("/suggest-emotions")
-async def suggest_emotions(ep_id: str):
-    state = _load_state(ep_id)
-    lines = state.script.lines
+async def suggest_emotions(ep_id: str, refresh: bool = False):
+    lines = episode_store.load(ep_id).script.lines
     if not lines:
         raise HTTPException(400, "No script lines")
 
     lines_text = "\n".join(
         f"{i+1}. [{l.character_id}] {l.text_zh}" for i, l in enumerate(lines)
     )
-    result = generate_json(
+    result = await agenerate_json(
         system="You assign emotions to dialogue lines. Return JSON only.",
         user=(
             f"For each numbered line, pick ONE emotion from: "
@@ -280,29 +454,31 @@ async def suggest_emotions(ep_id: str):
             f"Return exactly {len(lines)} emotions in order."
         ),
         max_tokens=1024,
+        task="emotions",
+        cache=True,
+        refresh=refresh,
     )
     emotions = result.get("emotions", [])
-    for i, line in enumerate(lines):
-        if i < len(emotions):
-            line.emotion = emotions[i]
+    emotion_by_id = {line.id: emotions[i] for i, line in enumerate(lines) if i < len(emotions)}
 
-    state.script.lines = lines
-    _save_state(ep_id, state)
-    return [l.model_dump() for l in lines]
+    async with episode_store.transaction(ep_id) as state:
+        for line in state.script.lines:
+            if line.id in emotion_by_id:
+                line.emotion = emotion_by_id[line.id]
+    return json_response(state.script.lines)
 
 
 @router.post("/approve")
 async def approve(ep_id: str):
-    state = _load_state(ep_id)
-    # All lines must have TTS generated
-    for line in state.script.lines:
-        status = next(
-            (ls for ls in state.tts.line_statuses if ls.line_id == line.id), None
-        )
-        if not status or not status.generated:
-            raise HTTPException(400, f"Line {line.id} does not have TTS generated")
-
-    state.tts.approved = True
-    state.current_stage = "stage_3_scenes"
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        # All lines must have TTS generated
+        for line in state.script.lines:
+            status = next(
+                (ls for ls in state.tts.line_statuses if ls.line_id == line.id), None
+            )
+            if not status or not status.generated:
+                raise HTTPException(400, f"Line {line.id} does not have TTS generated")
+
+        state.tts.approved = True
+        state.current_stage = "stage_3_scenes"
     return {"approved": True, "current_stage": state.current_stage}
@@ -1,9 +1,10 @@
 import uuid
 from pathlib import Path
 
-from config import EPISODES_DIR, CHARACTERS_DIR, SETTINGS_DIR
+from config import EPISODES_DIR
 from models import EpisodeState, Scene
-from services.llm import generate_json
+from services.asset_registry import character_registry, setting_registry
+from services.llm import agenerate_json, system_blocks
 from services.openai_images import generate_scene_image
 
 PROMPTS_DIR = Path(__file__).parent / "prompts"
@@ -41,18 +42,21 @@ def format_settings(settings: dict) -> str:
     return "\n".join(lines)
 
 
-def generate_scene_breakdown(state: EpisodeState) -> list[Scene]:
+async def generate_scene_breakdown(state: EpisodeState) -> list[Scene]:
     """Use LLM to break script into scenes."""
-    prompt_template = (PROMPTS_DIR / "scene_breakdown.txt").read_text(encoding="utf-8")
-    prompt = prompt_template.format(
-        script_lines=format_script_lines(state),
+    context = (PROMPTS_DIR / "context.txt").read_text(encoding="utf-8").format(
         settings=format_settings(state.context.settings),
         characters=format_characters(state.context.characters),
     )
-    result = generate_json(
-        system="You are a scene breakdown specialist for a Chinese learning show. Return JSON only.",
-        user=prompt,
+    prompt_template = (PROMPTS_DIR / "scene_breakdown.txt").read_text(encoding="utf-8")
+    result = await agenerate_json(
+        system=system_blocks(
+            context,
+            instructions="You are a scene breakdown specialist for a Chinese learning show. Return JSON only.",
+        ),
+        user=prompt_template.format(script_lines=format_script_lines(state)),
         max_tokens=8192,
+        task="scene_breakdown",
     )
 
     scenes = []
@@ -76,20 +80,13 @@ def generate_single_scene_image(state: EpisodeState, scene: Scene) -> str:
     output_path = ep_dir / image_file
 
     # Build reference paths
-    setting_ref = None
-    setting = state.context.settings.get(scene.setting_id)
-    if setting and setting.get("reference"):
-        ref_path = SETTINGS_DIR.parent / setting["reference"]
-        if ref_path.exists():
-            setting_ref = str(ref_path)
+    setting_ref = setting_registry.reference_file(state.context.settings.get(scene.setting_id))
 
     char_refs = []
     for char_id in scene.character_ids:
-        char = state.context.characters.get(char_id)
-        if char and char.get("reference"):
-            ref_path = CHARACTERS_DIR.parent / char["reference"]
-            if ref_path.exists():
-                char_refs.append(str(ref_path))
+        ref_file = character_registry.reference_file(state.context.characters.get(char_id))
+        if ref_file:
+            char_refs.append(ref_file)
 
     # Append art style to prompt if set
     prompt = scene.prompt
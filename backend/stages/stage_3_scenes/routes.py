@@ -1,10 +1,13 @@
-import json
+import asyncio
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from config import EPISODES_DIR, OPENAI_API_KEY
+from config import OPENAI_API_KEY
 from models import EpisodeState, Scene
+from services.scheduler import Priority, priority
+from services.serialization import json_response
+from services.state_store import episode_store
 from stages.stage_3_scenes.logic import (
     generate_scene_breakdown,
     generate_single_scene_image,
@@ -14,59 +17,58 @@ from stages.stage_3_scenes.logic import (
 router = APIRouter(prefix="/api/episodes/{ep_id}/scenes", tags=["scenes"])
 
 
-def _load_state(ep_id: str) -> EpisodeState:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-    return EpisodeState(**json.loads(state_path.read_text(encoding="utf-8")))
-
-
-def _save_state(ep_id: str, state: EpisodeState) -> None:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    state_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
-
-
 @router.post("/generate-breakdown")
 async def breakdown(ep_id: str):
-    state = _load_state(ep_id)
-    scenes = generate_scene_breakdown(state)
-    state.scenes.scenes = scenes
-    state.current_stage = "stage_3_scenes"
-    _save_state(ep_id, state)
-    return state.scenes.model_dump()
+    scenes = await generate_scene_breakdown(episode_store.load(ep_id))
+    async with episode_store.transaction(ep_id) as state:
+        state.scenes.scenes = scenes
+        state.current_stage = "stage_3_scenes"
+    return json_response(state.scenes)
 
 
 @router.put("/scenes")
 async def update_scenes(ep_id: str, scenes: list[Scene]):
-    state = _load_state(ep_id)
-    state.scenes.scenes = scenes
-    _save_state(ep_id, state)
-    return [s.model_dump() for s in scenes]
+    async with episode_store.transaction(ep_id) as state:
+        state.scenes.scenes = scenes
+    return json_response(scenes)
 
 
 @router.post("/scenes")
 async def add_scene(ep_id: str, scene: Scene):
-    state = _load_state(ep_id)
-    state.scenes.scenes.append(scene)
-    # Reorder
-    state.scenes.scenes.sort(key=lambda s: s.order)
-    _save_state(ep_id, state)
-    return [s.model_dump() for s in state.scenes.scenes]
+    async with episode_store.transaction(ep_id) as state:
+        state.scenes.scenes.append(scene)
+        # Reorder
+        state.scenes.scenes.sort(key=lambda s: s.order)
+    return json_response(state.scenes.scenes)
 
 
 @router.delete("/scenes/{scene_id}")
 async def delete_scene(ep_id: str, scene_id: str):
-    state = _load_state(ep_id)
-    scene = next((s for s in state.scenes.scenes if s.id == scene_id), None)
-    if not scene:
-        raise HTTPException(404, f"Scene {scene_id} not found")
-    if scene.generated:
-        raise HTTPException(400, "Cannot delete scene with generated image. Revert first.")
-    state.scenes.scenes = [s for s in state.scenes.scenes if s.id != scene_id]
-    for i, s in enumerate(state.scenes.scenes):
-        s.order = i
-    _save_state(ep_id, state)
-    return [s.model_dump() for s in state.scenes.scenes]
+    async with episode_store.transaction(ep_id) as state:
+        scene = next((s for s in state.scenes.scenes if s.id == scene_id), None)
+        if not scene:
+            raise HTTPException(404, f"Scene {scene_id} not found")
+        if scene.generated:
+            raise HTTPException(400, "Cannot delete scene with generated image. Revert first.")
+        state.scenes.scenes = [s for s in state.scenes.scenes if s.id != scene_id]
+        for i, s in enumerate(state.scenes.scenes):
+            s.order = i
+    return json_response(state.scenes.scenes)
+
+
+def _store_image(state: EpisodeState, scene: Scene, image_file: str) -> Scene | None:
+    """Mark `scene` as generated in `state` unless its prompt or setup changed meanwhile."""
+    current = next((s for s in state.scenes.scenes if s.id == scene.id), None)
+    if (
+        not current
+        or current.prompt != scene.prompt
+        or current.setting_id != scene.setting_id
+        or current.character_ids != scene.character_ids
+    ):
+        return None
+    current.image_file = image_file
+    current.generated = True
+    return current
 
 
 @router.post("/generate-image/{scene_id}")
@@ -74,20 +76,23 @@ async def gen_image(ep_id: str, scene_id: str):
     if not OPENAI_API_KEY:
         raise HTTPException(500, "OPENAI_API_KEY not configured in .env")
 
-    state = _load_state(ep_id)
+    state = episode_store.load(ep_id)
     scene = next((s for s in state.scenes.scenes if s.id == scene_id), None)
     if not scene:
         raise HTTPException(404, f"Scene {scene_id} not found")
+    scene = scene.model_copy(deep=True)
 
     try:
-        image_file = generate_single_scene_image(state, scene)
+        with priority(Priority.INTERACTIVE):
+            image_file = await asyncio.to_thread(generate_single_scene_image, state, scene)
     except Exception as e:
         raise HTTPException(500, f"Image generation failed for scene {scene_id}: {e}")
 
-    scene.image_file = image_file
-    scene.generated = True
-    _save_state(ep_id, state)
-    return scene.model_dump()
+    async with episode_store.transaction(ep_id, source=f"image:{scene_id}") as current:
+        stored = _store_image(current, scene, image_file)
+        if not stored:
+            raise HTTPException(409, f"Scene {scene_id} was edited or removed during generation")
+        return stored.model_dump()
 
 
 @router.post("/generate-all-images")
@@ -95,34 +100,35 @@ async def gen_all_images(ep_id: str):
     if not OPENAI_API_KEY:
         raise HTTPException(500, "OPENAI_API_KEY not configured in .env")
 
-    state = _load_state(ep_id)
     results = []
-    for scene in state.scenes.scenes:
+    for scene in episode_store.load(ep_id).scenes.scenes:
         if scene.generated:
             results.append(scene.model_dump())
             continue
+        # Each worker gets its own copy, with whatever earlier scenes stored
+        state = episode_store.load(ep_id)
         try:
-            image_file = generate_single_scene_image(state, scene)
+            with priority(Priority.BACKGROUND):
+                image_file = await asyncio.to_thread(generate_single_scene_image, state, scene)
         except Exception as e:
             raise HTTPException(500, f"Image generation failed for scene {scene.id}: {e}")
-        scene.image_file = image_file
-        scene.generated = True
-        _save_state(ep_id, state)
-        results.append(scene.model_dump())
+        async with episode_store.transaction(ep_id, source=f"image:{scene.id}") as current:
+            stored = _store_image(current, scene, image_file)
+            if stored:
+                results.append(stored.model_dump())
     return results
 
 
 @router.delete("/revert-image/{scene_id}")
 async def revert_image(ep_id: str, scene_id: str):
-    state = _load_state(ep_id)
-    scene = next((s for s in state.scenes.scenes if s.id == scene_id), None)
-    if not scene:
-        raise HTTPException(404, f"Scene {scene_id} not found")
-
-    revert_scene_image(state, scene)
-    scene.image_file = ""
-    scene.generated = False
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        scene = next((s for s in state.scenes.scenes if s.id == scene_id), None)
+        if not scene:
+            raise HTTPException(404, f"Scene {scene_id} not found")
+
+        revert_scene_image(state, scene)
+        scene.image_file = ""
+        scene.generated = False
     return {"reverted": True, "scene_id": scene_id}
 
 
@@ -132,9 +138,8 @@ class ArtStyleRequest(BaseModel):
 
 @router.put("/art-style")
 async def set_art_style(ep_id: str, req: ArtStyleRequest):
-    state = _load_state(ep_id)
-    state.art_style = req.art_style
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.art_style = req.art_style
     return {"art_style": state.art_style}
 
 
@@ -144,26 +149,24 @@ class ModeRequest(BaseModel):
 
 @router.put("/mode")
 async def set_mode(ep_id: str, req: ModeRequest):
-    state = _load_state(ep_id)
     if req.mode not in ("manual", "auto"):
         raise HTTPException(400, "Mode must be 'manual' or 'auto'")
-    state.scenes.mode = req.mode
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.scenes.mode = req.mode
     return {"mode": state.scenes.mode}
 
 
 @router.post("/approve")
 async def approve(ep_id: str):
-    state = _load_state(ep_id)
-    for scene in state.scenes.scenes:
-        if not scene.generated:
-            raise HTTPException(400, f"Scene {scene.id} does not have an image generated")
-
-    state.scenes.approved = True
-    state.current_stage = "stage_4_stitch"
-    # Clear old timeline so stage 4 re-initializes with the new scenes
-    state.timeline.clips = []
-    state.timeline.output_file = ""
-    state.timeline.approved = False
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        for scene in state.scenes.scenes:
+            if not scene.generated:
+                raise HTTPException(400, f"Scene {scene.id} does not have an image generated")
+
+        state.scenes.approved = True
+        state.current_stage = "stage_4_stitch"
+        # Clear old timeline so stage 4 re-initializes with the new scenes
+        state.timeline.clips = []
+        state.timeline.output_file = ""
+        state.timeline.approved = False
     return {"approved": True, "current_stage": state.current_stage}
@@ -1,8 +1,13 @@
+import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from config import EPISODES_DIR
-from models import EpisodeState, ScriptLine, TimelineClip
-from services.ffmpeg import get_audio_duration_ms
+from models import EpisodeState, TTSLineStatus, ScriptLine, TimelineClip
+from services.audio_analysis import get_analysis
+from services.media_probe import get_audio_duration_ms
+
+log = logging.getLogger(__name__)
 
 
 def _ms_to_srt_time(ms: int) -> str:
@@ -42,15 +47,54 @@ def generate_srt(state: EpisodeState, offset_ms: int = 0) -> str:
 
 START_PAD = 500
 LINE_GAP = 300
+TRIM_PAD_MS = 60  # silence kept before and after the speech when trimming a line
+
+
+def speech_bounds(state: EpisodeState) -> dict[str, tuple[int, int]]:
+    """(source_in_ms, source_out_ms) per generated line: its audio minus leading/trailing silence.
+
+    Decodes every clip not yet analysed, so call it outside a state
+    transaction. Lines that cannot be analysed are left out (played whole).
+    """
+    ep_dir = EPISODES_DIR / state.id
+    lines = [ls for ls in state.tts.line_statuses if ls.generated and ls.audio_file]
+
+    def bounds(ls: TTSLineStatus) -> tuple[int, int] | None:
+        path = ep_dir / ls.audio_file
+        if not path.exists():
+            return None
+        try:
+            analysis = get_analysis(path)
+        except (OSError, RuntimeError, ValueError) as e:
+            log.warning(f"Could not analyse {path}: {e}")
+            return None
+        if analysis.speech_end_ms <= analysis.speech_start_ms:
+            return None  # all silence: nothing to trim to
+        return (
+            max(0, analysis.speech_start_ms - TRIM_PAD_MS),
+            min(analysis.duration_ms, analysis.speech_end_ms + TRIM_PAD_MS),
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = pool.map(bounds, lines)
+    return {ls.line_id: b for ls, b in zip(lines, results) if b}
+
 
+def _played_ms(tts: TTSLineStatus, bounds: dict[str, tuple[int, int]]) -> int:
+    """How long a line plays on the timeline: its trimmed span at its tempo."""
+    if tts.line_id in bounds:
+        source_in, source_out = bounds[tts.line_id]
+        return round((source_out - source_in) / tts.tempo)
+    return tts.duration_ms
 
-def _scene_audio_durations(scene, tts_statuses):
+
+def _scene_audio_durations(scene, tts_statuses, bounds: dict[str, tuple[int, int]]):
     """Get list of audio durations for lines in a scene."""
     durations = []
     for line_id in scene.line_ids:
         tts = next((ls for ls in tts_statuses if ls.line_id == line_id), None)
         if tts and tts.duration_ms:
-            durations.append(tts.duration_ms)
+            durations.append(_played_ms(tts, bounds))
     return durations
 
 
@@ -62,16 +106,25 @@ def _calc_scene_duration(audio_durations: list[int], scene_gap_ms: int) -> int:
     return max(START_PAD + audio_span + scene_end_pad, scene_gap_ms)
 
 
-def initialize_timeline(state: EpisodeState, scene_gap_ms: int = 1000) -> list[TimelineClip]:
-    """Auto-populate timeline from scenes and audio."""
+def initialize_timeline(
+    state: EpisodeState,
+    scene_gap_ms: int = 1000,
+    bounds: dict[str, tuple[int, int]] | None = None,
+) -> list[TimelineClip]:
+    """Auto-populate timeline from scenes and audio.
+
+    `bounds` (from `speech_bounds`) trims each line's leading and trailing
+    silence, so line gaps are measured between speech, not between files.
+    """
     clips: list[TimelineClip] = []
     ep_dir = EPISODES_DIR / state.id
+    bounds = bounds or {}
 
     # Scene clips: each scene gets a clip, laid out sequentially
     current_ms = 0
     scene_order = 0
     for scene in sorted(state.scenes.scenes, key=lambda s: s.order):
-        audio_durations = _scene_audio_durations(scene, state.tts.line_statuses)
+        audio_durations = _scene_audio_durations(scene, state.tts.line_statuses, bounds)
         scene_duration = _calc_scene_duration(audio_durations, scene_gap_ms)
 
         clips.append(TimelineClip(
@@ -107,7 +160,8 @@ def initialize_timeline(state: EpisodeState, scene_gap_ms: int = 1000) -> list[T
                 continue
 
             audio_path = ep_dir / tts_status.audio_file
-            duration = tts_status.duration_ms
+            duration = _played_ms(tts_status, bounds)
+            source_in, source_out = bounds.get(line_id, (0, 0))
             if audio_path.exists() and duration == 0:
                 duration = get_audio_duration_ms(audio_path)
 
@@ -120,6 +174,9 @@ def initialize_timeline(state: EpisodeState, scene_gap_ms: int = 1000) -> list[T
                 start_ms=offset,
                 duration_ms=duration,
                 order=audio_order,
+                tempo=tts_status.tempo,
+                source_in_ms=source_in,
+                source_out_ms=source_out,
             ))
             audio_order += 1
             offset += duration + LINE_GAP
@@ -141,10 +198,14 @@ def reflow_timeline(state: EpisodeState, scene_gap_ms: int) -> list[TimelineClip
     # Build lookup of audio durations from existing clips
     audio_dur_by_line: dict[str, int] = {}
     audio_file_by_line: dict[str, str] = {}
+    audio_tempo_by_line: dict[str, float] = {}
+    audio_trim_by_line: dict[str, tuple[int, int]] = {}
     for c in clips:
         if c.track == "audio":
             audio_dur_by_line[c.source_id] = c.duration_ms
             audio_file_by_line[c.source_id] = c.source_file
+            audio_tempo_by_line[c.source_id] = c.tempo
+            audio_trim_by_line[c.source_id] = (c.source_in_ms, c.source_out_ms)
 
     new_clips: list[TimelineClip] = []
     current_ms = 0
@@ -200,6 +261,9 @@ def reflow_timeline(state: EpisodeState, scene_gap_ms: int) -> list[TimelineClip
                 start_ms=offset,
                 duration_ms=duration,
                 order=audio_order,
+                tempo=audio_tempo_by_line[line_id],
+                source_in_ms=audio_trim_by_line[line_id][0],
+                source_out_ms=audio_trim_by_line[line_id][1],
             ))
             audio_order += 1
             offset += duration + LINE_GAP
@@ -1,4 +1,4 @@
-import json
+import asyncio
 import shutil
 
 from fastapi import APIRouter, HTTPException, UploadFile, File
@@ -6,44 +6,37 @@ from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
 from config import EPISODES_DIR, TEMPLATES_DIR
-from models import EpisodeState, TimelineClip, IntroData
-from stages.stage_4_stitch.logic import initialize_timeline, reflow_timeline, calculate_total_duration, generate_srt
-from services.ffmpeg import build_video, get_audio_duration_ms
+from models import TimelineClip, IntroData
+from stages.stage_2_tts.logic import retime_intro_tts
+from stages.stage_4_stitch.logic import initialize_timeline, reflow_timeline, calculate_total_duration, generate_srt, speech_bounds
+from services.ffmpeg import build_video
 from services.elevenlabs import generate_tts
-from services.llm import generate_json
+from services.media_probe import get_audio_duration_ms
+from services.llm import agenerate_json
+from services.serialization import json_response
+from services.state_store import episode_store
 
 router = APIRouter(prefix="/api/episodes/{ep_id}/timeline", tags=["timeline"])
 
 
-def _load_state(ep_id: str) -> EpisodeState:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-    return EpisodeState(**json.loads(state_path.read_text(encoding="utf-8")))
-
-
-def _save_state(ep_id: str, state: EpisodeState) -> None:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    state_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
-
-
 @router.post("/initialize")
 async def initialize(ep_id: str):
-    state = _load_state(ep_id)
-    scene_gap_ms = state.timeline.scene_gap_ms
-    clips = initialize_timeline(state, scene_gap_ms=scene_gap_ms)
-    state.timeline.clips = clips
-    state.timeline.total_duration_ms = calculate_total_duration(clips)
-    state.current_stage = "stage_4_stitch"
-
-    # Set default intro TTS text if not already set
-    ep_num = int(ep_id.replace("ep_", ""))
-    seed = state.script.seed
-    if not state.timeline.intro.tts_text:
-        state.timeline.intro.tts_text = f"第{ep_num}集：{seed}"
+    # Analysing the clips can take a while; don't hold the transaction for it
+    bounds = await asyncio.to_thread(speech_bounds, episode_store.load(ep_id))
+    async with episode_store.transaction(ep_id) as state:
+        scene_gap_ms = state.timeline.scene_gap_ms
+        clips = initialize_timeline(state, scene_gap_ms=scene_gap_ms, bounds=bounds)
+        state.timeline.clips = clips
+        state.timeline.total_duration_ms = calculate_total_duration(clips)
+        state.current_stage = "stage_4_stitch"
+
+        # Set default intro TTS text if not already set
+        ep_num = int(ep_id.replace("ep_", ""))
+        seed = state.script.seed
+        if not state.timeline.intro.tts_text:
+            state.timeline.intro.tts_text = f"第{ep_num}集：{seed}"
 
-    _save_state(ep_id, state)
-    return state.timeline.model_dump()
+    return json_response(state.timeline)
 
 
 class ReflowRequest(BaseModel):
@@ -52,66 +45,61 @@ class ReflowRequest(BaseModel):
 
 @router.post("/reflow")
 async def reflow(ep_id: str, req: ReflowRequest):
-    state = _load_state(ep_id)
-    scene_gap_ms = max(200, min(3000, req.scene_gap_ms))
-    clips = reflow_timeline(state, scene_gap_ms)
-    state.timeline.clips = clips
-    state.timeline.scene_gap_ms = scene_gap_ms
-    state.timeline.total_duration_ms = calculate_total_duration(clips)
-    _save_state(ep_id, state)
-    return state.timeline.model_dump()
+    async with episode_store.transaction(ep_id) as state:
+        scene_gap_ms = max(200, min(3000, req.scene_gap_ms))
+        clips = reflow_timeline(state, scene_gap_ms)
+        state.timeline.clips = clips
+        state.timeline.scene_gap_ms = scene_gap_ms
+        state.timeline.total_duration_ms = calculate_total_duration(clips)
+    return json_response(state.timeline)
 
 
 @router.put("/clips")
 async def update_clips(ep_id: str, clips: list[TimelineClip]):
-    state = _load_state(ep_id)
-    state.timeline.clips = clips
-    state.timeline.total_duration_ms = calculate_total_duration(clips)
-    _save_state(ep_id, state)
-    return [c.model_dump() for c in clips]
+    async with episode_store.transaction(ep_id) as state:
+        state.timeline.clips = clips
+        state.timeline.total_duration_ms = calculate_total_duration(clips)
+    return json_response(clips)
 
 
 @router.put("/clips/{clip_id}")
 async def update_clip(ep_id: str, clip_id: str, updates: dict):
-    state = _load_state(ep_id)
-    clip = next((c for c in state.timeline.clips if c.id == clip_id), None)
-    if not clip:
-        raise HTTPException(404, f"Clip {clip_id} not found")
+    async with episode_store.transaction(ep_id) as state:
+        clip = next((c for c in state.timeline.clips if c.id == clip_id), None)
+        if not clip:
+            raise HTTPException(404, f"Clip {clip_id} not found")
 
-    for key, value in updates.items():
-        if hasattr(clip, key):
-            setattr(clip, key, value)
+        for key, value in updates.items():
+            if hasattr(clip, key):
+                setattr(clip, key, value)
 
-    state.timeline.total_duration_ms = calculate_total_duration(state.timeline.clips)
-    _save_state(ep_id, state)
+        state.timeline.total_duration_ms = calculate_total_duration(state.timeline.clips)
     return clip.model_dump()
 
 
 @router.post("/intro/upload-image")
 async def upload_intro_image(ep_id: str, file: UploadFile = File(...)):
-    state = _load_state(ep_id)
     ep_dir = EPISODES_DIR / ep_id
     image_path = ep_dir / "intro.png"
     contents = await file.read()
-    image_path.write_bytes(contents)
-    state.timeline.intro.image_file = "intro.png"
-    state.timeline.intro.image_uploaded = True
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        image_path.write_bytes(contents)
+        state.timeline.intro.image_file = "intro.png"
+        state.timeline.intro.image_uploaded = True
     return state.timeline.intro.model_dump()
 
 
 @router.post("/intro/upload-video")
 async def upload_intro_video(ep_id: str, file: UploadFile = File(...)):
-    state = _load_state(ep_id)
     ep_dir = EPISODES_DIR / ep_id
     video_path = ep_dir / "intro_video.mp4"
     contents = await file.read()
-    video_path.write_bytes(contents)
-    duration_ms = get_audio_duration_ms(video_path)
-    state.timeline.intro.video_file = "intro_video.mp4"
-    state.timeline.intro.video_uploaded = True
-    state.timeline.intro.video_duration_ms = duration_ms
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        video_path.write_bytes(contents)
+        duration_ms = get_audio_duration_ms(video_path)
+        state.timeline.intro.video_file = "intro_video.mp4"
+        state.timeline.intro.video_uploaded = True
+        state.timeline.intro.video_duration_ms = duration_ms
     return state.timeline.intro.model_dump()
 
 
@@ -126,26 +114,26 @@ class IntroUpdateRequest(BaseModel):
 
 @router.put("/intro")
 async def update_intro(ep_id: str, req: IntroUpdateRequest):
-    state = _load_state(ep_id)
-    if req.title_zh is not None:
-        state.timeline.intro.title_zh = req.title_zh
-    if req.title_en is not None:
-        state.timeline.intro.title_en = req.title_en
-    if req.title_pinyin is not None:
-        state.timeline.intro.title_pinyin = req.title_pinyin
-    if req.character_id is not None:
-        state.timeline.intro.character_id = req.character_id
-    if req.tts_text is not None:
-        state.timeline.intro.tts_text = req.tts_text
-    if req.speed is not None:
-        state.timeline.intro.speed = max(0.25, min(4.0, req.speed))
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        if req.title_zh is not None:
+            state.timeline.intro.title_zh = req.title_zh
+        if req.title_en is not None:
+            state.timeline.intro.title_en = req.title_en
+        if req.title_pinyin is not None:
+            state.timeline.intro.title_pinyin = req.title_pinyin
+        if req.character_id is not None:
+            state.timeline.intro.character_id = req.character_id
+        if req.tts_text is not None:
+            state.timeline.intro.tts_text = req.tts_text
+        if req.speed is not None:
+            state.timeline.intro.speed = max(0.25, min(4.0, req.speed))
+            retime_intro_tts(state)
     return state.timeline.intro.model_dump()
 
 
 @router.post("/intro/generate-title")
-async def generate_intro_title(ep_id: str):
-    state = _load_state(ep_id)
+async def generate_intro_title(ep_id: str, refresh: bool = False):
+    state = episode_store.load(ep_id)
     idea = state.script.idea or state.script.seed
     script_lines = "\n".join(
         f"{l.character_id}: {l.text_en}" for l in state.script.lines
@@ -159,7 +147,7 @@ async def generate_intro_title(ep_id: str):
         char_names.append(f"{char_id} ({role})")
     char_list = ", ".join(char_names)
 
-    result = generate_json(
+    result = await agenerate_json(
         system="You are a bilingual Chinese/English title writer for a Mandarin learning show. Return JSON only.",
         user=(
             f"Generate a short, catchy episode title in Mandarin Chinese, pinyin, and English.\n\n"
@@ -176,6 +164,9 @@ async def generate_intro_title(ep_id: str):
             f"- Use the actual pinyin of the Chinese name with tone marks (思源 = Sīyuán, 思琪 = Sīqí, 佳敏 = Jiāmǐn, 明浩 = Mínghào, 南珍 = Nánzhēn)"
         ),
         max_tokens=256,
+        task="title",
+        cache=True,
+        refresh=refresh,
     )
 
     ep_num = int(ep_id.replace("ep_", ""))
@@ -183,12 +174,12 @@ async def generate_intro_title(ep_id: str):
     title_en = result.get("title_en", state.script.seed)
     title_pinyin = result.get("title_pinyin", "")
 
-    state.timeline.intro.title_zh = title_zh
-    state.timeline.intro.title_en = title_en
-    state.timeline.intro.title_pinyin = title_pinyin
-    # Update TTS text to use the generated title
-    state.timeline.intro.tts_text = f"第{ep_num}集：{title_zh}"
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.timeline.intro.title_zh = title_zh
+        state.timeline.intro.title_en = title_en
+        state.timeline.intro.title_pinyin = title_pinyin
+        # Update TTS text to use the generated title
+        state.timeline.intro.tts_text = f"第{ep_num}集：{title_zh}"
     return state.timeline.intro.model_dump()
 
 
@@ -197,9 +188,9 @@ class FixTitleRequest(BaseModel):
 
 
 @router.post("/intro/fix-title")
-async def fix_intro_title(ep_id: str, req: FixTitleRequest):
+async def fix_intro_title(ep_id: str, req: FixTitleRequest, refresh: bool = False):
     """Translate the edited title field into the other two fields."""
-    state = _load_state(ep_id)
+    state = episode_store.load(ep_id)
     intro = state.timeline.intro
     source = req.source_field or "title_en"
 
@@ -213,7 +204,7 @@ async def fix_intro_title(ep_id: str, req: FixTitleRequest):
     targets = [f for f in ("title_zh", "title_pinyin", "title_en") if f != source]
     target_labels = " and ".join(field_labels[t] for t in targets)
 
-    result = generate_json(
+    result = await agenerate_json(
         system="You are a translator. You ONLY output JSON. No explanation, no markdown, no commentary.",
         user=(
             f'The user wrote this {source_label} episode title: "{source_value}"\n'
@@ -222,20 +213,24 @@ async def fix_intro_title(ep_id: str, req: FixTitleRequest):
             f'{{"title_zh": "...", "title_pinyin": "...", "title_en": "..."}}'
         ),
         max_tokens=128,
+        task="fix_title",
+        cache=True,
+        refresh=refresh,
     )
 
     ep_num = int(ep_id.replace("ep_", ""))
-    # Keep the source field unchanged, only update the others
-    for field in targets:
-        setattr(state.timeline.intro, field, result.get(field, getattr(intro, field)))
-    state.timeline.intro.tts_text = f"第{ep_num}集：{state.timeline.intro.title_zh}"
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        intro = state.timeline.intro
+        # Keep the source field unchanged, only update the others
+        for field in targets:
+            setattr(intro, field, result.get(field, getattr(intro, field)))
+        intro.tts_text = f"第{ep_num}集：{intro.title_zh}"
     return state.timeline.intro.model_dump()
 
 
 @router.post("/intro/generate-tts")
 async def generate_intro_tts(ep_id: str):
-    state = _load_state(ep_id)
+    state = episode_store.load(ep_id)
     intro = state.timeline.intro
 
     if not intro.character_id:
@@ -254,13 +249,19 @@ async def generate_intro_tts(ep_id: str):
     ep_dir = EPISODES_DIR / ep_id
     audio_path = ep_dir / "audio" / "intro.mp3"
     speed = intro.speed if intro.speed != 1.0 else state.tts.speed
-    duration_ms = generate_tts(voice_id, intro.tts_text, audio_path, speed=speed)
+    audio = await asyncio.to_thread(generate_tts, voice_id, intro.tts_text, audio_path, speed=speed)
 
-    state.timeline.intro.audio_file = "audio/intro.mp3"
-    state.timeline.intro.audio_duration_ms = duration_ms
-    state.timeline.intro.tts_generated = True
-    _save_state(ep_id, state)
-    return state.timeline.intro.model_dump()
+    async with episode_store.transaction(ep_id, source="tts:intro") as state:
+        intro = state.timeline.intro
+        intro.audio_file = "audio/intro.mp3"
+        intro.audio_duration_ms = audio.duration_ms
+        intro.audio_raw_duration_ms = audio.raw_duration_ms
+        intro.audio_api_speed = audio.api_speed
+        intro.audio_tempo = audio.tempo
+        intro.tts_generated = True
+        # Speed may have changed while the clip was generating
+        retime_intro_tts(state)
+        return intro.model_dump()
 
 
 def _calc_intro_duration_ms(intro: IntroData) -> int:
@@ -270,7 +271,7 @@ def _calc_intro_duration_ms(intro: IntroData) -> int:
 
 @router.post("/export")
 async def export_video(ep_id: str):
-    state = _load_state(ep_id)
+    state = episode_store.load(ep_id)
     if not state.timeline.clips:
         raise HTTPException(400, "No clips in timeline")
 
@@ -314,6 +315,7 @@ async def export_video(ep_id: str):
             "start_ms": 500,
             "duration_ms": intro.audio_duration_ms,
             "order": -1,
+            "tempo": intro.audio_tempo,
             "zoom_start": 1.0,
             "zoom_end": 1.0,
         })
@@ -339,11 +341,11 @@ async def export_video(ep_id: str):
             "zoom_end": 1.0,
         })
 
-    output_path = build_video(export_clips, ep_dir)
+    output_path = await asyncio.to_thread(build_video, export_clips, ep_dir)
 
-    state.timeline.output_file = str(output_path.relative_to(ep_dir))
-    state.timeline.total_duration_ms = calculate_total_duration(state.timeline.clips)
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id, source="export") as state:
+        state.timeline.output_file = str(output_path.relative_to(ep_dir))
+        state.timeline.total_duration_ms = calculate_total_duration(state.timeline.clips)
 
     return {
         "output_file": state.timeline.output_file,
@@ -353,7 +355,7 @@ async def export_video(ep_id: str):
 
 @router.get("/download")
 async def download_video(ep_id: str):
-    state = _load_state(ep_id)
+    state = episode_store.load(ep_id)
     if not state.timeline.output_file:
         raise HTTPException(400, "No exported video yet")
 
@@ -370,7 +372,7 @@ async def download_video(ep_id: str):
 
 @router.get("/captions")
 async def download_captions(ep_id: str):
-    state = _load_state(ep_id)
+    state = episode_store.load(ep_id)
     if not state.timeline.clips:
         raise HTTPException(400, "No clips in timeline")
 
@@ -396,11 +398,10 @@ async def download_captions(ep_id: str):
 
 @router.post("/approve")
 async def approve(ep_id: str):
-    state = _load_state(ep_id)
-    if not state.timeline.output_file:
-        raise HTTPException(400, "Must export video before approving")
+    async with episode_store.transaction(ep_id) as state:
+        if not state.timeline.output_file:
+            raise HTTPException(400, "Must export video before approving")
 
-    state.timeline.approved = True
-    state.current_stage = "stage_5_thumbnail"
-    _save_state(ep_id, state)
+        state.timeline.approved = True
+        state.current_stage = "stage_5_thumbnail"
     return {"approved": True, "current_stage": state.current_stage}
@@ -1,12 +1,13 @@
 from pathlib import Path
 
-from config import EPISODES_DIR, CHARACTERS_DIR, SETTINGS_DIR
+from config import EPISODES_DIR
 from models import EpisodeState
-from services.llm import generate
+from services.asset_registry import character_registry, setting_registry
+from services.llm import agenerate
 from services.openai_images import generate_scene_image
 
 
-def generate_thumbnail_prompt(state: EpisodeState) -> str:
+async def generate_thumbnail_prompt(state: EpisodeState) -> str:
     """Use LLM to generate a thumbnail image prompt from the episode content."""
     # Summarize the script
     script_summary = []
@@ -40,11 +41,12 @@ Requirements:
 
 Return ONLY the image prompt, nothing else."""
 
-    return generate(
+    return (await agenerate(
         system="You write image generation prompts for YouTube thumbnails. Return only the prompt text.",
         user=prompt,
         max_tokens=512,
-    ).strip()
+        task="thumbnail_prompt",
+    )).strip()
 
 
 def generate_thumbnail_image(state: EpisodeState) -> str:
@@ -57,11 +59,9 @@ def generate_thumbnail_image(state: EpisodeState) -> str:
     script_chars = set(l.character_id for l in state.script.lines)
     char_refs = []
     for char_id in script_chars:
-        char = state.context.characters.get(char_id)
-        if char and char.get("reference"):
-            ref_path = CHARACTERS_DIR.parent / char["reference"]
-            if ref_path.exists():
-                char_refs.append(str(ref_path))
+        ref_file = character_registry.reference_file(state.context.characters.get(char_id))
+        if ref_file:
+            char_refs.append(ref_file)
 
     # Find the most-used setting for a setting reference
     setting_ref = None
@@ -70,11 +70,7 @@ def generate_thumbnail_image(state: EpisodeState) -> str:
         for scene in state.scenes.scenes:
             setting_counts[scene.setting_id] = setting_counts.get(scene.setting_id, 0) + 1
         top_setting = max(setting_counts, key=setting_counts.get)
-        setting = state.context.settings.get(top_setting)
-        if setting and setting.get("reference"):
-            ref_path = SETTINGS_DIR.parent / setting["reference"]
-            if ref_path.exists():
-                setting_ref = str(ref_path)
+        setting_ref = setting_registry.reference_file(state.context.settings.get(top_setting))
 
     # Append art style to prompt if set
     prompt = state.thumbnail.prompt
@@ -91,7 +87,7 @@ def generate_thumbnail_image(state: EpisodeState) -> str:
     return image_file
 
 
-def generate_episode_synopsis(state: EpisodeState) -> str:
+async def generate_episode_synopsis(state: EpisodeState) -> str:
     """Generate a YouTube description/synopsis from the episode content."""
     script_lines = []
     for line in state.script.lines[:15]:
@@ -117,11 +113,12 @@ Requirements:
 
 Return ONLY the description text, nothing else."""
 
-    return generate(
+    return (await agenerate(
         system="You write YouTube video descriptions for a Mandarin Chinese learning show. Return only the description text.",
         user=prompt,
         max_tokens=512,
-    ).strip()
+        task="synopsis",
+    )).strip()
 
 
 def revert_thumbnail_image(state: EpisodeState) -> None:
@@ -1,10 +1,10 @@
-import json
+import asyncio
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from config import EPISODES_DIR, OPENAI_API_KEY
-from models import EpisodeState
+from config import OPENAI_API_KEY
+from services.state_store import episode_store
 from stages.stage_5_thumbnail.logic import (
     generate_thumbnail_prompt,
     generate_thumbnail_image,
@@ -14,30 +14,17 @@ from stages.stage_5_thumbnail.logic import (
 router = APIRouter(prefix="/api/episodes/{ep_id}/thumbnail", tags=["thumbnail"])
 
 
-def _load_state(ep_id: str) -> EpisodeState:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    if not state_path.exists():
-        raise HTTPException(404, f"Episode {ep_id} not found")
-    return EpisodeState(**json.loads(state_path.read_text(encoding="utf-8")))
-
-
-def _save_state(ep_id: str, state: EpisodeState) -> None:
-    state_path = EPISODES_DIR / ep_id / "state.json"
-    state_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
-
-
 @router.post("/initialize")
 async def initialize(ep_id: str):
     """Auto-generate a thumbnail prompt from the episode story."""
-    state = _load_state(ep_id)
     try:
-        prompt = generate_thumbnail_prompt(state)
+        prompt = await generate_thumbnail_prompt(episode_store.load(ep_id))
     except Exception as e:
         raise HTTPException(500, f"Prompt generation failed: {e}")
 
-    state.thumbnail.prompt = prompt
-    state.current_stage = "stage_5_thumbnail"
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.thumbnail.prompt = prompt
+        state.current_stage = "stage_5_thumbnail"
     return state.thumbnail.model_dump()
 
 
@@ -47,9 +34,8 @@ class PromptRequest(BaseModel):
 
 @router.put("/prompt")
 async def update_prompt(ep_id: str, req: PromptRequest):
-    state = _load_state(ep_id)
-    state.thumbnail.prompt = req.prompt
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.thumbnail.prompt = req.prompt
     return state.thumbnail.model_dump()
 
 
@@ -58,42 +44,40 @@ async def generate(ep_id: str):
     if not OPENAI_API_KEY:
         raise HTTPException(500, "OPENAI_API_KEY not configured in .env")
 
-    state = _load_state(ep_id)
+    state = episode_store.load(ep_id)
     if not state.thumbnail.prompt:
         raise HTTPException(400, "Thumbnail prompt is empty")
 
     try:
-        image_file = generate_thumbnail_image(state)
+        image_file = await asyncio.to_thread(generate_thumbnail_image, state)
     except Exception as e:
         raise HTTPException(500, f"Thumbnail generation failed: {e}")
 
-    state.thumbnail.image_file = image_file
-    state.thumbnail.generated = True
-    state.current_stage = "stage_5_thumbnail"
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id, source="thumbnail") as state:
+        state.thumbnail.image_file = image_file
+        state.thumbnail.generated = True
+        state.current_stage = "stage_5_thumbnail"
     return state.thumbnail.model_dump()
 
 
 @router.delete("/revert")
 async def revert(ep_id: str):
-    state = _load_state(ep_id)
-    revert_thumbnail_image(state)
-    state.thumbnail.image_file = ""
-    state.thumbnail.generated = False
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        revert_thumbnail_image(state)
+        state.thumbnail.image_file = ""
+        state.thumbnail.generated = False
     return {"reverted": True}
 
 
 @router.post("/generate-synopsis")
 async def generate_synopsis(ep_id: str):
-    state = _load_state(ep_id)
     from stages.stage_5_thumbnail.logic import generate_episode_synopsis
     try:
-        synopsis = generate_episode_synopsis(state)
+        synopsis = await generate_episode_synopsis(episode_store.load(ep_id))
     except Exception as e:
         raise HTTPException(500, f"Synopsis generation failed: {e}")
-    state.thumbnail.synopsis = synopsis
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.thumbnail.synopsis = synopsis
     return state.thumbnail.model_dump()
 
 
@@ -103,19 +87,17 @@ class SynopsisRequest(BaseModel):
 
 @router.put("/synopsis")
 async def update_synopsis(ep_id: str, req: SynopsisRequest):
-    state = _load_state(ep_id)
-    state.thumbnail.synopsis = req.synopsis
-    _save_state(ep_id, state)
+    async with episode_store.transaction(ep_id) as state:
+        state.thumbnail.synopsis = req.synopsis
     return state.thumbnail.model_dump()
 
 
 @router.post("/approve")
 async def approve(ep_id: str):
-    state = _load_state(ep_id)
-    if not state.thumbnail.generated:
-        raise HTTPException(400, "Must generate thumbnail before approving")
+    async with episode_store.transaction(ep_id) as state:
+        if not state.thumbnail.generated:
+            raise HTTPException(400, "Must generate thumbnail before approving")
 
-    state.thumbnail.approved = True
-    state.current_stage = "stage_5_thumbnail_complete"
-    _save_state(ep_id, state)
+        state.thumbnail.approved = True
+        state.current_stage = "stage_5_thumbnail_complete"
     return {"approved": True, "current_stage": state.current_stage}
@@ -0,0 +1,141 @@
+"""Time media duration probing: in-process parsers vs one ffprobe per file.
+
+Writes --clips synthetic clips (CBR MP3 with an ID3 tag, MP3 with a Xing
+header, WAV, MP4 and Ogg Opus) of known length to a temp dir, or probes
+the files under --dir, and reports:
+
+  cold   services.media_probe with an empty cache
+  warm   the same files again (cached by path, size and mtime)
+  ffprobe  the old subprocess path, when ffprobe is on PATH
+
+Durations that differ by more than --tolerance ms are listed.
+
+Usage (from backend/):
+    python -m tools.bench_media_probe [--clips 500] [--dir episodes] [--tolerance 30]
+"""
+import argparse
+import shutil
+import struct
+import tempfile
+import time
+from pathlib import Path
+
+from services.media_probe import _duration_ms, _ffprobe_duration_ms, get_audio_duration_ms
+
+MEDIA_SUFFIXES = {".mp3", ".wav", ".mp4", ".m4a", ".mov", ".ogg", ".opus"}
+
+
+def _id3() -> bytes:
+    body = b"TIT2\x00\x00\x00\x06\x00\x00\x03title"
+    return b"ID3\x04\x00\x00" + bytes([0, 0, 0, len(body)]) + body
+
+
+def _mp3_frames(n: int, xing: bool) -> bytes:
+    # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames of 1152 samples
+    header = b"\xff\xfb\x90\x00"
+    frame = header + bytes(413)
+    first = frame
+    if xing:
+        first = header + bytes(32) + b"Xing" + struct.pack(">II", 1, n)
+        first += bytes(417 - len(first))
+        return first + frame * n
+    return frame * n
+
+
+def make_mp3(seconds: float, xing: bool) -> tuple[bytes, int]:
+    n = int(seconds * 44100 / 1152)
+    return _id3() + _mp3_frames(n, xing), int(n * 1152 / 44100 * 1000)
+
+
+def make_wav(seconds: float) -> tuple[bytes, int]:
+    data_size = int(seconds * 44100) * 2
+    fmt = struct.pack("<HHIIHH", 1, 1, 44100, 88200, 2, 16)
+    data = b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+    data += b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", data_size) + bytes(data_size)
+    return data, int(data_size / 88200 * 1000)
+
+
+def make_mp4(seconds: float) -> tuple[bytes, int]:
+    duration = int(seconds * 600)
+    mvhd_body = struct.pack(">B3xIIII", 0, 0, 0, 600, duration) + bytes(80)
+    mvhd = struct.pack(">I4s", 8 + len(mvhd_body), b"mvhd") + mvhd_body
+    moov = struct.pack(">I4s", 8 + len(mvhd), b"moov") + mvhd
+    ftyp = struct.pack(">I4s", 16, b"ftyp") + b"isom" + bytes(4)
+    mdat = struct.pack(">I4s", 8 + 4096, b"mdat") + bytes(4096)
+    return ftyp + mdat + moov, int(duration / 600 * 1000)
+
+
+def make_ogg(seconds: float) -> tuple[bytes, int]:
+    pre_skip = 312
+    granule = int(seconds * 48000) + pre_skip
+    head = b"OpusHead" + struct.pack("<BBHIhB", 1, 1, pre_skip, 48000, 0, 0)
+    first = b"OggS\x00\x02" + struct.pack("<qIII", 0, 1, 0, 0) + bytes([1, len(head)]) + head
+    last = b"OggS\x00\x04" + struct.pack("<qIII", granule, 1, 1, 0) + bytes([1, 100]) + bytes(100)
+    return first + bytes(2048) + last, int((granule - pre_skip) / 48000 * 1000)
+
+
+MAKERS = {
+    "mp3": lambda s: make_mp3(s, xing=False),
+    "xing.mp3": lambda s: make_mp3(s, xing=True),
+    "wav": make_wav,
+    "mp4": make_mp4,
+    "ogg": make_ogg,
+}
+
+
+def synthesize(directory: Path, count: int) -> dict[Path, int]:
+    expected = {}
+    kinds = list(MAKERS)
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        data, duration_ms = MAKERS[kind](1.0 + (i % 40) * 0.25)
+        path = directory / f"clip_{i:04d}.{kind}"
+        path.write_bytes(data)
+        expected[path] = duration_ms
+    return expected
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=500)
+    parser.add_argument("--dir", type=Path, help="probe media files under this directory instead")
+    parser.add_argument("--tolerance", type=int, default=30, help="ms difference reported as a mismatch")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.dir:
+            paths = sorted(p for p in args.dir.rglob("*") if p.suffix.lower() in MEDIA_SUFFIXES)
+            expected: dict[Path, int] = {}
+        else:
+            expected = synthesize(Path(tmp), args.clips)
+            paths = list(expected)
+        print(f"{len(paths)} files")
+
+        _duration_ms.cache_clear()
+        start = time.perf_counter()
+        durations = {p: get_audio_duration_ms(p) for p in paths}
+        cold_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for p in paths:
+            get_audio_duration_ms(p)
+        warm_ms = (time.perf_counter() - start) * 1000
+        print(f"  cold     {cold_ms:8.1f}ms")
+        print(f"  warm     {warm_ms:8.1f}ms")
+
+        if shutil.which("ffprobe"):
+            start = time.perf_counter()
+            for p in paths:
+                expected.setdefault(p, _ffprobe_duration_ms(str(p)))
+            print(f"  ffprobe  {(time.perf_counter() - start) * 1000:8.1f}ms")
+        elif args.dir:
+            print("  ffprobe not on PATH; durations not checked")
+
+        mismatches = [(p, durations[p], ms) for p, ms in expected.items() if abs(durations[p] - ms) > args.tolerance]
+        for p, got, want in mismatches:
+            print(f"  mismatch {p.name}: {got}ms, expected {want}ms")
+        if expected:
+            print(f"  {len(expected) - len(mismatches)}/{len(expected)} durations within {args.tolerance}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Time state loads, saves and API responses with each serialization path.
+
+Builds synthetic episodes (script lines, TTS statuses, scenes and timeline
+clips all sized to --lines) and times:
+
+  load      json.loads + EpisodeState(**data)  vs  model_validate_json
+  save      json.dumps(model_dump())           vs  model_dump_json
+  response  jsonable_encoder + json.dumps      vs  json_response (pydantic-core)
+
+Usage (from backend/):
+    python -m tools.bench_serialization [--lines 50 500 5000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+
+from models import EpisodeState, Scene, ScenesData, TimelineClip, TimelineData, TTSLineStatus
+from services.serialization import dump_state, dumps, json_response, load_state, loads, orjson
+from tools.bench_state_writes import make_episode
+
+
+def make_full_episode(n_lines: int) -> EpisodeState:
+    state = make_episode(n_lines)
+    state.tts.line_statuses = [
+        TTSLineStatus(line_id=l.id, audio_file=f"audio/line_{l.id}.mp3", duration_ms=1800, generated=True)
+        for l in state.script.lines
+    ]
+    state.scenes = ScenesData(scenes=[
+        Scene(
+            id=f"s{i:05d}",
+            order=i,
+            prompt="A cozy kitchen at dusk, warm light, Siyuan at the table",
+            setting_id="kitchen",
+            character_ids=[l.character_id],
+            line_ids=[l.id],
+            image_file=f"images/s{i:05d}.png",
+            generated=True,
+        )
+        for i, l in enumerate(state.script.lines)
+    ])
+    state.timeline = TimelineData(clips=[
+        TimelineClip(
+            id=f"c{i:05d}",
+            type="audio",
+            source_id=s.line_id,
+            source_file=s.audio_file,
+            track="dialogue",
+            start_ms=i * 1800,
+            duration_ms=1800,
+            order=i,
+        )
+        for i, s in enumerate(state.tts.line_statuses)
+    ])
+    return state
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"orjson: {'installed' if orjson is not None else 'not installed'}")
+    print(f"{'lines':>6} {'step':>9} {'baseline':>10} {'fast':>10} {'speedup':>8}")
+    for n in args.lines:
+        state = make_full_episode(n)
+        raw = dump_state(state)
+        dumped = state.model_dump()
+
+        cases = {
+            "load": (
+                lambda: EpisodeState(**json.loads(raw)),
+                lambda: load_state(EpisodeState, raw),
+            ),
+            "save": (
+                lambda: json.dumps(state.model_dump(), indent=2, ensure_ascii=False).encode("utf-8"),
+                lambda: dump_state(state),
+            ),
+            "response": (
+                lambda: json.dumps(jsonable_encoder(dumped)).encode("utf-8"),
+                lambda: json_response(state).body,
+            ),
+            "registry": (
+                lambda: json.loads(json.dumps(dumped["script"]["lines"])),
+                lambda: loads(dumps(dumped["script"]["lines"])),
+            ),
+        }
+        for step, (baseline, fast) in cases.items():
+            slow_ms = timed(baseline, args.repeat)
+            fast_ms = timed(fast, args.repeat)
+            print(f"{n:>6} {step:>9} {slow_ms:>8.1f}ms {fast_ms:>8.1f}ms {slow_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare write amplification of the JSON, SQLite and journal state stores.
+
+Simulates the TTS stage's generate-all loop on a synthetic episode: every
+line gets its TTSLineStatus updated and the state is saved, exactly like
+the route does. Reports wall time and bytes written per store.
+
+Usage (from backend/):
+    python -m tools.bench_state_writes [--lines 50 300 1000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from models import EpisodeState, ScriptData, ScriptLine, TTSData, TTSLineStatus
+from services.journal_state import JournalStateStore
+from services.sqlite_state import SQLiteStateStore
+from services.state_store import StateStore
+
+
+def make_episode(n_lines: int) -> EpisodeState:
+    lines = [
+        ScriptLine(
+            id=f"l{i:05d}",
+            order=i,
+            character_id="思源",
+            text_zh="妈妈，今天晚上吃什么？",
+            text_en="Mom, what are we eating tonight?",
+            text_pinyin="Māma, jīntiān wǎnshang chī shénme?",
+            direction="Siyuan walks into the kitchen",
+            emotion="curious",
+        )
+        for i in range(n_lines)
+    ]
+    return EpisodeState(
+        id="ep_bench",
+        script=ScriptData(seed="bench", idea="A synthetic episode.", lines=lines, approved=True),
+        tts=TTSData(line_statuses=[TTSLineStatus(line_id=l.id) for l in lines]),
+    )
+
+
+def run(store: StateStore, n_lines: int) -> tuple[float, int]:
+    store.create("ep_bench", make_episode(n_lines))
+    store.stats["bytes_written"] = 0
+    start = time.perf_counter()
+    for i in range(n_lines):
+        state = store.load("ep_bench")
+        line_id = state.script.lines[i].id
+        state.tts.line_statuses[i] = TTSLineStatus(
+            line_id=line_id,
+            audio_file=f"audio/line_{line_id}.mp3",
+            duration_ms=1800,
+            generated=True,
+        )
+        store.save("ep_bench", state)
+    return time.perf_counter() - start, store.stats["bytes_written"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[50, 300, 1000])
+    args = parser.parse_args()
+
+    print(f"{'lines':>6} {'store':>8} {'time':>9} {'bytes written':>15} {'per save':>10}")
+    for n in args.lines:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for name, store in (
+                ("json", StateStore(root / "json", EpisodeState, "Episode")),
+                ("sqlite", SQLiteStateStore(root / "state.db", root / "sqlite", EpisodeState, "Episode")),
+                ("journal", JournalStateStore(root / "journal", EpisodeState, "Episode", compact_every=200)),
+            ):
+                elapsed, written = run(store, n)
+                print(f"{n:>6} {name:>8} {elapsed * 1000:>7.0f}ms {written:>15,} {written // n:>10,}")
+
+
+if __name__ == "__main__":
+    main()
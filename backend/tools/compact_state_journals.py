@@ -0,0 +1,47 @@
+"""Fold every state.journal.jsonl into its state.json snapshot.
+
+Run this before switching from STATE_BACKEND=journal back to the JSON or
+SQLite backend. Those backends only read state.json and would miss edits
+that are still in the journal.
+
+Usage (from backend/):
+    python -m tools.compact_state_journals
+"""
+import argparse
+from pathlib import Path
+
+from config import EPISODES_DIR, SHORTS_DIR, STATE_JOURNAL_COMPACT_EVERY
+from models import EpisodeState
+from services.journal_state import JOURNAL_NAME, JournalStateStore
+from shorts.models import ShortState
+
+
+def compact(store: JournalStateStore, root: Path) -> int:
+    compacted = 0
+    if not root.exists():
+        return compacted
+    for journal in sorted(root.glob(f"*/{JOURNAL_NAME}")):
+        item_id = journal.parent.name
+        if journal.stat().st_size == 0:
+            continue
+        store.compact(item_id)
+        print(f"  {item_id}")
+        compacted += 1
+    return compacted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    for root, model, label in (
+        (EPISODES_DIR, EpisodeState, "Episode"),
+        (SHORTS_DIR, ShortState, "Short"),
+    ):
+        print(f"{label}s in {root}:")
+        store = JournalStateStore(root, model, label, STATE_JOURNAL_COMPACT_EVERY)
+        print(f"  -> {compact(store, root)} compacted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Check that the server keeps answering while a script is being generated.
+
+Starts one POST /script/generate-script and, until it finishes, polls
+GET /api/health every --interval seconds. Reports health-check latency and the
+longest stretch without an answer; with a non-blocking LLM service both stay
+in milliseconds.
+
+Against a running server (real Claude call, uses an existing episode):
+    python -m tools.load_test_llm --url http://localhost:8000 --episode ep_001
+
+In-process, with a fake Claude that takes --latency seconds (no API key
+needed; serves the app on --port and creates and deletes a scratch episode). --blocking simulates the
+old synchronous client for comparison:
+    python -m tools.load_test_llm --fake [--latency 5] [--blocking]
+
+--stream uses POST /script/generate-script/stream instead and also reports
+the time until the first script line arrives.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import httpx
+
+FAKE_SCRIPT = json.dumps({"lines": [
+    {"character_id": "思源", "text_zh": "你好！", "text_en": "Hi!", "text_pinyin": "Nǐ hǎo!", "emotion": "happy"},
+] * 20}, ensure_ascii=False)
+
+
+FAKE_USAGE = SimpleNamespace(
+    input_tokens=1200, output_tokens=900, cache_read_input_tokens=0, cache_creation_input_tokens=0,
+)
+
+
+def install_fake_llm(latency: float, blocking: bool) -> None:
+    import services.llm as llm
+
+    class FakeMessages:
+        async def create(self, **kwargs):
+            if blocking:
+                time.sleep(latency)
+            else:
+                await asyncio.sleep(latency)
+            return SimpleNamespace(
+                content=[SimpleNamespace(text=FAKE_SCRIPT)], stop_reason="end_turn", usage=FAKE_USAGE,
+            )
+
+        @asynccontextmanager
+        async def stream(self, **kwargs):
+            # Spread the same answer evenly over `latency` seconds
+            chunks = [FAKE_SCRIPT[i:i + 40] for i in range(0, len(FAKE_SCRIPT), 40)]
+
+            async def text_stream():
+                for chunk in chunks:
+                    await asyncio.sleep(latency / len(chunks))
+                    yield chunk
+
+            async def get_final_message():
+                return SimpleNamespace(usage=FAKE_USAGE)
+
+            yield SimpleNamespace(text_stream=text_stream(), get_final_message=get_final_message)
+
+    llm._async_client = SimpleNamespace(messages=FakeMessages())
+
+
+IDEA = "Siyuan cannot find his homework and the family helps him look."
+
+
+async def stream_lines(client: httpx.AsyncClient, episode: str, start: float) -> SimpleNamespace:
+    first_line = None
+    async with client.stream(
+        "POST", f"/api/episodes/{episode}/script/generate-script/stream", json={"idea": IDEA}, timeout=None,
+    ) as response:
+        async for text in response.aiter_lines():
+            if text == "event: line" and first_line is None:
+                first_line = time.perf_counter() - start
+    return SimpleNamespace(status_code=response.status_code, first_line=first_line)
+
+
+async def run(client: httpx.AsyncClient, episode: str, interval: float, stream: bool = False) -> None:
+    start = time.perf_counter()
+    if stream:
+        generation = asyncio.create_task(stream_lines(client, episode, start))
+    else:
+        generation = asyncio.create_task(client.post(
+            f"/api/episodes/{episode}/script/generate-script", json={"idea": IDEA}, timeout=None,
+        ))
+
+    latencies: list[float] = []
+    longest_gap = 0.0
+    last = time.perf_counter()
+    while not generation.done():
+        t0 = time.perf_counter()
+        await client.get("/api/health")
+        now = time.perf_counter()
+        latencies.append((now - t0) * 1000)
+        longest_gap = max(longest_gap, now - last)
+        last = now
+        await asyncio.sleep(interval)
+
+    response = await generation
+    elapsed = time.perf_counter() - start
+    print(f"generate-script: HTTP {response.status_code} in {elapsed:.1f}s")
+    if stream:
+        first = f"{response.first_line:.2f}s" if response.first_line is not None else "never"
+        print(f"first script line after {first}")
+    if not latencies:
+        print("no health checks completed during generation")
+        return
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"health checks during generation: {len(latencies)}  "
+        f"p50 {statistics.median(latencies):.1f}ms  p95 {p95:.1f}ms  max {latencies[-1]:.1f}ms"
+    )
+    # With a blocked event loop the server answers nothing for the whole call
+    print(f"longest gap between answered health checks: {longest_gap * 1000:.0f}ms")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    if not args.fake:
+        async with httpx.AsyncClient(base_url=args.url) as client:
+            await run(client, args.episode, args.interval, args.stream)
+        return
+
+    install_fake_llm(args.latency, args.blocking)
+    import uvicorn
+    from app import app
+
+    # A real server rather than httpx.ASGITransport, which buffers streamed bodies
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}") as client:
+            episode = (await client.post("/api/episodes", json={"title": "load test"})).json()["id"]
+            try:
+                await run(client, episode, args.interval, args.stream)
+            finally:
+                await client.delete(f"/api/episodes/{episode}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--episode", default="ep_001")
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between health checks")
+    parser.add_argument("--fake", action="store_true", help="Run in-process against a fake Claude")
+    parser.add_argument("--latency", type=float, default=5.0, help="Fake Claude latency in seconds")
+    parser.add_argument("--blocking", action="store_true", help="Make the fake block the event loop")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming script endpoint")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the in-process server (--fake)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Copy existing episodes/*/state.json and shorts_data/*/state.json into SQLite.
+
+Usage (from backend/):
+    python -m tools.migrate_state_to_sqlite [--db PATH] [--force]
+
+Then start the server with STATE_BACKEND=sqlite. The JSON files are left in
+place, so switching back to the JSON backend is always possible.
+"""
+import argparse
+from pathlib import Path
+
+from config import EPISODES_DIR, SHORTS_DIR, STATE_DB_PATH
+from models import EpisodeState
+from services.sqlite_state import SQLiteStateStore
+from shorts.models import ShortState
+
+
+def migrate(store: SQLiteStateStore, root: Path, force: bool) -> tuple[int, int]:
+    migrated = skipped = 0
+    if not root.exists():
+        return migrated, skipped
+    for state_path in sorted(root.glob("*/state.json")):
+        item_id = state_path.parent.name
+        if store.exists(item_id) and not force:
+            print(f"  skip {item_id} (already in database)")
+            skipped += 1
+            continue
+        state = store.model.model_validate_json(state_path.read_bytes())
+        store.invalidate(item_id)
+        store.save(item_id, state)
+        print(f"  {item_id}")
+        migrated += 1
+    return migrated, skipped
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, default=STATE_DB_PATH, help="SQLite database path")
+    parser.add_argument("--force", action="store_true", help="Overwrite states already in the database")
+    args = parser.parse_args()
+
+    for root, model, label in (
+        (EPISODES_DIR, EpisodeState, "Episode"),
+        (SHORTS_DIR, ShortState, "Short"),
+    ):
+        print(f"{label}s from {root}:")
+        store = SQLiteStateStore(args.db, root, model, label)
+        migrated, skipped = migrate(store, root, args.force)
+        print(f"  -> {migrated} migrated, {skipped} skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import client from './client';
+import { postEventStream } from './sse';
 import type {
   EpisodeSummary,
   EpisodeState,
@@ -6,6 +7,7 @@ import type {
   ScriptLine,
   TTSData,
   TTSLineStatus,
+  LinePeaks,
   Scene,
   ScenesData,
   TimelineData,
@@ -55,10 +57,46 @@ export async function loadContext(epId: string): Promise<ContextData> {
   return data;
 }
 
+// --- Registries ---
+
+export interface ReferenceInfo {
+  path: string;
+  exists: boolean;
+  size: number;
+  width: number;
+  height: number;
+  sha256: string;
+}
+
+export type Registry = Record<string, { reference?: string; reference_info?: ReferenceInfo }>;
+
+// Last response per registry, revalidated with If-None-Match so an unchanged one comes back as an empty 304
+const registryCache: Record<string, { etag: string; data: Registry }> = {};
+
+async function getRegistry(kind: 'characters' | 'settings'): Promise<Registry> {
+  const cached = registryCache[kind];
+  const res = await client.get(`/registries/${kind}`, {
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+    validateStatus: (status) => status === 200 || status === 304,
+  });
+  if (res.status === 304 && cached) return cached.data;
+  const etag = res.headers['etag'];
+  if (etag) registryCache[kind] = { etag, data: res.data };
+  return res.data;
+}
+
+export function getCharacterRegistry(): Promise<Registry> {
+  return getRegistry('characters');
+}
+
+export function getSettingRegistry(): Promise<Registry> {
+  return getRegistry('settings');
+}
+
 // --- Script (Stage 1) ---
 
-export async function checkSeed(epId: string, seed: string) {
-  const { data } = await client.post(`/episodes/${epId}/script/check-seed`, { seed });
+export async function checkSeed(epId: string, seed: string, refresh = false) {
+  const { data } = await client.post(`/episodes/${epId}/script/check-seed`, { seed }, { params: { refresh } });
   return data as {
     has_conflicts: boolean;
     conflicts: { episode_id: string; episode_title: string; similarity: string }[];
@@ -80,6 +118,46 @@ export async function generateScript(epId: string, idea: string): Promise<Script
   return data;
 }
 
+/** Stream the script line by line; resolves with the full script once generation is done. */
+export async function streamScript(
+  epId: string,
+  idea: string,
+  onLine: (line: ScriptLine) => void,
+): Promise<ScriptLine[]> {
+  const lines: ScriptLine[] = [];
+  await postEventStream(`/episodes/${epId}/script/generate-script/stream`, { idea }, (event, data) => {
+    if (event === 'line') {
+      lines.push(data as ScriptLine);
+      onLine(data as ScriptLine);
+    } else if (event === 'error') {
+      throw new Error((data as { detail: string }).detail);
+    }
+  });
+  return lines;
+}
+
+/** Keep the lines an interrupted `streamScript` saved as the script. */
+export async function keepScriptDraft(epId: string, idea: string): Promise<ScriptLine[]> {
+  const { data } = await client.post(`/episodes/${epId}/script/generate-script/keep-draft`, { idea });
+  return data;
+}
+
+export interface ScriptLineDiff {
+  op: 'keep' | 'remove' | 'add';
+  line: ScriptLine;
+}
+
+/** Rewrite lines start..end (0-based, inclusive); untouched lines keep their ids. */
+export async function regenerateLines(
+  epId: string,
+  start: number,
+  end: number,
+  instruction = '',
+): Promise<{ lines: ScriptLine[]; diff: ScriptLineDiff[] }> {
+  const { data } = await client.post(`/episodes/${epId}/script/regenerate-lines`, { start, end, instruction });
+  return data;
+}
+
 export async function updateLines(epId: string, lines: ScriptLine[]): Promise<ScriptLine[]> {
   const { data } = await client.put(`/episodes/${epId}/script/lines`, lines);
   return data;
@@ -107,8 +185,8 @@ export async function initializeTTS(epId: string): Promise<TTSData> {
   return data;
 }
 
-export async function generateTTSLine(epId: string, lineId: string): Promise<TTSLineStatus> {
-  const { data } = await client.post(`/episodes/${epId}/tts/generate/${lineId}`);
+export async function generateTTSLine(epId: string, lineId: string, refresh = false): Promise<TTSLineStatus> {
+  const { data } = await client.post(`/episodes/${epId}/tts/generate/${lineId}`, null, { params: { refresh } });
   return data;
 }
 
@@ -117,6 +195,48 @@ export async function generateAllTTS(epId: string): Promise<TTSLineStatus[]> {
   return data;
 }
 
+/**
+ * Generate one line through the streaming endpoint. `onAudio` gets a URL
+ * that plays the line while it is still being generated.
+ */
+export async function streamTTSLine(
+  epId: string,
+  lineId: string,
+  onAudio: (url: string, tempo: number) => void,
+): Promise<TTSLineStatus> {
+  const result: { status?: TTSLineStatus } = {};
+  await postEventStream(`/episodes/${epId}/tts/generate/${lineId}/stream`, {}, (event, data) => {
+    if (event === 'started') {
+      const origin = new URL(client.defaults.baseURL!).origin;
+      const { partial_url, tempo } = data as { partial_url: string; tempo: number };
+      onAudio(origin + partial_url, tempo);
+    } else if (event === 'done') {
+      result.status = data as TTSLineStatus;
+    } else if (event === 'error') {
+      throw new Error((data as { detail: string }).detail);
+    }
+  });
+  if (!result.status) throw new Error('TTS stream ended without a result');
+  return result.status;
+}
+
+/**
+ * Generate every line without audio, several at a time. `onLine` is called
+ * as each result is saved (always in script order).
+ */
+export async function streamGenerateAllTTS(
+  epId: string,
+  onLine: (status: TTSLineStatus) => void,
+): Promise<void> {
+  await postEventStream(`/episodes/${epId}/tts/generate-all/stream`, {}, (event, data) => {
+    if (event === 'line') {
+      onLine(data as TTSLineStatus);
+    } else if (event === 'error') {
+      throw new Error((data as { detail: string }).detail);
+    }
+  });
+}
+
 export async function revertTTSLine(epId: string, lineId: string) {
   const { data } = await client.delete(`/episodes/${epId}/tts/revert/${lineId}`);
   return data;
@@ -132,11 +252,19 @@ export async function setTTSMode(epId: string, mode: string) {
   return data;
 }
 
-export async function setTTSSpeed(epId: string, speed: number): Promise<{ speed: number }> {
+export async function setTTSSpeed(
+  epId: string,
+  speed: number,
+): Promise<{ speed: number; line_statuses: TTSLineStatus[] }> {
   const { data } = await client.put(`/episodes/${epId}/tts/speed`, { speed });
   return data;
 }
 
+export async function getTTSPeaks(epId: string, lineId: string, perSecond = 100): Promise<LinePeaks> {
+  const { data } = await client.get(`/episodes/${epId}/tts/peaks/${lineId}`, { params: { per_second: perSecond } });
+  return data;
+}
+
 export async function updateTTSLines(epId: string, lines: ScriptLine[]): Promise<ScriptLine[]> {
   const { data } = await client.put(`/episodes/${epId}/tts/lines`, lines);
   return data;
@@ -152,8 +280,8 @@ export async function deleteTTSLine(epId: string, lineId: string): Promise<Scrip
   return data;
 }
 
-export async function suggestEmotions(epId: string): Promise<ScriptLine[]> {
-  const { data } = await client.post(`/episodes/${epId}/tts/suggest-emotions`);
+export async function suggestEmotions(epId: string, refresh = false): Promise<ScriptLine[]> {
+  const { data } = await client.post(`/episodes/${epId}/tts/suggest-emotions`, null, { params: { refresh } });
   return data;
 }
 
@@ -264,8 +392,8 @@ export async function uploadIntroVideo(epId: string, file: File): Promise<IntroD
   return data;
 }
 
-export async function generateIntroTitle(epId: string): Promise<IntroData> {
-  const { data } = await client.post(`/episodes/${epId}/timeline/intro/generate-title`);
+export async function generateIntroTitle(epId: string, refresh = false): Promise<IntroData> {
+  const { data } = await client.post(`/episodes/${epId}/timeline/intro/generate-title`, null, { params: { refresh } });
   return data;
 }
 
@@ -5,6 +5,7 @@ export interface ShortSummary {
   title: string;
   date: string;
   completed: boolean;
+  current_step?: string;
 }
 
 export interface ShortConfig {
@@ -44,6 +45,7 @@ export interface FlashcardItem {
   tts_sentence_duration_ms: number;
   tts_repeat_files: string[];
   tts_repeat_durations_ms: number[];
+  tts_tempo: number;
   tts_generated: boolean;
   wrong_sentence_zh: string;
   wrong_sentence_pinyin: string;
@@ -62,6 +64,7 @@ export interface ShortState {
   assets_approved: boolean;
   tts_question_file: string;
   tts_question_duration_ms: number;
+  tts_question_tempo: number;
   output_file: string;
   completed: boolean;
 }
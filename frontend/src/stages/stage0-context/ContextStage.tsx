@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import type { StageComponentProps, ContextData } from '../types';
-import { loadContext } from '../../api/stages';
+import { loadContext, getCharacterRegistry, getSettingRegistry, type Registry } from '../../api/stages';
 import { useEpisodeStore } from '../../state/episodeStore';
 import ProgressBar from '../../components/ProgressBar';
 import { registerStage } from '../stageRegistry';
@@ -45,12 +45,23 @@ function ExpandableLog({ label, items }: { label: string; items: string[] }) {
   );
 }
 
+/** " [ref 1024×1024]" / " [ref missing]" for an entry with a reference image, else "". */
+function referenceNote(registry: Registry | null, key: string): string {
+  const info = registry?.[key]?.reference_info;
+  if (!info) return '';
+  return info.exists ? ` [ref ${info.width}×${info.height}]` : ' [ref missing]';
+}
+
 function ContextStage({ episodeId, onAdvance }: StageComponentProps) {
   const [bootLines, setBootLines] = useState<string[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [contextLoaded, setContextLoaded] = useState(false);
   const [contextData, setContextData] = useState<ContextData | null>(null);
+  const [registries, setRegistries] = useState<{ characters: Registry | null; settings: Registry | null }>({
+    characters: null,
+    settings: null,
+  });
   const setContext = useEpisodeStore((s) => s.setContext);
   const setCurrentStage = useEpisodeStore((s) => s.setCurrentStage);
 
@@ -68,10 +79,16 @@ function ContextStage({ episodeId, onAdvance }: StageComponentProps) {
 
       // Load actual context
       try {
-        const ctx = await loadContext(episodeId);
+        // Reference metadata is extra; the context loads without it
+        const [ctx, characters, settings] = await Promise.all([
+          loadContext(episodeId),
+          getCharacterRegistry().catch(() => null),
+          getSettingRegistry().catch(() => null),
+        ]);
         if (cancelled) return;
         setContext(ctx);
         setContextData(ctx);
+        setRegistries({ characters, settings });
 
         const charCount = Object.keys(ctx.characters).length;
         const settingCount = Object.keys(ctx.settings).length;
@@ -114,7 +131,7 @@ function ContextStage({ episodeId, onAdvance }: StageComponentProps) {
           label={`✓ ${chars.length} characters loaded`}
           items={chars.map((name) => {
             const info = contextData.characters[name];
-            return `${name} — ${info.role}`;
+            return `${name} — ${info.role}${referenceNote(registries.characters, name)}`;
           })}
         />
       );
@@ -125,7 +142,7 @@ function ContextStage({ episodeId, onAdvance }: StageComponentProps) {
         <ExpandableLog
           key={i}
           label={`✓ ${settings.length} settings loaded`}
-          items={settings.map(([key, info]) => `${key} — ${info.name_en}`)}
+          items={settings.map(([key, info]) => `${key} — ${info.name_en}${referenceNote(registries.settings, key)}`)}
         />
       );
     }
@@ -0,0 +1,61 @@
+import { useState } from 'react';
+import TerminalInput from '../../terminal/TerminalInput';
+
+interface RegenerateLinesProps {
+  lineCount: number;
+  onSubmit: (start: number, end: number, instruction: string) => void;
+  disabled?: boolean;
+}
+
+/** Pick a range of lines (1-based, inclusive) and an optional instruction for Claude to rewrite them. */
+export default function RegenerateLines({ lineCount, onSubmit, disabled }: RegenerateLinesProps) {
+  const [from, setFrom] = useState(1);
+  const [to, setTo] = useState(lineCount);
+  const valid = from >= 1 && from <= to && to <= lineCount;
+
+  return (
+    <div style={{ marginTop: 16 }}>
+      <div style={{ fontSize: 12, color: 'var(--text-dim)', marginBottom: 8 }}>
+        REWRITE LINES:
+      </div>
+      <div style={{ display: 'flex', gap: 8, alignItems: 'center', marginBottom: 8, fontSize: 13 }}>
+        <span>from</span>
+        <input
+          type="number"
+          className="terminal-input"
+          style={numberStyle}
+          min={1}
+          max={lineCount}
+          value={from}
+          onChange={(e) => setFrom(Number(e.target.value))}
+          disabled={disabled}
+        />
+        <span>to</span>
+        <input
+          type="number"
+          className="terminal-input"
+          style={numberStyle}
+          min={1}
+          max={lineCount}
+          value={to}
+          onChange={(e) => setTo(Number(e.target.value))}
+          disabled={disabled}
+        />
+        {!valid && <span style={{ color: 'var(--danger)' }}>lines 1-{lineCount}</span>}
+      </div>
+      <TerminalInput
+        prompt="rewrite>"
+        placeholder="e.g. make 思琪 more playful (Enter to rewrite)"
+        onSubmit={(instruction) => valid && onSubmit(from - 1, to - 1, instruction)}
+        disabled={disabled}
+        autoFocus={false}
+        allowEmpty
+      />
+    </div>
+  );
+}
+
+const numberStyle: React.CSSProperties = {
+  width: 60,
+  flex: 'none',
+};
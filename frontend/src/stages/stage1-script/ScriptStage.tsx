@@ -4,7 +4,9 @@ import { useEpisodeStore } from '../../state/episodeStore';
 import {
   checkSeed,
   generateIdea,
-  generateScript,
+  streamScript,
+  keepScriptDraft,
+  regenerateLines,
   updateLines,
   addLine,
   deleteLine,
@@ -16,6 +18,7 @@ import { playDone } from '../../utils/sound';
 import SeedInput from './SeedInput';
 import ConflictWarning from './ConflictWarning';
 import LineEditor from './LineEditor';
+import RegenerateLines from './RegenerateLines';
 import ProgressBar from '../../components/ProgressBar';
 
 type Phase = 'seed' | 'checking' | 'conflicts' | 'generating-idea' | 'idea-review' | 'generating-script' | 'editing' | 'approving' | 'done';
@@ -42,6 +45,10 @@ function ScriptStage({ episodeId }: StageComponentProps) {
     suggestion: string;
   } | null>(null);
   const [error, setError] = useState<string | null>(null);
+  // Lines an interrupted stream saved; they can still be kept
+  const [draftCount, setDraftCount] = useState(state?.script.draft_lines?.length || 0);
+  const [rewriting, setRewriting] = useState(false);
+  const [rewriteNote, setRewriteNote] = useState<string | null>(null);
   const lines = state?.script.lines || [];
 
   const handleSeedSubmit = async (value: string) => {
@@ -83,17 +90,56 @@ function ScriptStage({ episodeId }: StageComponentProps) {
   const handleGenerateScript = async () => {
     setPhase('generating-script');
     setError(null);
+    // The server only replaces the saved script once streaming completes
+    const previous = lines;
+    const streamed: ScriptLine[] = [];
+    setDraftCount(0);
     try {
-      const result = await generateScript(episodeId, idea);
+      const result = await streamScript(episodeId, idea, (line) => {
+        streamed.push(line);
+        setScriptLines([...streamed]);
+      });
       setScriptLines(result);
       playDone();
       setPhase('editing');
     } catch (err: unknown) {
       setError(err instanceof Error ? err.message : 'Script generation failed');
+      setScriptLines(previous);
+      setDraftCount(streamed.length);
       setPhase('idea-review');
     }
   };
 
+  const handleKeepDraft = async () => {
+    setError(null);
+    try {
+      const result = await keepScriptDraft(episodeId, idea);
+      setScriptLines(result);
+      setDraftCount(0);
+      setPhase('editing');
+    } catch (err: unknown) {
+      setError(err instanceof Error ? err.message : 'Failed to keep streamed lines');
+    }
+  };
+
+  const handleRegenerate = async (start: number, end: number, instruction: string) => {
+    setRewriting(true);
+    setError(null);
+    setRewriteNote(null);
+    try {
+      const result = await regenerateLines(episodeId, start, end, instruction);
+      setScriptLines(result.lines);
+      const removed = result.diff.filter((d) => d.op === 'remove').length;
+      const added = result.diff.filter((d) => d.op === 'add').length;
+      setRewriteNote(`Lines ${start + 1}-${end + 1}: ${removed} replaced by ${added}`);
+      playDone();
+    } catch (err: unknown) {
+      setError(err instanceof Error ? err.message : 'Rewriting lines failed');
+    } finally {
+      setRewriting(false);
+    }
+  };
+
   const handleReorder = useCallback(
     async (fromIndex: number, toIndex: number) => {
       const newLines = [...lines];
@@ -239,6 +285,11 @@ function ScriptStage({ episodeId }: StageComponentProps) {
             <button onClick={handleGenerateScript} style={btnStyle}>
               Generate Script
             </button>
+            {draftCount > 0 && (
+              <button onClick={handleKeepDraft} style={btnSecondary}>
+                Keep {draftCount} Streamed Line{draftCount === 1 ? '' : 's'}
+              </button>
+            )}
             <button onClick={() => setPhase('seed')} style={btnSecondary}>
               Try Different Seed
             </button>
@@ -248,7 +299,14 @@ function ScriptStage({ episodeId }: StageComponentProps) {
 
       {/* Generating script */}
       {phase === 'generating-script' && (
-        <ProgressBar label="Generating script (this may take a moment)..." />
+        <div>
+          <ProgressBar label={`Generating script... ${lines.length} line${lines.length === 1 ? '' : 's'} so far`} />
+          {lines.map((line) => (
+            <div key={line.id} style={{ padding: '4px 0', opacity: 0.8 }}>
+              <strong>{line.character_id}</strong> {line.text_zh} <span style={{ opacity: 0.6 }}>{line.text_en}</span>
+            </div>
+          ))}
+        </div>
       )}
 
       {/* Editing */}
@@ -269,6 +327,16 @@ function ScriptStage({ episodeId }: StageComponentProps) {
               Approve Script →
             </button>
           </div>
+          {rewriting ? (
+            <div style={{ marginTop: 16 }}>
+              <ProgressBar label="Rewriting lines..." />
+            </div>
+          ) : (
+            <RegenerateLines key={lines.length} lineCount={lines.length} onSubmit={handleRegenerate} />
+          )}
+          {rewriteNote && (
+            <div style={{ fontSize: 12, color: 'var(--text-secondary)', marginTop: 8 }}>{rewriteNote}</div>
+          )}
         </div>
       )}
 
@@ -3,9 +3,10 @@ import { useState, useRef, useEffect } from 'react';
 interface AudioPlayerProps {
   src: string;
   durationMs: number;
+  tempo?: number;  // playback rate; the file holds the audio at its generated speed
 }
 
-export default function AudioPlayer({ src, durationMs }: AudioPlayerProps) {
+export default function AudioPlayer({ src, durationMs, tempo = 1 }: AudioPlayerProps) {
   const [playing, setPlaying] = useState(false);
   const audioRef = useRef<HTMLAudioElement | null>(null);
 
@@ -16,11 +17,12 @@ export default function AudioPlayer({ src, durationMs }: AudioPlayerProps) {
       audioRef.current = null;
       setPlaying(false);
     }
-  }, [src, durationMs]);
+  }, [src, durationMs, tempo]);
 
   const toggle = () => {
     if (!audioRef.current) {
       audioRef.current = new Audio(`${src}?v=${durationMs}`);
+      audioRef.current.playbackRate = tempo;
       audioRef.current.onended = () => setPlaying(false);
     }
     if (playing) {
@@ -3,7 +3,8 @@ import type { StageComponentProps, ScriptLine, TTSLineStatus } from '../types';
 import { useEpisodeStore } from '../../state/episodeStore';
 import {
   initializeTTS,
-  generateTTSLine,
+  streamTTSLine,
+  streamGenerateAllTTS,
   revertTTSLine,
   revertSelectedTTS,
   setTTSMode,
@@ -19,6 +20,7 @@ import { playDone } from '../../utils/sound';
 import { registerStage } from '../stageRegistry';
 import LineEditor from '../stage1-script/LineEditor';
 import AudioPlayer from './AudioPlayer';
+import Waveform from './Waveform';
 import TTSControls from './TTSControls';
 import ProgressBar from '../../components/ProgressBar';
 
@@ -31,6 +33,7 @@ function TTSStage({ episodeId }: StageComponentProps) {
   const {
     state,
     setTTSData,
+    retimeTTS,
     setTTSLineStatus,
     setTTSMode: setStoreMode,
     setTTSApproved,
@@ -94,7 +97,12 @@ function TTSStage({ episodeId }: StageComponentProps) {
       setGeneratingLineId(lineId);
       setError(null);
       try {
-        const result = await generateTTSLine(episodeId, lineId);
+        // Play the line as soon as its first audio arrives
+        const result = await streamTTSLine(episodeId, lineId, (url, tempo) => {
+          const audio = new Audio(url);
+          audio.playbackRate = tempo;
+          audio.play().catch(() => {});
+        });
         setTTSLineStatus(lineId, result);
         playDone();
       } catch (err: unknown) {
@@ -110,15 +118,9 @@ function TTSStage({ episodeId }: StageComponentProps) {
     setPhase('generating');
     setError(null);
     try {
-      const ungenerated = lines.filter((l) => {
-        const s = tts?.line_statuses.find((ls) => ls.line_id === l.id);
-        return !s?.generated;
+      await streamGenerateAllTTS(episodeId, (status) => {
+        setTTSLineStatus(status.line_id, status);
       });
-      for (const line of ungenerated) {
-        setGeneratingLineId(line.id);
-        const result = await generateTTSLine(episodeId, line.id);
-        setTTSLineStatus(line.id, result);
-      }
       setGeneratingLineId(null);
       playDone();
       setPhase('editing');
@@ -127,7 +129,7 @@ function TTSStage({ episodeId }: StageComponentProps) {
       setGeneratingLineId(null);
       setPhase('editing');
     }
-  }, [episodeId, lines, tts?.line_statuses, setTTSLineStatus]);
+  }, [episodeId, setTTSLineStatus]);
 
   const handleRevert = useCallback(
     async (lineId: string) => {
@@ -331,10 +333,14 @@ function TTSStage({ episodeId }: StageComponentProps) {
             ))}
           </select>
           {status?.generated && status.audio_file && (
-            <AudioPlayer
-              src={`${STATIC_BASE}/${episodeId}/${status.audio_file}`}
-              durationMs={status.duration_ms}
-            />
+            <>
+              <AudioPlayer
+                src={`${STATIC_BASE}/${episodeId}/${status.audio_file}`}
+                durationMs={status.duration_ms}
+                tempo={status.tempo}
+              />
+              <Waveform episodeId={episodeId} lineId={line.id} durationMs={status.duration_ms} />
+            </>
           )}
           {canGenerate && !isGenerating && (
             <button
@@ -409,8 +415,10 @@ function TTSStage({ episodeId }: StageComponentProps) {
             onToggleMode={handleToggleMode}
             onApprove={handleApprove}
             onSpeedChange={async (speed) => {
-              setTTSData({ ...tts!, speed });
-              await setTTSSpeed(episodeId, speed);
+              retimeTTS(speed);
+              // Generated lines are retimed, not regenerated
+              const result = await setTTSSpeed(episodeId, speed);
+              retimeTTS(result.speed, result.line_statuses);
             }}
             generating={!!generatingLineId || phase === 'generating'}
             selectedCount={[...selectedLines].filter((id) => getStatus(id)?.generated).length}
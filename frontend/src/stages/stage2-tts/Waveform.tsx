@@ -0,0 +1,60 @@
+import { useState, useRef, useEffect } from 'react';
+import { getTTSPeaks } from '../../api/stages';
+import type { LinePeaks } from '../types';
+
+interface WaveformProps {
+  episodeId: string;
+  lineId: string;
+  durationMs: number;  // changes when the line is regenerated
+  width?: number;
+  height?: number;
+}
+
+export default function Waveform({ episodeId, lineId, durationMs, width = 120, height = 20 }: WaveformProps) {
+  const [data, setData] = useState<LinePeaks | null>(null);
+  const canvasRef = useRef<HTMLCanvasElement | null>(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    // One bin per pixel is plenty; the server picks the nearest stored resolution
+    const perSecond = Math.max(1, (width * 1000) / Math.max(1, durationMs));
+    getTTSPeaks(episodeId, lineId, perSecond)
+      .then((d) => { if (!cancelled) setData(d); })
+      .catch(() => { if (!cancelled) setData(null); });
+    return () => { cancelled = true; };
+  }, [episodeId, lineId, durationMs, width]);
+
+  useEffect(() => {
+    const canvas = canvasRef.current;
+    const ctx = canvas?.getContext('2d');
+    if (!canvas || !ctx) return;
+    ctx.clearRect(0, 0, width, height);
+    if (!data || !data.peaks.length) return;
+
+    const bins = data.peaks.length / 2;
+    const mid = height / 2;
+    const styles = getComputedStyle(canvas);
+    // Leading/trailing silence (trimmed on the timeline) is drawn dimmed
+    const speechStart = (data.speech_start_ms / data.duration_ms) * width;
+    const speechEnd = (data.speech_end_ms / data.duration_ms) * width;
+    for (let x = 0; x < width; x++) {
+      const from = Math.floor((x / width) * bins);
+      const to = Math.max(from + 1, Math.floor(((x + 1) / width) * bins));
+      let lo = 0;
+      let hi = 0;
+      for (let i = from; i < to && i < bins; i++) {
+        lo = Math.min(lo, data.peaks[2 * i]);
+        hi = Math.max(hi, data.peaks[2 * i + 1]);
+      }
+      ctx.fillStyle = x >= speechStart && x <= speechEnd
+        ? styles.getPropertyValue('--accent') || '#0f0'
+        : styles.getPropertyValue('--text-dim') || '#555';
+      ctx.fillRect(x, mid - (hi / 127) * mid, 1, Math.max(1, ((hi - lo) / 127) * mid));
+    }
+  }, [data, width, height]);
+
+  const title = data
+    ? `${data.loudness_lufs !== null ? `${data.loudness_lufs} LUFS` : 'silent'}, peak ${data.peak_dbfs ?? '-∞'} dBFS`
+    : undefined;
+  return <canvas ref={canvasRef} width={width} height={height} title={title} style={{ verticalAlign: 'middle' }} />;
+}
@@ -392,6 +392,7 @@ export default function IntroPanel({
         <audio
           controls
           src={`http://localhost:8000/static/episodes/${episodeId}/${intro.audio_file}?t=${cacheBust}`}
+          onPlay={(e) => { e.currentTarget.playbackRate = intro.audio_tempo || 1; }}
           style={{ height: 28 }}
         />
       )}
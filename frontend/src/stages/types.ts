@@ -3,6 +3,8 @@ export interface EpisodeSummary {
   title: string;
   summary: string;
   date: string;
+  current_stage?: string;
+  completed?: boolean;
 }
 
 export interface ScriptLine {
@@ -37,6 +39,7 @@ export interface ScriptData {
   idea: string;
   lines: ScriptLine[];
   approved: boolean;
+  draft_lines: ScriptLine[];
 }
 
 export interface TTSLineStatus {
@@ -44,6 +47,21 @@ export interface TTSLineStatus {
   audio_file: string;
   duration_ms: number;
   generated: boolean;
+  raw_duration_ms: number;
+  api_speed: number;
+  tempo: number;
+}
+
+export interface LinePeaks {
+  line_id: string;
+  duration_ms: number;
+  loudness_lufs: number | null;
+  peak_dbfs: number | null;
+  speech_start_ms: number;
+  speech_end_ms: number;
+  tempo: number;
+  peaks_per_second: number;
+  peaks: number[];  // flat [min, max, min, max, ...], -127..127
 }
 
 export interface TTSData {
@@ -81,6 +99,9 @@ export interface TimelineClip {
   order: number;
   zoom_start: number;
   zoom_end: number;
+  tempo: number;
+  source_in_ms: number;
+  source_out_ms: number;
 }
 
 export interface IntroData {
@@ -92,6 +113,9 @@ export interface IntroData {
   image_file: string;
   audio_file: string;
   audio_duration_ms: number;
+  audio_raw_duration_ms: number;
+  audio_api_speed: number;
+  audio_tempo: number;
   tts_generated: boolean;
   image_uploaded: boolean;
   speed: number;
@@ -31,6 +31,7 @@ interface EpisodeStore {
   setTTSData: (tts: TTSData) => void;
   setTTSLineStatus: (lineId: string, status: Partial<TTSLineStatus>) => void;
   setTTSMode: (mode: string) => void;
+  retimeTTS: (speed: number, retimed?: TTSLineStatus[]) => void;
   setTTSApproved: (approved: boolean) => void;
 
   // Scenes
@@ -126,6 +127,21 @@ export const useEpisodeStore = create<EpisodeStore>((set) => ({
       state: s.state ? { ...s.state, tts: { ...s.state.tts, approved } } : null,
     })),
 
+  // Speed changes only retime generated lines; merge just their timing into
+  // the current statuses so lines generated meanwhile are not overwritten
+  retimeTTS: (speed, retimed = []) =>
+    set((s) => {
+      if (!s.state) return {};
+      const byId = new Map(retimed.map((ls) => [ls.line_id, ls]));
+      const statuses = s.state.tts.line_statuses.map((ls) => {
+        const r = byId.get(ls.line_id);
+        return r && r.generated && r.audio_file === ls.audio_file
+          ? { ...ls, duration_ms: r.duration_ms, tempo: r.tempo }
+          : ls;
+      });
+      return { state: { ...s.state, tts: { ...s.state.tts, speed, line_statuses: statuses } } };
+    }),
+
   // Scenes
   setScenesData: (scenes) =>
     set((s) => ({